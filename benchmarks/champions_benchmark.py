@@ -0,0 +1,114 @@
+"""
+Scaling benchmark for the cross-vendor champion deduplication.
+
+Generates a synthetic corpus of people quoted by several vendors, with the
+spelling differences seen in the real outputs (slug vs. title case company
+names, legal suffixes, punctuation, typos in names), and times the blocked
+resolver at growing sizes against naive all-pairs matching. Also reports how
+well the clusters match the generated people.
+
+    python benchmarks/champions_benchmark.py [--sizes 10000 50000 100000 200000] [--naive 500 1000 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python_files'))
+
+import champions  # noqa: E402
+
+VENDORS = ['datadog', 'digitalocean', 'mongodb', 'confluent', 'splunk', 'atlassian', 'chef', 'circleci', 'fastly']
+FIRST = ['chris', 'maria', 'jordan', 'wei', 'fatima', 'lukas', 'ana', 'rahul', 'sofia', 'kenji', 'olga', 'pedro',
+         'amara', 'noah', 'elif', 'sven', 'priya', 'diego', 'hana', 'tomas', 'zoe', 'omar', 'ines', 'ivan']
+LAST = ['waters', 'garcia', 'avery', 'zhang', 'khan', 'muller', 'silva', 'sharma', 'rossi', 'tanaka', 'ivanova',
+        'santos', 'okafor', 'smith', 'yilmaz', 'berg', 'patel', 'lopez', 'kim', 'novak', 'dubois', 'haddad',
+        'costa', 'petrov']
+WORDS = ['acme', 'nova', 'blue', 'river', 'quantum', 'atlas', 'pixel', 'orbit', 'summit', 'harbor', 'lumen',
+         'cedar', 'vertex', 'falcon', 'echo', 'delta', 'maple', 'iron', 'silver', 'cloud']
+SUFFIXES = ['', ' Inc.', ', Inc', ' Ltd', ' GmbH', ' LLC']
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def typo(text, rng):
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:] if rng.random() < 0.5 else text[:i] + text[i + 1:]
+
+
+def company_variant(words, rng):
+    style = rng.random()
+    if style < 0.3:
+        return '-'.join(words)  # Datadog slug
+    if style < 0.5:
+        return ' '.join(words).capitalize()  # Fastly "New relic"
+    return ' '.join(word.title() for word in words) + rng.choice(SUFFIXES)
+
+
+def corpus(size, seed=1):
+    """size testimonials as (vendor, record, person id)"""
+    rng = random.Random(seed)
+    mentions = []
+    person = 0
+    while len(mentions) < size:
+        # Made-up surnames and company names, so people mostly differ like real ones do
+        first, last = rng.choice(FIRST), rng.choice(LAST) + ''.join(rng.choices(LETTERS, k=4))
+        words = rng.sample(WORDS, rng.randint(1, 2)) + [''.join(rng.choices(LETTERS, k=5))]
+        for vendor in rng.sample(VENDORS, rng.randint(1, 4)):
+            name = f'{first} {last}'
+            if rng.random() < 0.15:
+                name = f'{first} {typo(last, rng)}'
+            record = {'company': company_variant(words, rng),
+                      'testimonial': {'name': name.title(), 'title': 'CTO', 'URL': f'https://{vendor}.example/{person}'}}
+            mentions.append((vendor, record, person))
+        person += 1
+    return mentions[:size]
+
+
+def naive_resolve(mentions):
+    groups = champions._UnionFind(len(mentions))
+    for i in range(len(mentions)):
+        for j in range(i + 1, len(mentions)):
+            if champions.is_match(mentions[i], mentions[j]):
+                groups.union(i, j)
+    return len({groups.find(i) for i in range(len(mentions))})
+
+
+def quality(clusters, people):
+    """(share of clusters holding one person, share of people kept in one cluster)"""
+    pure = sum(1 for cluster in clusters if len({people[id(m)] for m in cluster}) == 1)
+    clusters_per_person = Counter(person for cluster in clusters for person in {people[id(m)] for m in cluster})
+    whole = sum(1 for count in clusters_per_person.values() if count == 1)
+    return pure / len(clusters), whole / len(clusters_per_person)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 50000, 100000, 200000])
+    parser.add_argument('--naive', nargs='+', type=int, default=[500, 1000, 2000],
+                        help="Sizes to time all-pairs matching at (it is quadratic)")
+    args = parser.parse_args()
+
+    print(f"{'records':>9}{'method':>9}{'seconds':>10}{'us/record':>11}{'champions':>11}{'purity':>8}{'complete':>10}")
+    for size in sorted(set(args.naive + args.sizes)):
+        generated = corpus(size)
+        mentions = [champions.Mention(vendor, record) for vendor, record, _ in generated]
+        people = {id(mention): person for mention, (_, _, person) in zip(mentions, generated)}
+
+        start = time.perf_counter()
+        clusters = champions.resolve(mentions)
+        elapsed = time.perf_counter() - start
+        purity, complete = quality(clusters, people)
+        print(f"{size:>9}{'blocked':>9}{elapsed:>10.2f}{elapsed / size * 1e6:>11.1f}{len(clusters):>11}"
+              f"{purity:>8.3f}{complete:>10.3f}")
+
+        if size in args.naive:
+            start = time.perf_counter()
+            found = naive_resolve(mentions)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>9}{'naive':>9}{elapsed:>10.2f}{elapsed / size * 1e6:>11.1f}{found:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Lookup benchmark for the daemon's in-memory index (python_files/daemon.py).
+
+Loads a synthetic corpus of testimonials (see champions_benchmark.py) into a
+RecordIndex and into a temporary SQLite store, then times lookups by company,
+by person and by URL against each: the daemon's API against a store.lookup
+query per request.
+
+    python benchmarks/daemon_benchmark.py [--sizes 10000 100000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'python_files'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import store  # noqa: E402
+from champions_benchmark import corpus  # noqa: E402
+from daemon import RecordIndex  # noqa: E402
+
+
+def queries(generated, count, seed=2):
+    """count (kind, criteria) lookups of records in the corpus, by company, person and URL in turn"""
+    rng = random.Random(seed)
+    picked = []
+    for i in range(count):
+        _, record, _ = rng.choice(generated)
+        values = {'company': record['company'], 'name': record['testimonial']['name'],
+                  'url': record['testimonial']['URL']}
+        kind = ('company', 'name', 'url')[i % 3]
+        picked.append((kind, {kind: values[kind]}))
+    return picked
+
+
+def time_lookups(lookup, picked):
+    """{kind: (microseconds per lookup, matches)}"""
+    timings = {}
+    for kind in ('company', 'name', 'url'):
+        criteria = [c for k, c in picked if k == kind]
+        start = time.perf_counter()
+        matches = sum(len(lookup(**c)) for c in criteria)
+        timings[kind] = ((time.perf_counter() - start) / len(criteria) * 1e6, matches)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'records':>9}{'backend':>9}{'by':>9}{'us/lookup':>11}{'matches':>9}")
+    for size in args.sizes:
+        generated = corpus(size)
+        by_vendor = {}
+        for vendor, record, _ in generated:
+            by_vendor.setdefault(vendor, []).append(record)
+        picked = queries(generated, args.lookups)
+
+        index = RecordIndex()
+        for vendor, records in by_vendor.items():
+            index.replace(vendor, records)
+        with tempfile.TemporaryDirectory() as directory:
+            db = os.path.join(directory, 'testimonials.db')
+            for vendor, records in by_vendor.items():
+                store.upsert_records(vendor, records, f'{vendor}_case_studies.json', path=db)
+            results = {'memory': time_lookups(index.lookup, picked),
+                       'sqlite': time_lookups(lambda **c: store.lookup(path=db, **c), picked)}
+        for backend, timings in results.items():
+            for kind, (microseconds, matches) in timings.items():
+                print(f"{size:>9}{backend:>9}{kind:>9}{microseconds:>11.1f}{matches:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Time the Datadog generic testimonial search (extract_testimonial "Option 3"):
+the original nested scan against the single-pass indexed version. Both must
+return the same result on every page, and with --check the full extractor
+must reproduce the saved datadog_testimonials.json records.
+
+Pages come from the HTTP cache filled by a normal run, from --html-dir
+(files named <company-slug>.html), or are generated with --synthetic N:
+    python benchmarks/extract_benchmark.py [--html-dir DIR] [--synthetic 2000] [--check]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'python_files'))
+
+import http_cache  # noqa: E402
+import scrape1  # noqa: E402
+import settings  # noqa: E402
+from parsing import make_soup  # noqa: E402
+
+DATADOG_PREFIX = 'https://www.datadoghq.com/case-studies/'
+
+
+def pages_from_cache():
+    """Return {company slug: html} for every cached Datadog case study page"""
+    pages = {}
+    for meta_path in glob.glob(os.path.join(http_cache.CACHE_DIR, '*.json')):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                url = json.load(f)['url']
+            if not url.startswith(DATADOG_PREFIX) or url == DATADOG_PREFIX:
+                continue
+            with open(meta_path[:-len('.json')] + '.body', 'rb') as f:
+                pages[url[len(DATADOG_PREFIX):].strip('/')] = f.read()
+        except (OSError, ValueError, KeyError):
+            continue
+    return pages
+
+
+def pages_from_dir(html_dir):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(html_dir, '*.html'))):
+        with open(path, 'rb') as f:
+            pages[os.path.basename(path)[:-len('.html')]] = f.read()
+    return pages
+
+
+def synthetic_page(blocks):
+    """A page shaped like the older Datadog templates: lots of nested divs, testimonial near the end"""
+    filler = ''.join(
+        f'<div class="row"><div class="col"><p>Paragraph {i} about observability.</p>'
+        f'<span>metric</span><div><span>{i}</span></div></div></div>'
+        for i in range(blocks)
+    )
+    testimonial = ('<div class="quote"><div>Jane Example</div><div>Director of Engineering</div>'
+                   '<div>Example Corp</div></div>')
+    return f'<html><body><div id="page">{filler}{testimonial}</div></body></html>'
+
+
+def timed(func, soup):
+    start = time.perf_counter()
+    result = func(soup)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html-dir', help="Directory of saved Datadog pages named <company-slug>.html")
+    parser.add_argument('--synthetic', type=int, metavar='BLOCKS',
+                        help="Benchmark one generated page with this many filler blocks")
+    parser.add_argument('--check', action='store_true',
+                        help="Compare the full extractor output with datadog_testimonials.json")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        pages = {'synthetic': synthetic_page(args.synthetic)}
+    elif args.html_dir:
+        pages = pages_from_dir(args.html_dir)
+    else:
+        pages = pages_from_cache()
+    if not pages:
+        print("No Datadog pages found; run scrape1 first, or use --html-dir / --synthetic")
+        return 1
+
+    legacy_total = indexed_total = 0.0
+    mismatches = []
+    for company, html in sorted(pages.items()):
+        soup = make_soup(html)
+        legacy, legacy_time = timed(scrape1.find_grouped_text_legacy, soup)
+        indexed, indexed_time = timed(scrape1.find_grouped_text_indexed, soup)
+        legacy_total += legacy_time
+        indexed_total += indexed_time
+        if legacy != indexed:
+            mismatches.append(company)
+
+    print(f"pages:   {len(pages)}")
+    print(f"legacy:  {legacy_total * 1000:10.1f} ms")
+    print(f"indexed: {indexed_total * 1000:10.1f} ms  ({legacy_total / max(indexed_total, 1e-9):.1f}x faster)")
+    print(f"identical results: {len(pages) - len(mismatches)}/{len(pages)}")
+    for company in mismatches:
+        print(f"  differs: {company}")
+
+    if args.check:
+        with open(os.path.join(ROOT_DIR, 'datadog_testimonials.json'), encoding='utf-8') as f:
+            saved = {item['company']: item['testimonial'] for item in json.load(f)}
+        differences = 0
+        compared = 0
+        for mode in ('legacy', 'indexed'):
+            settings.DATADOG_EXTRACT_MODE = mode
+            for company, html in sorted(pages.items()):
+                if company not in saved:
+                    continue
+                compared += 1
+                if scrape1.extract_testimonial(make_soup(html)) != saved[company]:
+                    differences += 1
+                    print(f"  {mode} differs from saved record: {company}")
+        print(f"saved records reproduced: {compared - differences}/{compared}")
+        mismatches += ['saved'] * differences
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Compare parse time and peak memory per vendor for the available parser
+backends, with and without the vendor's restricted (PARSE_ONLY) parse, and
+the time its extractor takes on the resulting tree.
+
+Pages come from the HTTP cache filled by a normal run, or from a directory
+with one sub-directory of saved .html files per vendor:
+    python benchmarks/parse_benchmark.py [--html-dir DIR] [--vendors fastly chef]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python_files'))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import http_cache  # noqa: E402
+from fetch_engine import Page  # noqa: E402
+from runner import load_plugin  # noqa: E402
+
+# vendor -> URL prefix of its case study pages
+VENDOR_PAGES = {
+    'mongodb': 'https://www.mongodb.com/solutions/customer-case-studies/',
+    'confluent': 'https://www.confluent.io/customers/',
+    'splunk': 'https://www.splunk.com/en_us/customers/success-stories/',
+    'chef': 'https://www.chef.io/customers/',
+    'circleci': 'https://circleci.com/case-studies/',
+    'fastly': 'https://www.fastly.com/customers/',
+}
+
+
+def available_backends():
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        pass
+    return backends
+
+
+def pages_from_cache():
+    """Return {vendor: [html bytes]} for every cached case study page"""
+    pages = {vendor: [] for vendor in VENDOR_PAGES}
+    for meta_path in glob.glob(os.path.join(http_cache.CACHE_DIR, '*.json')):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                url = json.load(f)['url']
+            with open(meta_path[:-len('.json')] + '.body', 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError, KeyError):
+            continue
+        for vendor, prefix in VENDOR_PAGES.items():
+            if url.startswith(prefix) and url != prefix:
+                pages[vendor].append(body)
+    return pages
+
+
+def pages_from_dir(html_dir):
+    pages = {}
+    for vendor in VENDOR_PAGES:
+        pages[vendor] = []
+        for path in sorted(glob.glob(os.path.join(html_dir, vendor, '*.html'))):
+            with open(path, 'rb') as f:
+                pages[vendor].append(f.read())
+    return pages
+
+
+def measure(bodies, backend, parse_only, extract):
+    """Return (median parse ms per page, median extract ms per page, max peak KiB per page)"""
+    times = []
+    extract_times = []
+    for body in bodies:
+        start = time.perf_counter()
+        soup = BeautifulSoup(body, backend, parse_only=parse_only)
+        times.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract(Page('https://example.com/', 'example', soup))
+        extract_times.append((time.perf_counter() - start) * 1000)
+
+    # Memory is measured in a separate pass, tracemalloc slows parsing down a lot
+    peaks = []
+    for body in bodies:
+        tracemalloc.start()
+        BeautifulSoup(body, backend, parse_only=parse_only)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return statistics.median(times), statistics.median(extract_times), max(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html-dir', help="Directory with <vendor>/*.html pages instead of the HTTP cache")
+    parser.add_argument('--vendors', nargs='+', choices=sorted(VENDOR_PAGES), default=sorted(VENDOR_PAGES))
+    args = parser.parse_args()
+
+    pages = pages_from_dir(args.html_dir) if args.html_dir else pages_from_cache()
+    print(f"{'vendor':<11}{'pages':>6}  {'backend':<12}{'mode':<11}{'ms/page':>9}{'extract ms':>12}{'peak KiB':>10}")
+    for vendor in args.vendors:
+        bodies = pages[vendor]
+        if not bodies:
+            print(f"{vendor:<11}{0:>6}  no saved pages")
+            continue
+        plugin = load_plugin(vendor)
+        for backend in available_backends():
+            for mode, parse_only in (('full', None), ('restricted', plugin.PARSE_ONLY)):
+                ms, extract_ms, peak = measure(bodies, backend, parse_only, plugin.extract)
+                print(f"{vendor:<11}{len(bodies):>6}  {backend:<12}{mode:<11}{ms:>9.2f}{extract_ms:>12.3f}{peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Scaling benchmark for the work queue (python_files/work_queue.py). Starts the
+local vendor stand-in server, queues each vendor's pages (multiplied with
+--pages) and times how long 1, 2, 4, ... worker processes take to drain the
+queue, with every worker counted against the same per-host rate limit.
+
+    python benchmarks/queue_benchmark.py                              # 1, 2 and 4 workers
+    python benchmarks/queue_benchmark.py --workers 1 8 --pages 2000 --latency-ms 120
+    python benchmarks/queue_benchmark.py --kill-after 5               # SIGKILL one worker 5s in
+
+--kill-after kills the first worker part way through, to check that its
+leased tasks are taken over by the others once the lease (--lease-seconds)
+runs out. Nothing is written to the real cache or output files.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_FILES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'python_files')
+sys.path.insert(0, PYTHON_FILES_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import vendor_server  # noqa: E402
+from vendor_benchmark import VENDORS, multiply_pages  # noqa: E402
+
+WORK_QUEUE = os.path.join(PYTHON_FILES_DIR, 'work_queue.py')
+
+
+def fill_queue(queue_path, vendors, count):
+    """Queue the vendors' pages; settings must already point at the stand-in server"""
+    from runner import load_plugin
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(queue_path)
+    total = 0
+    for vendor in vendors:
+        pages = load_plugin(vendor).pages()
+        if count:
+            pages = multiply_pages(pages, count)
+        total += queue.enqueue(vendor, pages)
+    queue.close()
+    return total
+
+
+def drain(queue_path, workers, env, kill_after=None):
+    """Seconds the workers take to drain the queue, and the final task counts"""
+    from work_queue import WorkQueue
+
+    start = time.perf_counter()
+    processes = [subprocess.Popen([sys.executable, WORK_QUEUE, '--queue', queue_path, 'worker'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                 for _ in range(workers)]
+    if kill_after is not None:
+        time.sleep(kill_after)
+        processes[0].kill()
+    for process in processes:
+        process.wait()
+    elapsed = time.perf_counter() - start
+
+    queue = WorkQueue(queue_path)
+    states = {}
+    for vendor_states in queue.counts().values():
+        for state, count in vendor_states.items():
+            states[state] = states.get(state, 0) + count
+    queue.close()
+    return elapsed, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vendors', nargs='+', choices=VENDORS, default=['fastly', 'confluent', 'circleci'])
+    parser.add_argument('--pages', type=int, default=600, help="Pages per vendor (0 = the vendor's own list)")
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--rate-limit', type=float, default=10000,
+                        help="Per-host requests/second shared by all the workers")
+    parser.add_argument('--lease-seconds', type=float, default=10)
+    parser.add_argument('--kill-after', type=float, help="Kill the first worker after this many seconds")
+    vendor_server.add_arguments(parser)
+    parser.set_defaults(latency_ms=80)
+    args = parser.parse_args()
+
+    server, url = vendor_server.start(**vendor_server.server_options(args))
+    print(f"{'workers':>7}{'pages':>8}{'seconds':>9}{'pages/s':>9}{'done':>7}{'failed':>8}{'unfinished':>12}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            queue_path = os.path.join(cache_dir, 'work_queue.db')
+            env = dict(SCRAPER_MIRROR_URL=url,
+                       SCRAPER_CACHE_DIR=cache_dir,
+                       SCRAPER_CACHE_MODE='off',
+                       SCRAPER_SNAPSHOTS='0',
+                       SCRAPER_DISCOVERY='0',
+                       SCRAPER_LEASE_SECONDS=str(args.lease_seconds),
+                       SCRAPER_RATE_LIMIT=str(args.rate_limit / workers),
+                       SCRAPER_RATE_BURST=str(max(1, int(args.rate_limit / workers))),
+                       SCRAPER_RATE_MAX=str(args.rate_limit / workers))
+            # The listing pages are read in this process, before the settings module is imported
+            os.environ.update(env)
+            pages = fill_queue(queue_path, args.vendors, args.pages)
+            elapsed, states = drain(queue_path, workers, dict(os.environ), args.kill_after)
+            unfinished = states.get('pending', 0) + states.get('leased', 0)
+            print(f"{workers:>7}{pages:>8}{elapsed:>9.1f}{pages / elapsed:>9.1f}{states.get('done', 0):>7}"
+                  f"{states.get('failed', 0):>8}{unfinished:>12}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
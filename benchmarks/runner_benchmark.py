@@ -0,0 +1,68 @@
+"""
+Compare the single-process plugin runner with the old one-interpreter-per-
+scraper fan-out: interpreter startup + import cost, and wall time and total
+CPU of a full run. Runs are --offline by default (fill the cache with a
+normal run first) and write their JSON files to a temporary directory.
+    python benchmarks/runner_benchmark.py [--online] [--repeat 3]
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON_FILES_DIR = os.path.join(ROOT_DIR, 'python_files')
+sys.path.insert(0, PYTHON_FILES_DIR)
+
+from runner import PLUGINS  # noqa: E402
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(commands, cwd=ROOT_DIR):
+    """Run the commands one after another; return (wall seconds, CPU seconds)"""
+    cpu_before = children_cpu()
+    start = time.perf_counter()
+    for command in commands:
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, children_cpu() - cpu_before
+
+
+def report(label, samples):
+    walls = [wall for wall, _ in samples]
+    cpus = [cpu for _, cpu in samples]
+    print(f"{label:<34}{statistics.median(walls):>10.2f}{statistics.median(cpus):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--online', action='store_true', help="Let full runs use the network")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    modules = sorted(set(PLUGINS.values()))
+    import_each = [[sys.executable, '-c', f'import {module}'] for module in modules]
+    import_all = [[sys.executable, '-c', f"import {', '.join(modules)}"]]
+    os.environ['PYTHONPATH'] = os.pathsep.join([PYTHON_FILES_DIR, os.environ.get('PYTHONPATH', '')])
+
+    print(f"{'':<34}{'wall (s)':>10}{'CPU (s)':>10}")
+    report("startup: one interpreter each", [measure(import_each) for _ in range(args.repeat)])
+    report("startup: one interpreter", [measure(import_all) for _ in range(args.repeat)])
+
+    mode = [] if args.online else ['--offline']
+    with tempfile.TemporaryDirectory() as output_dir:
+        base = [sys.executable, os.path.join(ROOT_DIR, 'main.py'), '--skip', 'digitalocean',
+                '--output-dir', output_dir, '--jobs', str(len(modules))] + mode
+        report("full run: --subprocess", [measure([base + ['--subprocess']]) for _ in range(args.repeat)])
+        report("full run: in process", [measure([base]) for _ in range(args.repeat)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Offline scraper benchmark. Starts the local vendor stand-in server
+(vendor_server.py), runs each vendor's scraper against it in its own process
+and reports pages/sec, per-page fetch latency (p50/p95/p99), parse time and
+peak RSS per vendor, and how busy the fetch and parse steps were.
+
+    python benchmarks/vendor_benchmark.py                       # every vendor, its own page list
+    python benchmarks/vendor_benchmark.py --pages 10000 --vendors fastly confluent
+    python benchmarks/vendor_benchmark.py --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+    python benchmarks/vendor_benchmark.py --pages 5000 --parse-workers 0 4   # compare parse pool sizes
+
+--pages multiplies each vendor's page list with synthetic slugs up to that
+many pages. Nothing is written to the real cache or output files.
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'python_files'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import vendor_server  # noqa: E402
+
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+VENDORS = ['datadog', 'digitalocean', 'mongodb', 'confluent', 'splunk', 'atlassian', 'chef', 'circleci', 'fastly']
+
+_SLUG_URL = re.compile(r'^(.*/)([^/]+?)(\.html)?(/?)$')
+
+
+def multiply_pages(pages, count):
+    """Extend {url: site} to count pages by adding -x<N> copies of every slug"""
+    items = list(pages.items())
+    multiplied = {}
+    for i in range(count):
+        url, site = items[i % len(items)]
+        copy = i // len(items)
+        if copy:
+            prefix, slug, extension, slash = _SLUG_URL.match(url).groups()
+            url = f"{prefix}{slug}-x{copy}{extension or ''}{slash}"
+            site = f"{site}-x{copy}"
+        multiplied[url] = site
+    return multiplied
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[pct - 1]
+
+
+def run_worker(vendor, count):
+    """Runs inside the per-vendor process; settings come from the environment"""
+    import fetch_engine
+    import metrics
+    from runner import load_plugin
+
+    latencies = []
+    fetch = fetch_engine.fetch
+
+    def timed_fetch(url, stream_until=None):
+        start = time.perf_counter()
+        try:
+            return fetch(url, stream_until)
+        finally:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    fetch_engine.fetch = timed_fetch
+
+    plugin = load_plugin(vendor)
+    start = time.perf_counter()
+    pages = plugin.pages()
+    if count:
+        pages = multiply_pages(pages, count)
+    records = fetch_engine.scrape_pages(vendor, pages, plugin.extract, getattr(plugin, 'PARSE_ONLY', None),
+                                        stream_until=getattr(plugin, 'STREAM_UNTIL', None))
+    elapsed = time.perf_counter() - start
+    # Parse times come back from the parse processes through the metrics
+    report = metrics.vendor_report(vendor)
+    parse_seconds = report['stages'].get('parse', {}).get('seconds', 0.0)
+    utilisation = (report['pipeline'] or {}).get('utilisation', {})
+
+    result = {
+        'vendor': vendor,
+        'pages': len(pages),
+        'records': len(records),
+        'seconds': elapsed,
+        'pages_per_sec': len(pages) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'parse_ms_per_page': parse_seconds * 1000 / len(pages) if pages else 0.0,
+        'fetch_busy': utilisation.get('fetch', 0.0),
+        'parse_busy': utilisation.get('parse', 0.0),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_vendor(vendor, count, env):
+    command = [sys.executable, os.path.abspath(__file__), '--worker', vendor, '--pages', str(count)]
+    # A fresh cache each run, or content fingerprints from an earlier run would skip the parsing
+    with tempfile.TemporaryDirectory() as cache_dir:
+        completed = subprocess.run(command, env=dict(env, SCRAPER_CACHE_DIR=cache_dir), capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"{vendor} failed:\n{completed.stderr[-2000:]}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vendors', nargs='+', choices=VENDORS, default=VENDORS)
+    parser.add_argument('--pages', type=int, default=0, help="Pages per vendor (0 = the vendor's own list)")
+    parser.add_argument('--rate-limit', type=float, default=10000,
+                        help="Per-host requests/second allowed by the scrapers' rate limiter")
+    parser.add_argument('--parse-workers', nargs='+', type=int,
+                        help="Parse processes to run each vendor with (default: SCRAPER_PARSE_WORKERS)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    vendor_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.pages)
+        return
+
+    server, url = vendor_server.start(**vendor_server.server_options(args))
+    env = dict(os.environ,
+               SCRAPER_MIRROR_URL=url,
+               SCRAPER_CACHE_MODE='off',
+               SCRAPER_SNAPSHOTS='0',
+               SCRAPER_RATE_LIMIT=str(args.rate_limit),
+               SCRAPER_RATE_BURST=str(max(1, int(args.rate_limit))),
+               SCRAPER_RATE_MAX=str(args.rate_limit))
+    print(f"{'vendor':<11}{'parsers':>8}{'pages':>7}{'records':>9}{'pages/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'parse ms':>10}{'fetch %':>9}{'parse %':>9}{'RSS MB':>8}")
+    for vendor in args.vendors:
+        for parse_workers in args.parse_workers or [None]:
+            if parse_workers is not None:
+                env['SCRAPER_PARSE_WORKERS'] = str(parse_workers)
+            result = run_vendor(vendor, args.pages, env)
+            if result:
+                parsers = env.get('SCRAPER_PARSE_WORKERS', 'auto')
+                print(f"{vendor:<11}{parsers:>8}{result['pages']:>7}{result['records']:>9}"
+                      f"{result['pages_per_sec']:>9.1f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+                      f"{result['p99_ms']:>9.1f}{result['parse_ms_per_page']:>10.2f}"
+                      f"{result['fetch_busy']:>9.0%}{result['parse_busy']:>9.0%}{result['peak_rss_mb']:>8.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
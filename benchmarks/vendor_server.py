@@ -0,0 +1,217 @@
+"""
+Local stand-in for the vendor sites, for benchmarks that must not touch the
+real ones. Requests arrive as /<host>/<path> (see SCRAPER_MIRROR_URL) and are
+answered with:
+
+  - the archived snapshot of that URL, with --snapshots (URLs multiplied by
+    the benchmark, <slug>-x<N>, map back to the original page),
+  - otherwise the vendor's fixture from benchmarks/fixtures, with the slug
+    filled in and padded to --page-kb of realistic markup.
+
+The Datadog, Atlassian and DigitalOcean listing pages are generated with --listing-size
+cards, and each host's /sitemap.xml (an index with one child sitemap) with
+--sitemap-size case study URLs. Latency and failures can be injected with --latency-ms, --jitter-ms,
+--error-rate and --not-found-rate.
+
+    python benchmarks/vendor_server.py --port 8765 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, 'fixtures')
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'python_files'))
+
+# vendor -> (URL prefix of its case study pages, as host + path)
+VENDOR_PREFIXES = {
+    'datadog': 'www.datadoghq.com/case-studies/',
+    'digitalocean': 'www.digitalocean.com/customers/',
+    'mongodb': 'www.mongodb.com/solutions/customer-case-studies/',
+    'confluent': 'www.confluent.io/customers/',
+    'splunk': 'www.splunk.com/en_us/customers/success-stories/',
+    'chef': 'www.chef.io/customers/',
+    'circleci': 'circleci.com/case-studies/',
+    'fastly': 'www.fastly.com/customers/',
+}
+# vendor -> URL of its listing page, as host + path
+LISTING_PAGES = {
+    'datadog': 'www.datadoghq.com/case-studies/',
+    'atlassian': 'www.atlassian.com/customers',
+    'digitalocean': 'www.digitalocean.com/customers',
+}
+
+MULTIPLIED_SUFFIX = re.compile(r'-x\d+(?=(\.html)?/?$)')
+
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def filler(kb):
+    """Roughly kb KiB of nested markup; every text element is too long to look like a name"""
+    block = ('<div class="section"><div class="row"><div class="col">'
+             '<p>Teams rely on dashboards, alerts and traces to keep services healthy {i}.</p>'
+             '<span>Read more about how this customer runs production {i}</span>'
+             '<ul><li><a href="/docs/{i}">Documentation for feature number {i}</a></li></ul>'
+             '</div></div></div>\n')
+    size = len(block.format(i=0))
+    return ''.join(block.format(i=i) for i in range(max(1, kb * 1024 // size)))
+
+
+class VendorSite:
+    def __init__(self, page_kb=100, listing_size=250, sitemap_size=0, use_snapshots=False):
+        self.layout = _read_fixture('_layout.html')
+        self.filler = filler(page_kb // 2)
+        self.fixtures = {vendor: _read_fixture(f'{vendor}.html') for vendor in VENDOR_PREFIXES}
+        self.listing_size = listing_size
+        self.sitemap_size = sitemap_size
+        self.snapshots = self._load_snapshots() if use_snapshots else {}
+
+    def _load_snapshots(self):
+        """Map host + path of every archived page to its body"""
+        import snapshots
+        pages = {}
+        for vendor in VENDOR_PREFIXES:
+            for entry in snapshots.latest(vendor):
+                pages[re.sub(r'^https?://', '', entry['url'])] = snapshots.read(vendor, entry)
+        print(f"Loaded {len(pages)} archived pages")
+        return pages
+
+    def _render(self, title, content):
+        page = self.layout.replace('{title}', title).replace('{content}', content)
+        return page.replace('<!--FILLER-->', self.filler).encode('utf-8')
+
+    def listing(self, vendor):
+        card = _read_fixture(f'{vendor}_listing.html')
+        cards = ''.join(card.replace('{company}', f'company-{i}') for i in range(self.listing_size))
+        return self._render(f'{vendor} customers', f'<div class="cards">{cards}</div>')
+
+    def sitemap(self, host, child):
+        """The host's sitemap index, or its one child sitemap listing sitemap_size stories"""
+        if not child:
+            return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                    f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    f'<sitemap><loc>https://{host}/sitemap-1.xml</loc></sitemap></sitemapindex>').encode('utf-8')
+        prefixes = [prefix for prefix in VENDOR_PREFIXES.values() if prefix.startswith(f'{host}/')]
+        urls = ''.join(f'<url><loc>https://{prefix}story-{i}{".html" if "splunk" in host else "/"}</loc>'
+                       f'<lastmod>2024-01-{i % 28 + 1:02d}</lastmod></url>'
+                       for prefix in prefixes for i in range(self.sitemap_size))
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>').encode('utf-8')
+
+    def page(self, path):
+        """Return the body for /<host>/<path>, or None for unknown URLs"""
+        path = path.lstrip('/').split('?', 1)[0]
+        original = MULTIPLIED_SUFFIX.sub('', path)
+        host, _, rest = path.partition('/')
+        if self.sitemap_size and rest in ('sitemap.xml', 'sitemap-1.xml'):
+            return self.sitemap(host, rest == 'sitemap-1.xml')
+        for vendor, listing in LISTING_PAGES.items():
+            if original.rstrip('/') == listing.rstrip('/'):
+                return self.listing(vendor)
+
+        if original in self.snapshots:
+            return self.snapshots[original]
+        for vendor, prefix in VENDOR_PREFIXES.items():
+            if path.startswith(prefix) and len(path) > len(prefix):
+                slug = path[len(prefix):].strip('/').replace('.html', '')
+                return self._render(slug, self.fixtures[vendor].replace('{slug}', slug))
+        return None
+
+
+def make_handler(site, latency_ms=0, jitter_ms=0, error_rate=0.0, not_found_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            roll = random.random()
+            body = site.page(self.path)
+            if roll < error_rate:
+                self._send(503, b'Service Unavailable')
+            elif body is None or roll < error_rate + not_found_rate:
+                self._send(404, b'Not Found')
+            else:
+                self._send(200, body)
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class VendorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Streaming clients hang up once they have what they need
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start(port=0, **options):
+    """Start the server on a background thread; returns (server, base URL)"""
+    handler_options = {key: options.pop(key) for key in
+                       ('latency_ms', 'jitter_ms', 'error_rate', 'not_found_rate') if key in options}
+    site = VendorSite(**options)
+    server = VendorServer(('127.0.0.1', port), make_handler(site, **handler_options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=0, help="Added delay per response")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random +/- variation of the delay")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of responses that are 503")
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help="Fraction of responses that are 404")
+    parser.add_argument('--page-kb', type=int, default=100, help="Approximate size of fixture pages")
+    parser.add_argument('--listing-size', type=int, default=250, help="Cards on generated listing pages")
+    parser.add_argument('--sitemap-size', type=int, default=0,
+                        help="Case study URLs in each generated sitemap (0 = no sitemaps)")
+    parser.add_argument('--snapshots', action='store_true', help="Serve archived snapshots where available")
+
+
+def server_options(args):
+    return {
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'error_rate': args.error_rate,
+        'not_found_rate': args.not_found_rate,
+        'page_kb': args.page_kb,
+        'listing_size': args.listing_size,
+        'sitemap_size': args.sitemap_size,
+        'use_snapshots': args.snapshots,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server, url = start(args.port, **server_options(args))
+    print(f"Serving vendor pages at {url} (set SCRAPER_MIRROR_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
+import argparse
+import json
 import os
 import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Get the current directory where the script is located
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -8,29 +13,227 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 python_files_dir = os.path.join(current_dir, 'python_files')
 js_files_dir = os.path.join(current_dir, 'scrapper')
 
-# List of Python files
-python_files = [f"python_files/{file_name}" for file_name in [
-     'scrape1.py','scrape3.py', 'scrape4.py', 'scrape5.py', 'scrape6.py', 'scrape7.py', 'scrape8.py','scrape9.py']]
+# Shared scraper modules (settings, run statistics, ...)
+sys.path.insert(0, python_files_dir)
+import metrics  # noqa: E402
+import run_stats  # noqa: E402
+import settings  # noqa: E402
+from runner import PLUGINS, RULE_PLUGIN, rule_files, run_vendors  # noqa: E402
 
-# JS file
-js_file = os.path.join(js_files_dir, 'scrape2.js')  # Use correct filename
+# Output file written by each vendor job, used to count records of subprocess jobs
+OUTPUT_FILES = {
+    'datadog': 'datadog_testimonials.json',
+    'digitalocean': 'digital_ocean_case_studies.json',
+    'atlassian': 'atlassian_case_studies.json',
+}
+# Vendors scraped from a rule file name theirs in it
+for vendor, path in rule_files().items():
+    with open(path, encoding='utf-8') as f:
+        OUTPUT_FILES[vendor] = json.load(f)['output_file']
 
+# Original puppeteer scrapers, run with --puppeteer instead of the Python ones.
+# They are the slowest jobs, so each one gets its own slot
+JS_VENDORS = {'digitalocean': ['node', os.path.join(js_files_dir, 'scrape2.js')]}
 
-# Function to execute Python files
-def run_python_files():
-    for file in python_files:
-        print(f"Running {file}")
-        subprocess.run(['python', file], check=True)
+VENDORS = list(OUTPUT_FILES)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the vendor case study scrapers.")
+    parser.add_argument('--jobs', type=int, default=4,
+                        help="Maximum number of Python scrapers running at the same time (default: 4)")
+    parser.add_argument('--only', nargs='+', choices=sorted(VENDORS), metavar='VENDOR',
+                        help="Run only these vendors")
+    parser.add_argument('--skip', nargs='+', choices=sorted(VENDORS), default=[], metavar='VENDOR',
+                        help="Do not run these vendors")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Crawl with this many worker processes sharing a task queue (see work_queue.py)")
+    parser.add_argument('--subprocess', action='store_true',
+                        help="Run each Python scraper in its own interpreter instead of in this process")
+    parser.add_argument('--output-dir', default=current_dir,
+                        help="Directory the JSON files are written to (default: next to main.py)")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument('--refresh', action='store_true',
+                       help="Ignore cached pages and download everything again")
+    cache.add_argument('--offline', action='store_true',
+                       help="Only use cached pages, never touch the network")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue interrupted vendors from their checkpoint instead of starting over")
+    parser.add_argument('--puppeteer', action='store_true',
+                        help="Scrape DigitalOcean with the original puppeteer script instead of Python")
+    parser.add_argument('--extract', action='store_true',
+                        help="Re-extract records from the archived page snapshots on all CPU cores, without the network")
+    parser.add_argument('--storage', choices=['json', 'sqlite', 'both'],
+                        help="Save records to the JSON files, the SQLite store or both (default: json)")
+    parser.add_argument('--champions', action='store_true',
+                        help="Afterwards, merge the testimonials of all vendors into champions.json")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the parse stage with cProfile (saved next to the run report)")
+    parser.add_argument('--budget', type=int,
+                        help="Fetch at most this many case study pages, the ones most likely to have changed "
+                             "(default: SCRAPER_REQUEST_BUDGET, 0 for all)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Print the run plan (what would be fetched or deferred) and exit")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep running: refresh the vendors on a schedule and answer lookups over a local "
+                             "HTTP API (see python_files/daemon.py)")
+    parser.add_argument('--report-dead', action='store_true',
+                        help="List the dead links recorded for the selected vendors and exit")
+    return parser.parse_args(argv)
+
+
+def apply_setting(env_name, attribute, value):
+    """Pass a setting to subprocess scrapers (environment) and in-process ones (settings module)"""
+    os.environ[env_name] = str(value)
+    setattr(settings, attribute, value)
+
+
+def select_vendors(only=None, skip=()):
+    """Return the vendor names to run, in registry order"""
+    names = [name for name in VENDORS if not only or name in only]
+    return [name for name in names if name not in skip]
+
+
+def count_records(filename):
+    """Count the records in a vendor output file, or None if it can't be read"""
+    try:
+        with open(filename, encoding='utf-8') as f:
+            return len(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def job_command(name, puppeteer=False):
+    if puppeteer and name in JS_VENDORS:
+        return JS_VENDORS[name]
+    command = [sys.executable, os.path.join(python_files_dir, f'{PLUGINS[name]}.py')]
+    return command + [name] if PLUGINS[name] == RULE_PLUGIN else command
+
+
+def run_job(name, output_dir, puppeteer=False):
+    """Run one vendor job in a subprocess and return its summary"""
+    command = job_command(name, puppeteer)
+    print(f"Running {name}: {' '.join(command)}")
+    run_stats.clear(name)
+    metrics.clear(name)
+    start = time.perf_counter()
+    try:
+        returncode = subprocess.run(command, cwd=output_dir).returncode
+    except OSError as e:
+        print(f"Could not start {name}: {str(e)}")
+        returncode = None
+    elapsed = time.perf_counter() - start
+
+    records = count_records(os.path.join(output_dir, OUTPUT_FILES[name])) if returncode == 0 else None
+    return {'vendor': name, 'seconds': elapsed, 'returncode': returncode, 'records': records,
+            'stats': run_stats.read(name)}
+
+
+def print_summary(results):
+    print()
+    print(f"{'vendor':<14}{'time (s)':>10}{'status':>10}{'records':>10}{'retries':>10}{'trips':>8}")
+    for result in results:
+        if result['returncode'] is None:
+            status = 'error'
+        else:
+            status = 'ok' if result['returncode'] == 0 else f"exit {result['returncode']}"
+        records = '-' if result['records'] is None else result['records']
+        retries = result['stats'].get('retries', '-')
+        trips = result['stats'].get('breaker_trips', '-')
+        print(f"{result['vendor']:<14}{result['seconds']:>10.1f}{status:>10}{records:>10}{retries:>10}{trips:>8}")
 
-# Function to execute the JS file
-def run_js_file():
-    print(f"Running {js_file}")
-    subprocess.run(['node', js_file], check=True)
 
 # Main execution
-def main():
-    run_python_files()
-    run_js_file()
+def main(argv=None):
+    args = parse_args(argv)
+    if args.refresh:
+        apply_setting('SCRAPER_CACHE_MODE', 'CACHE_MODE', 'refresh')
+    elif args.offline:
+        apply_setting('SCRAPER_CACHE_MODE', 'CACHE_MODE', 'offline')
+    if args.resume:
+        os.environ['SCRAPER_RESUME'] = '1'
+        settings.RESUME = True
+    if args.storage:
+        apply_setting('SCRAPER_STORAGE', 'STORAGE', args.storage)
+    if args.profile:
+        os.environ['SCRAPER_PROFILE'] = '1'
+        settings.PROFILE = True
+    if args.budget is not None:
+        apply_setting('SCRAPER_REQUEST_BUDGET', 'REQUEST_BUDGET', args.budget)
+
+    vendors = select_vendors(args.only, args.skip)
+    if not vendors:
+        print("No vendors selected")
+        return 0
+
+    if args.report_dead:
+        import dead_links
+        dead_links.report(vendors)
+        return 0
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    # The scrapers write their JSON files (and the SQLite store) relative to the working directory
+    os.chdir(output_dir)
+    js_jobs = [name for name in vendors if args.puppeteer and name in JS_VENDORS]
+    python_jobs = [name for name in vendors if name not in js_jobs]
+
+    start = time.perf_counter()
+    if args.extract:
+        from reextract import reextract
+        results = reextract(python_jobs)
+        print_summary(results)
+        metrics.write_run_report(results, time.perf_counter() - start)
+        return 0 if all(result['returncode'] == 0 for result in results) else 1
+
+    if args.daemon:
+        from daemon import run_daemon
+        return run_daemon(python_jobs, args.jobs)
+
+    if args.dry_run or (settings.REQUEST_BUDGET and settings.CACHE_MODE != 'refresh'):
+        import scheduler
+        from runner import frontier
+        plan = scheduler.make_plan({name: frontier(name) for name in python_jobs}, settings.REQUEST_BUDGET)
+        scheduler.print_plan(plan, settings.REQUEST_BUDGET)
+        if args.dry_run:
+            return 0
+        scheduler.save_plan(plan, settings.REQUEST_BUDGET)
+        # The scrapers, in this process or not, defer what the plan defers
+        os.environ['SCRAPER_SCHEDULE'] = '1'
+        settings.SCHEDULE = True
+
+    results = []
+    # Start the Node job alongside the Python scrapers instead of after them
+    with ThreadPoolExecutor(max_workers=max(1, len(js_jobs))) as js_pool, \
+            ThreadPoolExecutor(max_workers=max(1, args.jobs)) as python_pool:
+        futures = [js_pool.submit(run_job, name, output_dir, True) for name in js_jobs]
+        if args.workers > 0:
+            from work_queue import run_workers
+            if python_jobs:
+                results += run_workers(python_jobs, args.workers)
+        elif args.subprocess:
+            futures += [python_pool.submit(run_job, name, output_dir) for name in python_jobs]
+        elif python_jobs:
+            results += run_vendors(python_jobs, args.jobs)
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    results.sort(key=lambda result: vendors.index(result['vendor']))
+    if settings.STORAGE != 'json':
+        import store
+        # The Node scrapers only write JSON; load their files into the store too
+        for result in results:
+            if result['vendor'] in js_jobs and result['returncode'] == 0:
+                store.import_file(result['vendor'], OUTPUT_FILES[result['vendor']], indent=2)
+    print_summary(results)
+    wall_seconds = time.perf_counter() - start
+    print(f"\nTotal wall time: {wall_seconds:.1f}s")
+    metrics.write_run_report(results, wall_seconds)
+    if args.champions:
+        from champions import build_champions
+        build_champions(OUTPUT_FILES, storage='sqlite' if settings.STORAGE == 'sqlite' else 'json')
+    return 0 if all(result['returncode'] == 0 for result in results) else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
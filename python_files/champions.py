@@ -0,0 +1,223 @@
+"""
+Cross-vendor champion deduplication.
+
+Reads every vendor's output, normalises person and company names and merges
+the testimonials that belong to the same person at the same company into one
+champion record, listing every vendor it appears under.
+
+Candidates are found with a multi-pass sorted-neighbourhood index: the
+distinct spellings are sorted by a few keys (company then name, surname then
+first name, reversed name) and each is compared only with its next WINDOW
+neighbours in every order. One typo still leaves the others in sort order, and
+the work grows about linearly with the corpus instead of with its square.
+
+    python python_files/champions.py [--output champions.json] [--storage json|sqlite]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import settings
+import store
+
+# Names that mean the extractor didn't find a person
+PLACEHOLDER_NAMES = {'', 'unknown', 'unknown name', 'n a'}
+PLACEHOLDER_TITLES = {'unknown', 'unknown title', 'n a'}
+
+NAME_SIMILARITY = 0.85
+COMPANY_SIMILARITY = 0.5
+# Neighbours each spelling is compared with in every sort order
+WINDOW = 8
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Mention:
+    """One testimonial, with the normalised keys used for matching"""
+    __slots__ = ('vendor', 'record', 'name', 'company', 'name_key', 'company_key', 'company_compact',
+                 'company_grams')
+
+    def __init__(self, vendor, record):
+        testimonial = record.get('testimonial') or {}
+        self.vendor = vendor
+        self.record = record
+        self.name = testimonial.get('name') or ''
+        self.company = record.get('company') or testimonial.get('company') or ''
+        self.name_key = store.normalise(self.name)
+        self.company_key = store.company_key(self.company)
+        self.company_compact = self.company_key.replace(' ', '')
+        self.company_grams = _trigrams(self.company_compact)
+
+    def sort_keys(self):
+        """One key per sorted-neighbourhood pass"""
+        tokens = self.name_key.split() or ['']
+        return (
+            (self.company_compact, self.name_key),
+            (tokens[-1], tokens[0], self.company_compact),
+            (self.name_key[::-1], self.company_compact),
+        )
+
+
+def same_name(a, b):
+    if a.name_key == b.name_key:
+        return True
+    # Upper bound of the ratio from the lengths alone (SequenceMatcher.real_quick_ratio)
+    shorter, longer = sorted((len(a.name_key), len(b.name_key)))
+    if 2 * shorter / (shorter + longer) < NAME_SIMILARITY:
+        return False
+    matcher = SequenceMatcher(None, a.name_key, b.name_key)
+    return matcher.quick_ratio() >= NAME_SIMILARITY and matcher.ratio() >= NAME_SIMILARITY
+
+
+def same_company(a, b):
+    if not a.company_compact or not b.company_compact:
+        # Unknown company: only trust an exact name match
+        return a.name_key == b.name_key
+    if a.company_compact == b.company_compact:
+        return True
+    shorter, longer = sorted((a.company_compact, b.company_compact), key=len)
+    # "gannett" vs "gannettusatodaynetwork"
+    if len(shorter) >= 3 and longer.startswith(shorter):
+        return True
+    overlap = len(a.company_grams & b.company_grams)
+    return overlap / len(a.company_grams | b.company_grams) >= COMPANY_SIMILARITY
+
+
+def is_match(a, b):
+    # The company check is the cheaper one
+    return same_company(a, b) and same_name(a, b)
+
+
+def resolve(mentions):
+    """Group mentions of the same person at the same company; returns lists of mentions"""
+    mentions = [mention for mention in mentions if mention.name_key not in PLACEHOLDER_NAMES]
+    groups = _UnionFind(len(mentions))
+
+    # Exact duplicates are merged up front, so only distinct spellings are compared
+    exact = {}
+    for index, mention in enumerate(mentions):
+        key = (mention.name_key, mention.company_compact)
+        if key in exact:
+            groups.union(exact[key], index)
+        else:
+            exact[key] = index
+
+    distinct = list(exact.values())
+    keys = {index: mentions[index].sort_keys() for index in distinct}
+    for sort_pass in range(len(keys[distinct[0]]) if distinct else 0):
+        ordered = sorted(distinct, key=lambda index: keys[index][sort_pass])
+        for position, i in enumerate(ordered):
+            for j in ordered[position + 1:position + 1 + WINDOW]:
+                if groups.find(i) != groups.find(j) and is_match(mentions[i], mentions[j]):
+                    groups.union(i, j)
+
+    clusters = defaultdict(list)
+    for index, mention in enumerate(mentions):
+        clusters[groups.find(index)].append(mention)
+    return list(clusters.values())
+
+
+def _most_common(values):
+    counts = defaultdict(int)
+    for value in values:
+        if value:
+            counts[value] += 1
+    return max(counts, key=lambda value: (counts[value], len(value)), default='')
+
+
+def champion(cluster):
+    """Merged record for one cluster of mentions"""
+    sources = []
+    for mention in cluster:
+        testimonial = mention.record.get('testimonial') or {}
+        sources.append({
+            'vendor': mention.vendor,
+            'company': mention.company,
+            'title': testimonial.get('title'),
+            'URL': testimonial.get('URL'),
+        })
+    return {
+        'name': _most_common(mention.name for mention in cluster),
+        'company': _most_common(mention.company for mention in cluster),
+        'vendors': sorted({mention.vendor for mention in cluster}),
+        'companies': sorted({mention.company for mention in cluster if mention.company}),
+        'titles': sorted({source['title'] for source in sources
+                          if source['title'] and store.normalise(source['title']) not in PLACEHOLDER_TITLES}),
+        'sources': sources,
+    }
+
+
+def load_mentions(output_files, storage='json'):
+    """Mentions from every vendor's output: {vendor: filename} JSON files or the SQLite store"""
+    mentions = []
+    if storage == 'sqlite':
+        connection = store.connect()
+        try:
+            for vendor in output_files:
+                mentions += [Mention(vendor, record) for record in store.current_records(connection, vendor)]
+        finally:
+            connection.close()
+        return mentions
+    for vendor, filename in output_files.items():
+        try:
+            with open(filename, encoding='utf-8') as f:
+                mentions += [Mention(vendor, record) for record in json.load(f)]
+        except (OSError, ValueError) as e:
+            print(f"Skipping {vendor}: {str(e)}")
+    return mentions
+
+
+def build_champions(output_files, filename='champions.json', storage='json'):
+    """Resolve the champions across vendors and save them; returns the champion records"""
+    start = time.perf_counter()
+    mentions = load_mentions(output_files, storage)
+    champions = [champion(cluster) for cluster in resolve(mentions)]
+    champions.sort(key=lambda record: (-len(record['vendors']), record['name'].lower()))
+    tmp_path = f'{filename}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(champions, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, filename)
+    across = sum(1 for record in champions if len(record['vendors']) > 1)
+    print(f"Resolved {len(mentions)} testimonials into {len(champions)} champions "
+          f"({across} across several vendors) in {time.perf_counter() - start:.2f}s, saved to {filename}")
+    return champions
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import OUTPUT_FILES
+
+    parser = argparse.ArgumentParser(description="Merge the testimonials of every vendor into champions.")
+    parser.add_argument('--output', default='champions.json')
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='sqlite' if settings.STORAGE == 'sqlite' else 'json',
+                        help="Read the vendor JSON files or the SQLite store")
+    args = parser.parse_args(argv)
+    build_champions(OUTPUT_FILES, args.output, args.storage)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Long-running scraper daemon with a local query API, started with:
+
+    python main.py --daemon [--only VENDOR ...] [--storage sqlite] [--budget N]
+
+It scrapes the selected vendors in its own process, the way main.py does,
+every SCRAPER_DAEMON_INTERVAL seconds (six hours by default). A vendor is
+scraped straight away at start-up if its output is older than that. The fetch
+engine's connection pools, the parse pool, the imported scrapers, the
+compiled rule files and DigitalOcean's browser pool stay up between refreshes;
+the retry counters are reset before each one and the HTTP cache is pruned
+after it.
+With a request budget, each scheduled refresh follows a plan (see
+scheduler.py).
+
+The latest records of every vendor are held in memory. They are indexed by
+normalised company, person (the same matching as store.py) and URL, loaded
+from the output files (or the SQLite store) at start-up, and replaced after
+every refresh. The API listens on SCRAPER_DAEMON_HOST:SCRAPER_DAEMON_PORT
+(127.0.0.1:8766), or on the Unix socket SCRAPER_DAEMON_SOCKET if set:
+
+    curl 'http://127.0.0.1:8766/lookup?company=Bank%20Hapoalim'
+    curl 'http://127.0.0.1:8766/lookup?name=chris%20waters&vendor=datadog'
+    curl -X POST http://127.0.0.1:8766/refresh/fastly      # everything, ignoring the budget
+    curl http://127.0.0.1:8766/status
+    curl http://127.0.0.1:8766/metrics                     # Prometheus text format
+    curl --unix-socket /tmp/scraper.sock http://daemon/status
+"""
+import json
+import os
+import queue
+import signal
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import http_cache
+import metrics
+import parse_pool
+import resilience
+import settings
+import store
+from runner import frontier, load_plugin, run_vendors
+
+IDLE, QUEUED, RUNNING = 'idle', 'queued', 'running'
+
+
+def load_records(vendor):
+    """The vendor's records from its last save, or [] if there are none yet"""
+    if settings.STORAGE == 'sqlite':
+        connection = store.connect()
+        try:
+            return store.current_records(connection, vendor)
+        finally:
+            connection.close()
+    try:
+        with open(load_plugin(vendor).OUTPUT_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def last_saved(vendor):
+    """When the vendor's records were last saved, or None"""
+    if settings.STORAGE == 'sqlite':
+        saved = {row['vendor']: row['saved_at'] for row in store.stats()}
+        return saved.get(vendor)
+    try:
+        return os.path.getmtime(load_plugin(vendor).OUTPUT_FILE)
+    except OSError:
+        return None
+
+
+class RecordIndex:
+    """The current testimonials of every vendor, indexed for lookups"""
+
+    def __init__(self):
+        self.entries = {}
+        # By company key, person key and URL: lists of (company key, person key, testimonial).
+        # Replaced as a whole after a refresh, so lookups never need the lock
+        self.indexes = ({}, {}, {})
+        self._lock = threading.Lock()
+
+    def replace(self, vendor, records):
+        """Swap in a vendor's new records"""
+        entries = []
+        for record in records:
+            testimonial = record.get('testimonial') or {}
+            company = record.get('company') or testimonial.get('company') or ''
+            name = testimonial.get('name') or ''
+            entries.append((store.company_key(company), store.normalise(name),
+                            {'vendor': vendor, 'company': company, 'name': name,
+                             'title': testimonial.get('title'), 'url': testimonial.get('URL') or ''}))
+        with self._lock:
+            self.entries = {**self.entries, vendor: entries}
+            by_company, by_name, by_url = {}, {}, {}
+            for vendor_entries in self.entries.values():
+                for entry in vendor_entries:
+                    by_company.setdefault(entry[0], []).append(entry)
+                    by_name.setdefault(entry[1], []).append(entry)
+                    by_url.setdefault(entry[2]['url'], []).append(entry)
+            self.indexes = (by_company, by_name, by_url)
+
+    def count(self, vendor=None):
+        if vendor is not None:
+            return len(self.entries.get(vendor, ()))
+        return sum(len(entries) for entries in self.entries.values())
+
+    def lookup(self, company=None, name=None, vendor=None, url=None):
+        """Testimonials matching every criterion given, like store.lookup"""
+        by_company, by_name, by_url = self.indexes
+        company = store.company_key(company) if company else None
+        name = store.normalise(name) if name else None
+        if url:
+            candidates = by_url.get(url, ())
+        elif company is not None:
+            candidates = by_company.get(company, ())
+        elif name is not None:
+            candidates = by_name.get(name, ())
+        else:
+            candidates = self.entries.get(vendor, ())
+        return [testimonial for company_key, name_key, testimonial in candidates
+                if (company is None or company_key == company) and (name is None or name_key == name)
+                and (vendor is None or testimonial['vendor'] == vendor) and (not url or testimonial['url'] == url)]
+
+
+class Daemon:
+    def __init__(self, vendors, jobs):
+        self.vendors = vendors
+        self.jobs = jobs
+        self.index = RecordIndex()
+        self.started_at = time.time()
+        self.state = {vendor: {'state': IDLE, 'next_due': 0.0, 'refreshes': 0, 'last_started': None,
+                               'last_finished': None, 'seconds': None, 'returncode': None}
+                      for vendor in vendors}
+        # The latest run summary of each vendor, and the wall time of the last refresh, for /metrics
+        self.results = {}
+        self.wall_seconds = 0.0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.lock = threading.Lock()
+        self.refreshes = queue.Queue()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        """Load the saved records, warm the pools up and start the scheduler"""
+        for vendor in self.vendors:
+            load_plugin(vendor)
+            self.index.replace(vendor, load_records(vendor))
+            saved = last_saved(vendor)
+            self.state[vendor]['next_due'] = saved + settings.DAEMON_INTERVAL if saved else 0.0
+        parse_pool.warm_up()
+        print(f"Loaded {self.index.count()} records of {len(self.vendors)} vendors")
+        for target in (self._schedule, self._work):
+            thread = threading.Thread(target=target, name=f'daemon-{target.__name__[1:]}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Let the refresh in progress finish, then stop"""
+        self.stopping.set()
+        self.refreshes.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def refresh(self, vendors, planned=False):
+        """Queue a refresh of the vendors that aren't queued or running already; returns those"""
+        with self.lock:
+            vendors = [vendor for vendor in vendors if self.state[vendor]['state'] == IDLE]
+            for vendor in vendors:
+                self.state[vendor]['state'] = QUEUED
+        if vendors:
+            self.refreshes.put((vendors, planned))
+        return vendors
+
+    def _schedule(self):
+        while not self.stopping.is_set():
+            now = time.time()
+            with self.lock:
+                due = [vendor for vendor, state in self.state.items() if state['next_due'] <= now]
+                waiting = [state['next_due'] for state in self.state.values() if state['state'] == IDLE]
+            self.refresh(due, planned=True)
+            # Wake up for the next vendor due, and at least once a minute
+            wait = min(waiting, default=now + 60) - now
+            self.stopping.wait(min(max(wait, 1), 60))
+
+    def _work(self):
+        while True:
+            batch = self.refreshes.get()
+            if batch is None:
+                return
+            vendors, planned = batch
+            try:
+                if not self.stopping.is_set():
+                    self._refresh(vendors, planned)
+            except Exception as e:
+                print(f"Refresh of {', '.join(vendors)} failed: {str(e)}")
+            finally:
+                with self.lock:
+                    for vendor in vendors:
+                        self.state[vendor].update(state=IDLE, next_due=time.time() + settings.DAEMON_INTERVAL)
+
+    def _refresh(self, vendors, planned):
+        print(f"Refreshing {', '.join(vendors)}")
+        start = time.perf_counter()
+        with self.lock:
+            for vendor in vendors:
+                self.state[vendor].update(state=RUNNING, last_started=time.time())
+        # Refreshes run one at a time, so the process-wide settings can follow each one's plan
+        settings.SCHEDULE = False
+        if planned and settings.REQUEST_BUDGET and settings.CACHE_MODE != 'refresh':
+            import scheduler
+            plan = scheduler.make_plan({vendor: frontier(vendor) for vendor in vendors}, settings.REQUEST_BUDGET)
+            scheduler.print_plan(plan, settings.REQUEST_BUDGET)
+            scheduler.save_plan(plan, settings.REQUEST_BUDGET)
+            settings.SCHEDULE = True
+
+        # The run reports count this refresh's retries and breaker trips only
+        resilience.reset_stats()
+        results = run_vendors(vendors, self.jobs)
+        # Nothing else prunes the cache: the daemon doesn't exit
+        http_cache.prune()
+        self.wall_seconds = time.perf_counter() - start
+        metrics.write_run_report(list(self.results.values()) + results, self.wall_seconds)
+        for result in results:
+            vendor = result['vendor']
+            if result['returncode'] == 0:
+                self.index.replace(vendor, load_records(vendor))
+            with self.lock:
+                self.results[vendor] = result
+                self.state[vendor].update(last_finished=time.time(), seconds=result['seconds'],
+                                          returncode=result['returncode'],
+                                          refreshes=self.state[vendor]['refreshes'] + 1)
+        print(f"Refreshed {', '.join(vendors)} in {self.wall_seconds:.1f}s")
+
+    def lookup(self, **criteria):
+        start = time.perf_counter()
+        matches = self.index.lookup(**criteria)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.lookups += 1
+            self.lookup_seconds += elapsed
+        return matches, elapsed
+
+    def status(self):
+        with self.lock:
+            return {
+                'started_at': self.started_at,
+                'uptime_seconds': time.time() - self.started_at,
+                'interval_seconds': settings.DAEMON_INTERVAL,
+                'records': self.index.count(),
+                'lookups': self.lookups,
+                'vendors': {vendor: dict(state, records=self.index.count(vendor))
+                            for vendor, state in self.state.items()},
+            }
+
+    def prometheus(self):
+        """The last run report of every vendor plus the daemon's own numbers, in Prometheus text format"""
+        with self.lock:
+            results = list(self.results.values())
+            lookups, lookup_seconds = self.lookups, self.lookup_seconds
+        text = metrics.prometheus(metrics.run_report(results, self.wall_seconds)) if results else ''
+        lines = [
+            '# HELP scraper_daemon_uptime_seconds Time since the daemon started',
+            '# TYPE scraper_daemon_uptime_seconds gauge',
+            f'scraper_daemon_uptime_seconds {time.time() - self.started_at}',
+            '# HELP scraper_daemon_records Records held in memory',
+            '# TYPE scraper_daemon_records gauge',
+        ]
+        lines += [f'scraper_daemon_records{{vendor="{vendor}"}} {self.index.count(vendor)}' for vendor in self.vendors]
+        lines += [
+            '# HELP scraper_daemon_lookups_total Lookups answered',
+            '# TYPE scraper_daemon_lookups_total counter',
+            f'scraper_daemon_lookups_total {lookups}',
+            '# HELP scraper_daemon_lookup_seconds_total Time spent answering lookups',
+            '# TYPE scraper_daemon_lookup_seconds_total counter',
+            f'scraper_daemon_lookup_seconds_total {lookup_seconds}',
+        ]
+        return text + '\n'.join(lines) + '\n'
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        daemon = self.server.scraper
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == '/lookup':
+            criteria = {key: params.get(key) for key in ('company', 'name', 'vendor', 'url')}
+            if not any(criteria.values()):
+                self.send_json(400, {'error': "give at least one of company, name, vendor and url"})
+                return
+            matches, elapsed = daemon.lookup(**criteria)
+            self.send_json(200, {'matches': matches, 'microseconds': round(elapsed * 1e6, 1)})
+        elif url.path == '/status':
+            self.send_json(200, daemon.status())
+        elif url.path == '/metrics':
+            self.send_body(200, daemon.prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self.send_json(404, {'error': f'no such endpoint: {url.path}'})
+
+    def do_POST(self):
+        daemon = self.server.scraper
+        url = urlsplit(self.path)
+        if url.path != '/refresh' and not url.path.startswith('/refresh/'):
+            self.send_json(404, {'error': f'no such endpoint: {url.path}'})
+            return
+        # /refresh/<vendor>, /refresh?vendor=a&vendor=b, or /refresh for all of them
+        vendors = [name for name in url.path.split('/')[2:] if name] + parse_qs(url.query).get('vendor', [])
+        unknown = [vendor for vendor in vendors if vendor not in daemon.state]
+        if unknown:
+            self.send_json(404, {'error': f"unknown vendor: {', '.join(unknown)}"})
+            return
+        self.send_json(202, {'queued': daemon.refresh(vendors or daemon.vendors)})
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        # Lookups can come in fast; only errors are printed
+        pass
+
+    def log_error(self, format, *args):
+        print(f"API error: {format % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(daemon):
+    if settings.DAEMON_SOCKET:
+        if os.path.exists(settings.DAEMON_SOCKET):
+            os.remove(settings.DAEMON_SOCKET)
+        server = UnixHTTPServer(settings.DAEMON_SOCKET, Handler)
+        where = settings.DAEMON_SOCKET
+    else:
+        server = ThreadingHTTPServer((settings.DAEMON_HOST, settings.DAEMON_PORT), Handler)
+        where = f'http://{settings.DAEMON_HOST}:{server.server_address[1]}'
+    server.scraper = daemon
+    return server, where
+
+
+def run_daemon(vendors, jobs):
+    """Serve the API and refresh the vendors until interrupted (Ctrl-C or SIGTERM)"""
+    settings.BROWSER_KEEP_WARM = True
+    daemon = Daemon(vendors, jobs)
+    server, where = make_server(daemon)
+    daemon.start()
+    # serve_forever runs in this thread; shutdown has to come from another one
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Daemon listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping the daemon")
+        server.server_close()
+        daemon.stop()
+        if 'digitalocean' in vendors:
+            load_plugin('digitalocean').close_browser_pool()
+        if settings.DAEMON_SOCKET and os.path.exists(settings.DAEMON_SOCKET):
+            os.remove(settings.DAEMON_SOCKET)
+    return 0
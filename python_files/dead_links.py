@@ -0,0 +1,84 @@
+"""
+Negative cache for case study URLs that are gone (404/410) or where extraction
+found nothing. Entries are kept per vendor in .cache/dead_links/<vendor>.json
+and skipped until they expire.
+
+Run this file to list the current entries, e.g. to prune the slug lists:
+    python python_files/dead_links.py [vendor ...]
+"""
+import os
+import sys
+import time
+
+import json_state
+import settings
+
+DEAD_LINKS_DIR = os.path.join(settings.CACHE_DIR, 'dead_links')
+
+
+class DeadLinks:
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.path = os.path.join(DEAD_LINKS_DIR, f'{vendor}.json')
+        self.entries = json_state.read(self.path, {})
+        # URLs recorded or forgotten since the entries were read
+        self.changed = set()
+
+    def is_dead(self, url):
+        """True if url is recorded as dead and the entry hasn't expired"""
+        entry = self.entries.get(url)
+        return entry is not None and entry['expires_at'] > time.time()
+
+    def reason(self, url):
+        """Why url is recorded as dead ('gone' or 'empty'), or None if it isn't"""
+        return self.entries[url]['reason'] if self.is_dead(url) else None
+
+    def record(self, url, reason, status=None):
+        now = time.time()
+        self.entries[url] = {
+            'reason': reason,
+            'status': status,
+            'recorded_at': now,
+            'expires_at': now + settings.DEAD_LINK_TTL_DAYS * 86400,
+        }
+        self.changed.add(url)
+
+    def forget(self, url):
+        if self.entries.pop(url, None) is not None:
+            self.changed.add(url)
+
+    def save(self):
+        """Write the changed entries, merged with those other processes saved meanwhile"""
+        with json_state.locked(self.path):
+            self.entries = json_state.merge(json_state.read(self.path, {}), self.entries, self.changed)
+            json_state.write(self.path, self.entries, indent=2)
+        self.changed.clear()
+
+
+def report(vendors=None):
+    """Print every recorded dead link, grouped by vendor"""
+    try:
+        files = sorted(os.listdir(DEAD_LINKS_DIR))
+    except FileNotFoundError:
+        files = []
+    found = False
+    now = time.time()
+    for name in files:
+        vendor = name[:-len('.json')]
+        if not name.endswith('.json') or (vendors and vendor not in vendors):
+            continue
+        entries = DeadLinks(vendor).entries
+        if not entries:
+            continue
+        found = True
+        print(f"{vendor} ({len(entries)} dead links)")
+        for url, entry in sorted(entries.items()):
+            status = f" {entry['status']}" if entry['status'] else ''
+            state = 'expired' if entry['expires_at'] <= now else time.strftime('until %Y-%m-%d', time.localtime(entry['expires_at']))
+            print(f"  {url}  [{entry['reason']}{status}, {state}]")
+    if not found:
+        print("No dead links recorded")
+
+
+if __name__ == "__main__":
+    report(sys.argv[1:])
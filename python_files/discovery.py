@@ -0,0 +1,119 @@
+"""
+Case study URL discovery from the vendors' sitemaps.
+
+The sitemaps listed in a site's robots.txt (or /sitemap.xml) are read,
+following sitemap indexes, and every <loc> matching the vendor's case study
+pattern is turned back into the scraper's own URL format with page_url(slug),
+so it deduplicates against the hand-maintained slug list. The result is the
+known pages plus any new ones, with the <lastmod> of each page the sitemap
+gives one for (see lastmod.py).
+
+Turn it off with SCRAPER_DISCOVERY=0 to use only the slug lists.
+"""
+import gzip
+import re
+from collections import namedtuple
+from urllib.parse import unquote, urljoin
+from xml.etree import ElementTree
+
+import requests
+
+import settings
+from fetch_engine import fetch, fetch_all
+
+# pages: {url: site} to scrape; lastmod: {url: lastmod} for pages the sitemap dates
+Frontier = namedtuple('Frontier', ['pages', 'lastmod'])
+
+# Sitemap indexes nested deeper than this are not followed
+MAX_DEPTH = 3
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _body(response):
+    content = response.content
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    return content
+
+
+def parse_sitemap(content):
+    """Return (child sitemap URLs, [(url, lastmod)]) from a sitemap or sitemap index"""
+    root = ElementTree.fromstring(content)
+    children = []
+    urls = []
+    for entry in root:
+        fields = {_local_name(child.tag): (child.text or '').strip() for child in entry}
+        if not fields.get('loc'):
+            continue
+        if _local_name(entry.tag) == 'sitemap':
+            children.append(fields['loc'])
+        else:
+            urls.append((fields['loc'], fields.get('lastmod')))
+    return children, urls
+
+
+def sitemap_locations(site_url):
+    """Sitemaps a site declares in robots.txt, or its /sitemap.xml"""
+    try:
+        response = fetch(urljoin(site_url, '/robots.txt'))
+        if response.status_code == 200:
+            found = re.findall(r'^\s*sitemap:\s*(\S+)', response.text, re.IGNORECASE | re.MULTILINE)
+            if found:
+                return found
+    except requests.exceptions.RequestException as e:
+        print(f"Could not read robots.txt of {site_url}: {str(e)}")
+    return [urljoin(site_url, '/sitemap.xml')]
+
+
+def sitemap_entries(sitemaps):
+    """Yield (url, lastmod) for every page in the sitemaps, following indexes"""
+    seen = set()
+    for _ in range(MAX_DEPTH):
+        sitemaps = [url for url in sitemaps if url not in seen]
+        if not sitemaps:
+            return
+        seen.update(sitemaps)
+        children = []
+        for url, response, error in fetch_all(sitemaps):
+            if error is None and response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+            if error is not None:
+                print(f"Could not read sitemap {url}: {str(error)}")
+                continue
+            try:
+                nested, entries = parse_sitemap(_body(response))
+            except (ElementTree.ParseError, OSError) as e:
+                print(f"Could not parse sitemap {url}: {str(e)}")
+                continue
+            children += nested
+            yield from entries
+        sitemaps = children
+
+
+def discover(vendor, known_pages, site_url, pattern, page_url):
+    """
+    Return the Frontier for a vendor: known_pages ({url: site}) plus every
+    sitemap URL of site_url matching pattern, whose 'slug' group is passed to
+    page_url to build the URL the scraper uses.
+    """
+    pages = dict(known_pages)
+    if not settings.DISCOVERY:
+        return Frontier(pages, {})
+
+    lastmod = {}
+    for loc, modified in sitemap_entries(sitemap_locations(site_url)):
+        match = pattern.match(loc)
+        if not match:
+            continue
+        slug = unquote(match.group('slug')).lower()
+        url = page_url(slug)
+        # Keep the hand-written slug (used for company names) of known pages
+        pages.setdefault(url, slug)
+        if modified:
+            lastmod[url] = modified
+    new = len(pages) - len(known_pages)
+    print(f"Discovered {len(pages)} {vendor} pages ({new} not in the known list, {len(lastmod)} dated)")
+    return Frontier(pages, lastmod)
@@ -0,0 +1,447 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlsplit
+
+import requests
+
+import fingerprints
+import http_cache
+import metrics
+import parse_pool
+import run_stats
+import scheduler
+import settings
+import snapshots
+import streaming
+from dead_links import DeadLinks
+from http_session import get_session
+from lastmod import LastModified
+from output import RecordWriter
+from parsing import make_soup
+from rate_limit import limiter_for
+from resilience import host_stats, resilient_get
+
+GLOBAL_CONCURRENCY = settings.GLOBAL_CONCURRENCY
+PER_HOST_CONCURRENCY = settings.PER_HOST_CONCURRENCY
+
+# Responses that mean the page is gone rather than temporarily failing
+DEAD_STATUSES = (404, 410)
+
+# A fetched case study page, handed to the vendor's extract function
+Page = namedtuple('Page', ['url', 'site', 'soup'])
+
+
+def mirrored(url):
+    """Rewrite url to point at settings.MIRROR_URL, if one is configured"""
+    if not settings.MIRROR_URL:
+        return url
+    parts = urlsplit(url)
+    query = f'?{parts.query}' if parts.query else ''
+    return f"{settings.MIRROR_URL.rstrip('/')}/{parts.netloc}{parts.path}{query}"
+
+
+def _paced_get(url, headers, stream_until=None):
+    """
+    GET over the shared keep-alive session, paced by the host's rate limiter.
+    With stream_until (a streaming.Target) the download stops once that
+    element has closed (see streaming.read_until), and its markup is set as
+    response.fragment.
+    """
+    limiter = limiter_for(url)
+    with metrics.timed('throttle', url):
+        limiter.acquire()
+    with metrics.timed('download', url):
+        response = get_session().get(mirrored(url), headers=headers, stream=stream_until is not None,
+                                     timeout=(settings.CONNECT_TIMEOUT, settings.READ_TIMEOUT))
+        if stream_until is not None and response.status_code == 200:
+            fragment = streaming.read_until(response, stream_until)
+            if fragment is not None:
+                response.fragment = fragment
+                metrics.count('streamed', url=url)
+        elif stream_until is not None:
+            # Error and 304 bodies are read in full, as without streaming
+            response.content
+    # Bytes read off the wire, before content decoding
+    metrics.count('bytes_downloaded', response.raw.tell() if response.raw else len(response.content), url)
+    limiter.feedback(response.status_code, response.headers.get('Retry-After'))
+    return response
+
+
+def _network_get(url, headers, stream_until=None):
+    """Paced GET with retries and the host's circuit breaker"""
+    return resilient_get(lambda url, headers: _paced_get(url, headers, stream_until), url, headers)
+
+
+def fetch(url, stream_until=None, record_version=None):
+    """
+    Fetch a single URL (blocking) through the HTTP cache, streaming it with
+    stream_until; a stored record is only reused if it was made by the
+    extractor at record_version (see http_cache.cached_get)
+    """
+    if stream_until is None or not settings.STREAMING:
+        return http_cache.cached_get(_network_get, url, record_version)
+    return http_cache.cached_get(lambda url, headers: _network_get(url, headers, stream_until), url, record_version)
+
+
+class FetchEngine:
+    """
+    One asyncio loop on a background thread that runs blocking fetches in a
+    thread pool, under a global and a per-host concurrency cap. Every
+    scraper in the process shares it, so the caps hold across vendors.
+    """
+
+    def __init__(self, concurrency=GLOBAL_CONCURRENCY, per_host=PER_HOST_CONCURRENCY):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.loop = asyncio.new_event_loop()
+        # Only touched from the loop thread
+        self.global_limit = None
+        self.host_limits = {}
+        threading.Thread(target=self.loop.run_forever, name='fetch-engine', daemon=True).start()
+
+    async def _fetch_one(self, url, stream_until=None, record_version=None):
+        """Fetch one URL in the thread pool once both the host and global limits allow it"""
+        if self.global_limit is None:
+            self.global_limit = asyncio.Semaphore(self.concurrency)
+        host = urlsplit(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        # Take the host slot first so a busy host doesn't hold global slots while it waits
+        async with self.host_limits[host]:
+            async with self.global_limit:
+                try:
+                    response = await self.loop.run_in_executor(self.executor, fetch, url, stream_until, record_version)
+                    return url, response, None
+                except requests.exceptions.RequestException as e:
+                    return url, None, e
+
+    def fetch_all(self, urls, stream_until=None, window=None, record_version=None):
+        """
+        Fetch all URLs concurrently and yield (url, response, error) as each one completes.
+        Exactly one of response and error is None. See fetch for stream_until
+        and record_version.
+        At most window (SCRAPER_FETCH_WINDOW) pages are downloading or waiting
+        to be taken at a time, so a slow consumer holds back the downloads.
+        """
+        urls = iter(urls)
+        finished = queue.Queue()
+        futures = set()
+
+        def submit():
+            url = next(urls, None)
+            if url is not None:
+                future = asyncio.run_coroutine_threadsafe(self._fetch_one(url, stream_until, record_version), self.loop)
+                future.add_done_callback(finished.put)
+                futures.add(future)
+
+        for _ in range(window or settings.FETCH_WINDOW):
+            submit()
+        try:
+            while futures:
+                future = finished.get()
+                futures.discard(future)
+                url, response, error = future.result()
+                metrics.depth('fetched', finished.qsize(), url)
+                submit()
+                yield url, response, error
+        finally:
+            # Only left over if the caller stopped iterating early
+            for future in futures:
+                future.cancel()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide fetch engine, starting it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
+
+
+def fetch_all(urls, stream_until=None, record_version=None):
+    """Fetch all URLs on the shared engine; see FetchEngine.fetch_all"""
+    return get_engine().fetch_all(urls, stream_until, record_version=record_version)
+
+
+def write_run_stats(vendor, urls):
+    """Save the retry and circuit breaker counters for the hosts behind urls"""
+    stats = host_stats({urlsplit(url).netloc for url in urls})
+    run_stats.write(vendor, {
+        'retries': stats['retries'],
+        'failures': stats['failures'],
+        'breaker_trips': stats['breaker_trips'],
+        'rejected': stats['rejected'],
+    })
+
+
+def extract_page(url, site, content, extract, parse_only=None):
+    """
+    Parse a page and run the vendor's extract function on it. With parse_only
+    the restricted tree is tried first, and the full page only if that finds nothing.
+    """
+    record = _parse_and_extract(url, site, content, extract, parse_only)
+    if record is None and parse_only is not None and settings.RESTRICTED_PARSE:
+        record = _parse_and_extract(url, site, content, extract)
+    return record
+
+
+def _extract_in_process(url, site, content, extract, parse_only=None):
+    """Parse pool task: extract_page, handing back the parse and extract timings"""
+    record = extract_page(url, site, content, extract, parse_only)
+    return record, metrics.pop_url(url)
+
+
+def _pooled_record(url, future):
+    record, timings = future.result()
+    for stage in ('parse', 'extract'):
+        if stage in timings:
+            metrics.record(stage, timings[stage], url)
+    return record
+
+
+def _parse_and_extract(url, site, content, extract, parse_only=None):
+    with metrics.timed('parse', url), metrics.profiling(url):
+        soup = make_soup(content, parse_only)
+    with metrics.timed('extract', url):
+        return extract(Page(url, site, soup))
+
+
+def scrape_pages(vendor, pages, extract, parse_only=None, lastmod=None, stream_until=None):
+    """
+    Fetch every page concurrently and call extract(page) on each one as it arrives.
+    pages maps URL -> site slug. extract returns a record, a list of records
+    (listing pages) or None. Records are returned in the order of pages;
+    pages that fail or for which extract returns None are left out.
+    See process_pages for lastmod and stream_until.
+    """
+    writer = RecordWriter(vendor, resume=settings.RESUME)
+    metrics.count('resumed', sum(1 for url in pages if url in writer.done), vendor=vendor)
+    results = process_pages(vendor, pages, extract, parse_only, lastmod, stream_until, done=writer.done)
+    try:
+        for url, record, error in results:
+            if error is None:
+                with metrics.timed('write', url):
+                    writer.add(url, record)
+    finally:
+        # Saves the caches and reports even if writing failed
+        results.close()
+        writer.close()
+
+    return collect_records(pages, writer.records)
+
+
+def process_pages(vendor, pages, extract, parse_only=None, lastmod=None, stream_until=None, done=(),
+                  complete=True):
+    """
+    Fetch pages ({url: site}) concurrently and yield (url, record, error) as
+    each one is finished. record is what extract returned, or None for pages
+    that are gone. error is set instead for pages that failed and may be tried
+    again. Known dead pages and the URLs in done are not fetched or yielded.
+    With lastmod ({url: sitemap lastmod}, see discovery.py) pages whose
+    lastmod hasn't changed since they were extracted are not fetched again;
+    complete=False means pages is only part of the vendor's pages, so the
+    stored lastmods of the others are kept. Pages the saved run plan defers
+    (see scheduler.py) are not fetched either: they keep their last record,
+    and those without one are not yielded.
+    With stream_until (a streaming.Target for the only element extract reads)
+    each download stops at that element and extract sees just its markup.
+    Downloaded pages are parsed in the parse processes (see parse_pool.py),
+    up to SCRAPER_PARSE_QUEUE at a time; while they are all busy no more
+    pages are taken from the fetch engine, which then stops downloading.
+    """
+    start = time.perf_counter()
+    metrics.track(vendor, pages)
+    dead_links = DeadLinks(vendor)
+    if settings.CACHE_MODE != 'refresh':
+        skipped = [url for url in pages if dead_links.is_dead(url)]
+        if skipped:
+            print(f"Skipping {len(skipped)} known dead pages for {vendor}")
+            for url in skipped:
+                metrics.outcome(url, 'skipped')
+        pages = {url: site for url, site in pages.items() if url not in skipped}
+
+    to_fetch = [url for url in pages if url not in done]
+    lastmod = lastmod or {}
+    modified = LastModified(vendor)
+    history = scheduler.ChangeHistory(vendor)
+    prints = fingerprints.for_extractor(vendor, extract) if settings.FINGERPRINTS else None
+    # Records stored with the HTTP cache or a lastmod are only reused if this version of extract made them
+    version = fingerprints.version_of(extract)
+    try:
+        if lastmod and settings.CACHE_MODE != 'refresh':
+            unchanged = {url: modified.unchanged(url, lastmod.get(url), version) for url in to_fetch}
+            unchanged = {url: record for url, record in unchanged.items() if record}
+            if unchanged:
+                print(f"Reusing {len(unchanged)} unchanged pages for {vendor}")
+                for url, record in unchanged.items():
+                    metrics.outcome(url, 'unchanged')
+                    history.observe(url, record)
+                    yield url, record, None
+                to_fetch = [url for url in to_fetch if url not in unchanged]
+
+        if settings.SCHEDULE and settings.CACHE_MODE != 'refresh':
+            deferred = scheduler.deferred_pages(vendor).intersection(to_fetch)
+            if deferred:
+                print(f"Deferring {len(deferred)} pages for {vendor} to a later run")
+                for url in deferred:
+                    metrics.outcome(url, 'deferred')
+                    # Pages without a record yet have nothing to keep; they wait for a later run
+                    record = history.record(url)
+                    if record:
+                        yield url, record, None
+                to_fetch = [url for url in to_fetch if url not in deferred]
+
+        archived = snapshots.archived(vendor) if settings.SNAPSHOTS else None
+
+        def archive(url, response, changed):
+            """Archive a page the first time it is seen, and again when it was downloaded with new content"""
+            # A 304 for a truncated download comes with its record but no body
+            if archived is None or (url in archived and not changed) or not response.content:
+                return
+            # For a stopped download, the part read (which holds the element)
+            snapshots.archive(vendor, url, pages[url], response.content, partial=getattr(response, 'truncated', False))
+            archived.add(url)
+
+        def settle(url, record):
+            """Note a finished page in the run state; returns what to yield for it"""
+            modified.remember(url, lastmod.get(url), record, version)
+            history.observe(url, record)
+            if record:
+                dead_links.forget(url)
+            else:
+                dead_links.record(url, 'empty')
+            return url, record, None
+
+        def extracted(url, fragment, page_hash, get_record):
+            """Finish a page that went through the parse stage"""
+            try:
+                record = get_record()
+                if record is None and fragment is not None:
+                    # The element alone wasn't enough; try the whole page
+                    metrics.count('stream_fallbacks', url=url)
+                    response = fetch(url, record_version=version)
+                    if hasattr(response, 'cached_record'):
+                        # Unchanged since a run that extracted it
+                        record = response.cached_record
+                    else:
+                        archive(url, response, True)
+                        record = extract_page(url, pages[url], response.content, extract, parse_only)
+            except Exception as e:
+                print(f"Unexpected error for the site: {url} - Error: {str(e)}")
+                metrics.outcome(url, 'failed')
+                return url, None, e
+            if prints:
+                prints.remember(url, page_hash, record)
+            metrics.outcome(url, 'extracted' if record else 'empty')
+            http_cache.store_record(url, record, version)
+            return settle(url, record)
+
+        pool = parse_pool.get_pool() if to_fetch and parse_pool.usable(extract, parse_only) else None
+        # Parse stage future -> (url, fragment, page hash)
+        parsing = {}
+
+        def parsed(futures):
+            for future in futures:
+                url, fragment, page_hash = parsing.pop(future)
+                yield extracted(url, fragment, page_hash, lambda: _pooled_record(url, future))
+
+        for url, response, error in fetch_all(to_fetch, stream_until, version):
+            # Pass on the pages parsed meanwhile
+            yield from parsed([future for future in parsing if future.done()])
+            if error is None:
+                try:
+                    # Skip sites that return a 404 error
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as http_err:
+                    error = http_err
+            if error is not None:
+                print(f"Exception for the site: {url} - Error: {str(error)}")
+                metrics.outcome(url, 'failed')
+                if response is not None and response.status_code in DEAD_STATUSES:
+                    dead_links.record(url, 'gone', response.status_code)
+                    history.forget(url)
+                    yield url, None, None
+                else:
+                    yield url, None, error
+                continue
+
+            if hasattr(response, 'cached_record'):
+                # Page is unchanged since the last run, so is its record
+                metrics.outcome(url, 'cached')
+                archive(url, response, False)
+                yield settle(url, response.cached_record)
+                continue
+
+            # Markup of the stream_until element, if the download stopped there
+            fragment = getattr(response, 'fragment', None)
+            content = response.content if fragment is None else fragment.encode('utf-8')
+            page_hash = prints.hash(content) if prints else None
+            known = prints.lookup(url, page_hash) if prints and settings.CACHE_MODE != 'refresh' else None
+            metrics.count('fingerprint_hits' if known else 'fingerprint_misses', url=url)
+            if known:
+                # Same content as last time, only volatile bits differ
+                metrics.outcome(url, 'identical')
+                archive(url, response, False)
+                http_cache.store_record(url, known['record'], version)
+                yield settle(url, known['record'])
+                continue
+
+            archive(url, response, not getattr(response, 'from_cache', False))
+            if pool is None:
+                yield extracted(url, fragment, page_hash,
+                                lambda: extract_page(url, pages[url], content, extract, parse_only))
+                continue
+            parsing[pool.submit(_extract_in_process, url, pages[url], content, extract, parse_only)] = \
+                (url, fragment, page_hash)
+            metrics.depth('parse', len(parsing), url)
+            if len(parsing) >= settings.PARSE_QUEUE:
+                # Backpressure: take no more downloads until a page is parsed
+                yield from parsed(wait(parsing, return_when=FIRST_COMPLETED).done)
+        yield from parsed(as_completed(list(parsing)))
+    finally:
+        dead_links.save()
+        if lastmod:
+            modified.save(pages if complete else None)
+        history.save(pages if complete else None)
+        if prints:
+            prints.save()
+        write_run_stats(vendor, pages)
+        if to_fetch:
+            report_pipeline(vendor, to_fetch, time.perf_counter() - start, pool)
+        metrics.save(vendor)
+
+
+def report_pipeline(vendor, urls, seconds, pool):
+    """Record and print how busy the fetch, parse and write steps were for a vendor"""
+    engine = get_engine()
+    hosts = len({urlsplit(url).netloc for url in urls})
+    workers = {'fetch': min(engine.concurrency, engine.per_host * hosts),
+               'parse': settings.PARSE_WORKERS if pool else 1, 'write': 1}
+    summary = metrics.pipeline(vendor, seconds, workers)
+    if summary:
+        busy = ', '.join(f"{step} {share:.0%}" for step, share in summary['utilisation'].items())
+        deepest = ', '.join(f"{name} {depths['max']}" for name, depths in summary['queues'].items())
+        print(f"Pipeline for {vendor}: busy {busy} ({workers['parse']} parse workers); deepest queues: {deepest or '-'}")
+
+
+def collect_records(urls, records_by_url):
+    """Flatten the records of urls, in order"""
+    records = []
+    for url in urls:
+        record = records_by_url.get(url)
+        # Listing pages give a list of records, case study pages a single one
+        if isinstance(record, list):
+            records.extend(record)
+        elif record:
+            records.append(record)
+    return records
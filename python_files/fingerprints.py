@@ -0,0 +1,111 @@
+"""
+Content fingerprints for servers that don't answer conditional requests.
+
+Each page body is hashed after stripping volatile regions (nonces, build IDs,
+CSRF tokens, comments, ...), and the hash is stored with the page's extraction
+result per vendor in .cache/fingerprints/<vendor>.json. When a later download
+has the same fingerprint the stored record is reused without parsing.
+
+Extra volatile regions can be given as regular expressions, one per line, in
+SCRAPER_VOLATILE_PATTERNS, or per vendor as VOLATILE_PATTERNS in its scraper
+("volatile_patterns" in its rule file). Entries are dropped when the scraper's
+source (or rule file) changes, so an extractor fix is always applied.
+"""
+import hashlib
+import inspect
+import os
+import re
+import sys
+
+import json_state
+import settings
+from rule_engine import Rules
+
+FINGERPRINTS_DIR = os.path.join(settings.CACHE_DIR, 'fingerprints')
+
+# Parts of a page that change between downloads without the content changing.
+# Each starts with a literal so the scan stays fast on large pages.
+VOLATILE_PATTERNS = [
+    rb'<!--.*?-->',
+    rb'nonce="[^"]*"',
+    rb'"buildId"\s*:\s*"[^"]*"',
+    rb'/_next/static/[^/"]+/',
+    rb'<meta[^>]+name="csrf[^"]*"[^>]*>',
+    rb'<input[^>]+name="(?:csrf[^"]*|_token|authenticity_token)"[^>]*>',
+    rb'\?(?:v|ver|version|_)=[^"&\s]{6,}',
+]
+
+
+def compile_patterns(extra=()):
+    patterns = list(VOLATILE_PATTERNS)
+    patterns += [line.encode('utf-8') for line in settings.VOLATILE_PATTERNS.splitlines() if line.strip()]
+    patterns += [pattern.encode('utf-8') if isinstance(pattern, str) else pattern for pattern in extra]
+    # Applied one by one: a single alternation is slower, as no literal prefix can be used
+    return [re.compile(pattern, re.DOTALL) for pattern in patterns]
+
+
+def fingerprint(content, volatile):
+    """Hash of content without its volatile regions and whitespace"""
+    for pattern in volatile:
+        content = pattern.sub(b'', content)
+    return hashlib.blake2b(b''.join(content.split()), digest_size=16).hexdigest()
+
+
+def extractor_version(extract):
+    """Hash of the source file defining extract, so editing a scraper invalidates its fingerprints"""
+    try:
+        with open(inspect.getsourcefile(extract), 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def version_of(extract):
+    """Version of a vendor's extract function: of its scraper's source, or of its rule file"""
+    if isinstance(extract, Rules):
+        return extract.version
+    return extractor_version(extract)
+
+
+def for_extractor(vendor, extract):
+    """Fingerprints for a vendor, versioned by its scraper's source and using its VOLATILE_PATTERNS"""
+    if isinstance(extract, Rules):
+        return Fingerprints(vendor, extract.version, extract.volatile_patterns)
+    module = sys.modules.get(extract.__module__)
+    return Fingerprints(vendor, extractor_version(extract), getattr(module, 'VOLATILE_PATTERNS', ()))
+
+
+class Fingerprints:
+    def __init__(self, vendor, version=None, volatile_patterns=()):
+        self.vendor = vendor
+        self.version = version
+        self.volatile = compile_patterns(volatile_patterns)
+        self.path = os.path.join(FINGERPRINTS_DIR, f'{vendor}.json')
+        self.entries = self._stored()
+        self.changed = set()
+
+    def _stored(self):
+        """The saved entries, if they were made by this version of the extractor"""
+        stored = json_state.read(self.path, {})
+        return stored.get('pages', {}) if stored.get('version') == self.version else {}
+
+    def hash(self, content):
+        return fingerprint(content, self.volatile)
+
+    def lookup(self, url, page_hash):
+        """Return the stored entry ({'hash', 'record'}) if url's content is unchanged, else None"""
+        entry = self.entries.get(url)
+        if entry is None or entry['hash'] != page_hash:
+            return None
+        return entry
+
+    def remember(self, url, page_hash, record):
+        self.entries[url] = {'hash': page_hash, 'record': record}
+        self.changed.add(url)
+
+    def save(self):
+        """Write the changed entries, merged with those other processes saved meanwhile"""
+        with json_state.locked(self.path):
+            self.entries = json_state.merge(self._stored(), self.entries, self.changed)
+            json_state.write(self.path, {'version': self.version, 'pages': self.entries})
+        self.changed.clear()
@@ -0,0 +1,225 @@
+"""
+On-disk HTTP cache shared by the Python scrapers.
+
+Each URL is stored as <sha256>.body (the decoded body) and <sha256>.json
+(headers, validators and the last extraction result, with the version of the
+extractor that made it). The next request for
+the URL carries If-None-Match / If-Modified-Since, and a 304 is answered
+from the stored body. Of a download cut short after the element its scraper
+reads (streaming.py) only the .json is kept: a 304 for it is answered with
+the stored record, or the page is downloaded again if there is none.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import settings
+
+CACHE_DIR = os.path.join(settings.CACHE_DIR, 'http')
+
+# Headers that describe the bytes on the wire rather than the decoded body we store
+_SKIP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+_prune_registered = False
+_lock = threading.Lock()
+
+
+def _paths(url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f'{key}.json'), os.path.join(CACHE_DIR, f'{key}.body')
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove_files(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove(url):
+    _remove_files(*_paths(url))
+
+
+def load(url):
+    """Return the cache entry for url, or None if missing or expired"""
+    meta_path, _ = _paths(url)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry['stored_at'] > settings.CACHE_TTL_DAYS * 86400:
+        _remove(url)
+        return None
+    return entry
+
+
+def _load_body(url):
+    _, body_path = _paths(url)
+    with open(body_path, 'rb') as f:
+        return f.read()
+
+
+def _save_entry(url, entry):
+    meta_path, _ = _paths(url)
+    _write_atomic(meta_path, json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+
+
+def store(url, response):
+    """Store a 200 response"""
+    global _prune_registered
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS}
+    entry = {
+        'url': url,
+        'stored_at': time.time(),
+        'headers': headers,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    _, body_path = _paths(url)
+    if getattr(response, 'truncated', False):
+        # Only part of the body was read; keep the validators alone
+        _remove_files(body_path)
+    else:
+        _write_atomic(body_path, response.content)
+    _save_entry(url, entry)
+    with _lock:
+        if not _prune_registered:
+            atexit.register(prune)
+            _prune_registered = True
+
+
+def store_record(url, record, version=None):
+    """Remember the extraction result for the body currently cached for url, and the extractor version that made it"""
+    entry = load(url)
+    if entry is None or settings.CACHE_MODE == 'off':
+        return
+    entry['record'] = record
+    entry['record_version'] = version
+    _save_entry(url, entry)
+
+
+def _cached_response(url, entry, content=None):
+    """Build a requests.Response from a cache entry, with its stored body unless content is given"""
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = _load_body(url) if content is None else content
+    response.from_cache = True
+    return response
+
+
+def _unchanged_response(url, entry, record_version):
+    """
+    The response a 304 stands for: the cached body, with the stored record
+    attached as cached_record if the extractor is still at record_version;
+    None if there is neither body nor record
+    """
+    # Records of another version of the extractor may be wrong now
+    has_record = 'record' in entry and entry.get('record_version') == record_version
+    try:
+        cached = _cached_response(url, entry)
+    except OSError:
+        # The body went missing, or only the validators of a truncated download were kept
+        if not has_record:
+            return None
+        cached = _cached_response(url, entry, b'')
+    if has_record:
+        cached.cached_record = entry['record']
+    return cached
+
+
+def cached_get(get, url, record_version=None):
+    """
+    GET url through the cache; get(url, headers) performs the network request.
+    Responses answered from the cache have from_cache set; if the server
+    confirmed the page is unchanged (304) and an extraction result was stored
+    for it by the extractor at record_version, that is attached as cached_record.
+    """
+    mode = settings.CACHE_MODE
+    if mode == 'off':
+        return get(url, {})
+
+    entry = load(url) if mode != 'refresh' else None
+    if mode == 'offline':
+        try:
+            if entry is not None:
+                return _cached_response(url, entry)
+        except OSError:
+            # Metadata without its body
+            pass
+        raise requests.exceptions.ConnectionError(f"{url} is not cached (offline mode)")
+
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = get(url, headers)
+    if response.status_code == 304 and entry:
+        cached = _unchanged_response(url, entry, record_version)
+        if cached is not None:
+            # Mark the entry as recently used for size-based eviction
+            os.utime(_paths(url)[0])
+            return cached
+        # Nothing to answer it with; fall back to a plain fetch
+        response = get(url, {})
+
+    if response.status_code == 200:
+        store(url, response)
+    return response
+
+
+def prune():
+    """Drop expired entries, then the least recently used ones until the cache fits CACHE_MAX_MB"""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    now = time.time()
+    entries = []
+    total = 0
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        meta_path = os.path.join(CACHE_DIR, name)
+        body_path = meta_path[:-len('.json')] + '.body'
+        try:
+            # Entries of truncated downloads have no body
+            size = os.path.getsize(meta_path) + (os.path.getsize(body_path) if os.path.exists(body_path) else 0)
+            used_at = os.path.getmtime(meta_path)
+            with open(meta_path, encoding='utf-8') as f:
+                stored_at = json.load(f)['stored_at']
+        except (OSError, ValueError, KeyError):
+            continue
+        if now - stored_at > settings.CACHE_TTL_DAYS * 86400:
+            _remove_files(meta_path, body_path)
+            continue
+        entries.append((used_at, size, meta_path, body_path))
+        total += size
+
+    limit = settings.CACHE_MAX_MB * 1024 * 1024
+    for used_at, size, meta_path, body_path in sorted(entries):
+        if total <= limit:
+            break
+        _remove_files(meta_path, body_path)
+        total -= size
@@ -0,0 +1,139 @@
+import atexit
+import socket
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+import metrics
+import settings
+
+_session = None
+_lock = threading.Lock()
+# Host -> sockets opened to it, counting urllib3's reconnects of a pooled connection
+_connects = Counter()
+
+
+def _accept_encoding():
+    """Only advertise brotli when urllib3 can actually decode it"""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+class _TimedConnectionMixin:
+    """Count connects, and time DNS resolution and TCP connect of new connections for metrics"""
+
+    def connect(self):
+        with _lock:
+            _connects[self.host] += 1
+        super().connect()
+
+    def _new_conn(self):
+        if not settings.METRICS:
+            return super()._new_conn()
+        host = self._dns_host
+        with metrics.timed('dns'):
+            try:
+                infos = socket.getaddrinfo(host.strip('[]'), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+                addresses = list(dict.fromkeys(info[4][0] for info in infos)) or [host]
+            except socket.gaierror:
+                # Let urllib3 resolve it again and raise its usual error
+                addresses = [host]
+        # Try each resolved address in turn, like urllib3 does; SNI and the
+        # Host header still use self.host
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    with metrics.timed('connect'):
+                        return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError):
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        # Whatever _new_conn doesn't account for is the TLS handshake
+        with metrics.timed('tls'):
+            super().connect()
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _TimedAdapter(pool_connections=settings.POOL_HOSTS, pool_maxsize=settings.POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': settings.USER_AGENT,
+                'Accept-Encoding': _accept_encoding(),
+                'Connection': 'keep-alive',
+            })
+            _session = session
+            atexit.register(print_connection_stats)
+        return _session
+
+
+def connection_stats():
+    """Return {host: (requests, connections opened)} for every pooled host"""
+    requests_made = Counter()
+    if _session is None:
+        return {}
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_made[pool.host] += pool.num_requests
+    with _lock:
+        return {host: (count, _connects[host]) for host, count in requests_made.items()}
+
+
+def print_connection_stats():
+    """Print how many requests each connection served"""
+    stats = connection_stats()
+    if not stats:
+        return
+    print("Connection reuse:")
+    for host, (requests_made, opened) in sorted(stats.items()):
+        reused = requests_made - opened
+        rate = reused / requests_made if requests_made else 0
+        print(f"  {host}: {requests_made} requests over {opened} connections ({rate:.0%} reused)")
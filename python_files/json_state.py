@@ -0,0 +1,63 @@
+"""
+Per-URL run state kept in JSON files under the cache (dead links, sitemap
+lastmods, change history, fingerprints), which several processes may update
+at once: queue workers each process part of a vendor's pages. A process only
+writes back the URLs it changed, merged into what is on disk at the time,
+under an exclusive lock on <file>.lock, so other workers' entries are kept.
+"""
+import json
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: saves are not serialised, the last process to save wins
+    fcntl = None
+
+
+@contextmanager
+def locked(path):
+    """Hold the lock of a state file, across processes"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read(path, default=None):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write(path, data, indent=None):
+    # Unique per process, so a reader never sees a half-written file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def merge(stored, entries, changed, urls=None):
+    """
+    The stored entries with this process's changes: each URL in changed gets
+    its entry in entries, or is removed if it has none there. With urls,
+    entries for other URLs are dropped.
+    """
+    merged = dict(stored)
+    for url in changed:
+        if url in entries:
+            merged[url] = entries[url]
+        else:
+            merged.pop(url, None)
+    if urls is not None:
+        merged = {url: entry for url, entry in merged.items() if url in urls}
+    return merged
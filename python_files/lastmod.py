@@ -0,0 +1,42 @@
+"""
+Incremental runs for sitemap-discovered pages. Every record is stored with
+the sitemap <lastmod> of the page it came from and the version of the
+extractor that made it (see fingerprints.version_of), per vendor in
+.cache/lastmod/<vendor>.json. While the lastmod and the extractor stay the
+same the page is not fetched again and its stored record is reused.
+"""
+import os
+
+import json_state
+import settings
+
+LASTMOD_DIR = os.path.join(settings.CACHE_DIR, 'lastmod')
+
+
+class LastModified:
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.path = os.path.join(LASTMOD_DIR, f'{vendor}.json')
+        self.entries = json_state.read(self.path, {})
+        self.changed = set()
+
+    def unchanged(self, url, lastmod, version=None):
+        """Return the stored record if url's lastmod and the extractor version are the ones it was extracted at, else None"""
+        entry = self.entries.get(url)
+        if entry is None or not lastmod or entry['lastmod'] != lastmod or entry.get('version') != version:
+            return None
+        return entry['record']
+
+    def remember(self, url, lastmod, record, version=None):
+        if lastmod and record:
+            self.entries[url] = {'lastmod': lastmod, 'record': record, 'version': version}
+        else:
+            self.entries.pop(url, None)
+        self.changed.add(url)
+
+    def save(self, urls=None):
+        """Write the changed entries (see json_state.py), dropping pages that are no longer in urls (if given)"""
+        with json_state.locked(self.path):
+            self.entries = json_state.merge(json_state.read(self.path, {}), self.entries, self.changed, urls)
+            json_state.write(self.path, self.entries, indent=2)
+        self.changed.clear()
@@ -0,0 +1,348 @@
+"""
+Per-stage timers and counters for the scrapers.
+
+Stages, timed per vendor and per URL (nested stages are not counted twice):
+    throttle   waiting for the host's rate limiter
+    dns        resolving the host of a new connection
+    connect    opening the TCP connection
+    tls        the TLS handshake
+    download   sending the request and reading the response
+    parse      building the BeautifulSoup tree
+    extract    the vendor's extract function
+    write      streaming and saving records
+
+Pages flow through three stages, fetch -> parse (parse and extract, in the
+parse processes if there are any) -> write, with bounded queues between
+them. Their depths are sampled ('fetched': downloaded pages waiting for the
+parse stage, 'parse': pages handed to the parse processes), and each
+stage's utilisation is its busy time over the vendor's wall time and workers.
+
+Each vendor's numbers are saved to REPORT_DIR/<vendor>.json when it finishes,
+and main.py merges them into run_report.json and run_report.prom (Prometheus
+text format). With SCRAPER_METRICS=0 every call returns straight away.
+SCRAPER_PROFILE=1 (main.py --profile) also runs the parse stage under
+cProfile and saves REPORT_DIR/<vendor>-parse.prof.
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+import settings
+
+STAGES = ('throttle', 'dns', 'connect', 'tls', 'download', 'parse', 'extract', 'write')
+# What happened to each page
+OUTCOMES = ('extracted', 'cached', 'unchanged', 'identical', 'empty', 'failed', 'skipped', 'deferred')
+
+RUN_REPORT = 'run_report'
+
+_lock = threading.Lock()
+_local = threading.local()
+_url_vendors = {}
+# vendor -> stage -> [calls, seconds, slowest call]
+_stages = defaultdict(dict)
+_counters = defaultdict(Counter)
+_urls = defaultdict(dict)
+# vendor -> queue -> [samples, total depth, deepest]
+_depths = defaultdict(dict)
+_pipelines = {}
+_profiles = {}
+
+# Stages making up each step of the pipeline
+PIPELINE = {
+    'fetch': ('dns', 'connect', 'tls', 'download'),
+    'parse': ('parse', 'extract'),
+    'write': ('write',),
+}
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('stage', 'url', 'vendor', 'start', 'nested')
+
+    def __init__(self, stage, url, vendor):
+        self.stage = stage
+        self.url = url
+        self.vendor = vendor
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        if stack and self.url is None and self.vendor is None:
+            # e.g. connection setup inside a download
+            self.url, self.vendor = stack[-1].url, stack[-1].vendor
+        self.nested = 0.0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        record(self.stage, elapsed - self.nested, self.url, self.vendor)
+        return False
+
+
+class _Profiling:
+    def __init__(self, profile):
+        self.profile = profile
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        return False
+
+
+def _vendor(url, vendor=None):
+    return vendor or _url_vendors.get(url, 'unknown')
+
+
+def track(vendor, urls):
+    """Attribute everything recorded for urls to vendor"""
+    if not settings.METRICS:
+        return
+    with _lock:
+        for url in urls:
+            _url_vendors[url] = vendor
+
+
+def timed(stage, url=None, vendor=None):
+    """Context manager timing one stage for url (or vendor)"""
+    if not settings.METRICS:
+        return _NULL
+    return _Timer(stage, url, vendor)
+
+
+def record(stage, seconds, url=None, vendor=None):
+    vendor = _vendor(url, vendor)
+    with _lock:
+        totals = _stages[vendor].setdefault(stage, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        if url is not None:
+            _urls[url][stage] = _urls[url].get(stage, 0.0) + seconds
+
+
+def count(name, n=1, url=None, vendor=None):
+    """Add n to a counter of url's vendor (and of url itself)"""
+    if not settings.METRICS:
+        return
+    vendor = _vendor(url, vendor)
+    with _lock:
+        _counters[vendor][name] += n
+        if url is not None:
+            _urls[url][name] = _urls[url].get(name, 0) + n
+
+
+def depth(queue, n, url=None, vendor=None):
+    """Sample the number of pages waiting in one of the vendor's pipeline queues"""
+    if not settings.METRICS:
+        return
+    vendor = _vendor(url, vendor)
+    with _lock:
+        samples = _depths[vendor].setdefault(queue, [0, 0, 0])
+        samples[0] += 1
+        samples[1] += n
+        samples[2] = max(samples[2], n)
+
+
+def pop_url(url):
+    """Remove and return what was recorded for url; the parse processes hand their timings back with it"""
+    with _lock:
+        return _urls.pop(url, {})
+
+
+def pipeline(vendor, seconds, workers):
+    """
+    Record the utilisation of each pipeline step for a vendor that took
+    seconds with workers ({step: workers}) and return it with the queue depths
+    """
+    if not settings.METRICS:
+        return None
+    with _lock:
+        stages = _stages[vendor]
+        busy = {step: sum(stages[stage][1] for stage in names if stage in stages) for step, names in PIPELINE.items()}
+        _pipelines[vendor] = {
+            'seconds': seconds,
+            'workers': workers,
+            'utilisation': {step: busy[step] / (seconds * workers[step]) if seconds else 0.0 for step in PIPELINE},
+            'queues': {queue: {'mean': total / samples, 'max': deepest}
+                       for queue, (samples, total, deepest) in _depths[vendor].items()},
+        }
+        return _pipelines[vendor]
+
+
+def outcome(url, result, vendor=None):
+    """Record what happened to a page: one of OUTCOMES"""
+    if not settings.METRICS:
+        return
+    vendor = _vendor(url, vendor)
+    with _lock:
+        _counters[vendor][result] += 1
+        _urls[url]['outcome'] = result
+
+
+def profiling(url):
+    """Context manager profiling the enclosed code under url's vendor, with SCRAPER_PROFILE=1"""
+    if not settings.PROFILE:
+        return _NULL
+    vendor = _vendor(url)
+    with _lock:
+        if vendor not in _profiles:
+            _profiles[vendor] = cProfile.Profile()
+        return _Profiling(_profiles[vendor])
+
+
+def _path(name, extension='json'):
+    return os.path.join(settings.REPORT_DIR, f'{name}.{extension}')
+
+
+def vendor_report(vendor):
+    """Return everything recorded for vendor so far"""
+    with _lock:
+        return {
+            'vendor': vendor,
+            'saved_at': time.time(),
+            'stages': {stage: {'calls': calls, 'seconds': seconds, 'max_seconds': slowest}
+                       for stage, (calls, seconds, slowest) in _stages[vendor].items()},
+            'counters': dict(_counters[vendor]),
+            'pipeline': _pipelines.get(vendor),
+            'urls': {url: dict(entry) for url, entry in _urls.items() if _url_vendors.get(url) == vendor},
+        }
+
+
+def save(vendor):
+    """Write vendor's report (and parse profile) to REPORT_DIR"""
+    if not settings.METRICS:
+        return
+    os.makedirs(settings.REPORT_DIR, exist_ok=True)
+    report = vendor_report(vendor)
+    tmp_path = f'{_path(vendor)}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, _path(vendor))
+    if vendor in _profiles:
+        _profiles[vendor].dump_stats(_path(f'{vendor}-parse', 'prof'))
+
+
+def load(vendor):
+    """Return the vendor's last saved report, or None"""
+    try:
+        with open(_path(vendor), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def clear(vendor):
+    """Forget the vendor's last report, on disk and in memory (the daemon scrapes each vendor many times)"""
+    for path in (_path(vendor), _path(f'{vendor}-parse', 'prof')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    with _lock:
+        for recorded in (_stages, _counters, _depths, _pipelines, _profiles):
+            recorded.pop(vendor, None)
+        for url in [url for url, owner in _url_vendors.items() if owner == vendor]:
+            del _url_vendors[url]
+            _urls.pop(url, None)
+
+
+def prometheus(run):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP scraper_{name} {help_text}')
+        lines.append(f'# TYPE scraper_{name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f'scraper_{name}{{{label_text}}} {value}' if labels else f'scraper_{name} {value}')
+
+    vendors = run['vendors']
+    metric('run_seconds', 'gauge', 'Wall time of the whole run', [({}, run['wall_seconds'])])
+    metric('vendor_seconds', 'gauge', 'Wall time of each vendor',
+           [({'vendor': vendor}, report['seconds']) for vendor, report in vendors.items()])
+    metric('vendor_success', 'gauge', '1 if the vendor finished without errors',
+           [({'vendor': vendor}, int(report['returncode'] == 0)) for vendor, report in vendors.items()])
+    metric('records', 'gauge', 'Records in the vendor output file',
+           [({'vendor': vendor}, report['records']) for vendor, report in vendors.items()
+            if report['records'] is not None])
+    metric('stage_seconds_total', 'counter', 'Time spent in each pipeline stage',
+           [({'vendor': vendor, 'stage': stage}, totals['seconds'])
+            for vendor, report in vendors.items() for stage, totals in report.get('stages', {}).items()])
+    metric('stage_calls_total', 'counter', 'Times each pipeline stage ran',
+           [({'vendor': vendor, 'stage': stage}, totals['calls'])
+            for vendor, report in vendors.items() for stage, totals in report.get('stages', {}).items()])
+    metric('stage_utilisation', 'gauge', 'Busy share of each pipeline step (fetch, parse, write)',
+           [({'vendor': vendor, 'step': step}, value) for vendor, report in vendors.items()
+            for step, value in (report.get('pipeline') or {}).get('utilisation', {}).items()])
+    metric('queue_depth_max', 'gauge', 'Deepest each pipeline queue got',
+           [({'vendor': vendor, 'queue': queue}, depths['max']) for vendor, report in vendors.items()
+            for queue, depths in (report.get('pipeline') or {}).get('queues', {}).items()])
+    metric('pages_total', 'counter', 'Pages by outcome',
+           [({'vendor': vendor, 'outcome': name}, report.get('counters', {}).get(name, 0))
+            for vendor, report in vendors.items() for name in OUTCOMES])
+    metric('bytes_downloaded_total', 'counter', 'Response bytes read from the network',
+           [({'vendor': vendor}, report.get('counters', {}).get('bytes_downloaded', 0))
+            for vendor, report in vendors.items()])
+    metric('fingerprint_hit_ratio', 'gauge', 'Share of downloaded pages whose content was unchanged',
+           [({'vendor': vendor}, report['fingerprint_hit_rate']) for vendor, report in vendors.items()
+            if report['fingerprint_hit_rate'] is not None])
+    metric('retries_total', 'counter', 'Retried requests',
+           [({'vendor': vendor}, report['resilience'].get('retries', 0)) for vendor, report in vendors.items()])
+    metric('breaker_trips_total', 'counter', 'Circuit breaker trips',
+           [({'vendor': vendor}, report['resilience'].get('breaker_trips', 0))
+            for vendor, report in vendors.items()])
+    return '\n'.join(lines) + '\n'
+
+
+def run_report(results, wall_seconds):
+    """Merge the saved vendor reports of a run's results into one report"""
+    vendors = {}
+    for result in results:
+        report = load(result['vendor']) or {}
+        report.update({
+            'seconds': result['seconds'],
+            'returncode': result['returncode'],
+            'records': result['records'],
+            'resilience': result['stats'],
+        })
+        counters = report.get('counters', {})
+        checked = counters.get('fingerprint_hits', 0) + counters.get('fingerprint_misses', 0)
+        report['fingerprint_hit_rate'] = counters.get('fingerprint_hits', 0) / checked if checked else None
+        vendors[result['vendor']] = report
+    return {'finished_at': time.time(), 'wall_seconds': wall_seconds, 'vendors': vendors}
+
+
+def write_run_report(results, wall_seconds):
+    """Write the report of a main.py run to run_report.json and run_report.prom"""
+    if not settings.METRICS:
+        return
+    run = run_report(results, wall_seconds)
+    os.makedirs(settings.REPORT_DIR, exist_ok=True)
+    with open(_path(RUN_REPORT), 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    with open(_path(RUN_REPORT, 'prom'), 'w', encoding='utf-8') as f:
+        f.write(prometheus(run))
+    print(f"Run report written to {_path(RUN_REPORT)}")
@@ -0,0 +1,139 @@
+"""
+Crash-safe output for the scrapers.
+
+While a vendor is being scraped, every record is appended to
+.cache/partial/<vendor>.jsonl as soon as it is extracted, and every finished
+URL to <vendor>.done (the checkpoint). With SCRAPER_RESUME=1 (main.py --resume)
+a rerun skips the URLs already done. save_records writes the usual pretty
+JSON file and then removes the partial files.
+
+To turn an interrupted run's partial output into the JSON file by hand:
+    python python_files/output.py <vendor> <filename> [indent]
+"""
+import json
+import os
+import sqlite3
+import sys
+
+import metrics
+import settings
+import store
+
+PARTIAL_DIR = os.path.join(settings.CACHE_DIR, 'partial')
+
+
+def _paths(vendor):
+    return (os.path.join(PARTIAL_DIR, f'{vendor}.jsonl'),
+            os.path.join(PARTIAL_DIR, f'{vendor}.done'))
+
+
+def _read_lines(path):
+    """Read complete lines; a line cut short by a crash is ignored"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [line[:-1] for line in f if line.endswith('\n')]
+    except FileNotFoundError:
+        return []
+
+
+class RecordWriter:
+    def __init__(self, vendor, resume=False):
+        self.vendor = vendor
+        self.records_path, self.done_path = _paths(vendor)
+        self.records = {}
+        self.done = set()
+        if resume:
+            for line in _read_lines(self.records_path):
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                self.records[item['url']] = item['record']
+            self.done = set(_read_lines(self.done_path))
+            if self.done:
+                print(f"Resuming {vendor}: {len(self.done)} pages already done")
+
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+        mode = 'a' if resume else 'w'
+        self.records_file = open(self.records_path, mode, encoding='utf-8')
+        self.done_file = open(self.done_path, mode, encoding='utf-8')
+        self.pending = 0
+
+    def add(self, url, record):
+        """Mark url as done, streaming its record (if any) to disk"""
+        if record:
+            self.records[url] = record
+            self.records_file.write(json.dumps({'url': url, 'record': record}, ensure_ascii=False) + '\n')
+        self.done.add(url)
+        self.done_file.write(url + '\n')
+        self.pending += 1
+        if self.pending >= settings.FSYNC_EVERY:
+            self.sync()
+
+    def sync(self):
+        # Records first, so a URL is never checkpointed without its record
+        for f in (self.records_file, self.done_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.records_file.close()
+        self.done_file.close()
+
+
+def discard_partial(vendor):
+    for path in _paths(vendor):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def save_records(vendor, data, filename, indent=4):
+    """
+    Write the final pretty JSON file and/or upsert the records into the
+    SQLite store (settings.STORAGE), then drop the vendor's partial output
+    """
+    if settings.STORAGE in ('sqlite', 'both'):
+        try:
+            with metrics.timed('write', vendor=vendor):
+                count = store.upsert_records(vendor, data, filename, indent)
+            print(f"Data successfully saved to {settings.DB_PATH} ({count} {vendor} records)")
+        except sqlite3.Error as e:
+            print(f"Error saving data to {settings.DB_PATH}: {str(e)}")
+            return
+    if settings.STORAGE in ('json', 'both'):
+        try:
+            with metrics.timed('write', vendor=vendor):
+                tmp_path = f'{filename}.tmp'
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=indent, ensure_ascii=False)
+                os.replace(tmp_path, filename)
+            print(f"Data successfully saved to {filename}")
+        except Exception as e:
+            print(f"Error saving data to JSON: {str(e)}")
+            return
+    discard_partial(vendor)
+    metrics.save(vendor)
+
+
+def finalize(vendor, filename, indent=4):
+    """Write the JSON file from a vendor's partial output"""
+    records_path, _ = _paths(vendor)
+    records = {}
+    for line in _read_lines(records_path):
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        records[item['url']] = item['record']
+    save_records(vendor, list(records.values()), filename, indent)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    finalize(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 4)
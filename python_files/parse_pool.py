@@ -0,0 +1,55 @@
+"""
+Process pool for the parse stage of the scrapers (see process_pages in
+fetch_engine.py). Pages are parsed and run through the vendor's extract
+function in SCRAPER_PARSE_WORKERS processes (default: one per core on
+multi-core machines), so parsing uses every core while the fetch engine's
+threads keep downloading. Every scraper in the process shares the pool.
+
+SCRAPER_PARSE_WORKERS=0 parses in the fetching thread instead. So does a
+profiled run (--profile), and a vendor whose extract function or PARSE_ONLY
+strainer can't be pickled (e.g. a lambda).
+"""
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def usable(*task):
+    """Whether pages can be sent to the pool along with task (extract function, strainer, ...)"""
+    if settings.PARSE_WORKERS <= 0 or settings.PROFILE:
+        return False
+    try:
+        pickle.dumps(task)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def get_pool():
+    """Return the process-wide parse pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the fetch engine's threads may be holding locks
+            _pool = ProcessPoolExecutor(max_workers=settings.PARSE_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _import_parsers():
+    import fetch_engine  # noqa: F401
+
+
+def warm_up():
+    """Start the pool's processes and import the parsing modules in them ahead of the first page"""
+    if settings.PARSE_WORKERS <= 0:
+        return
+    pool = get_pool()
+    for future in [pool.submit(_import_parsers) for _ in range(settings.PARSE_WORKERS)]:
+        future.result()
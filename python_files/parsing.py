@@ -0,0 +1,30 @@
+from bs4 import BeautifulSoup
+
+import settings
+
+_backend = None
+
+
+def parser_backend():
+    """Name of the BeautifulSoup tree builder to use"""
+    global _backend
+    if _backend is None:
+        if settings.PARSER != 'auto':
+            _backend = settings.PARSER
+        else:
+            try:
+                import lxml  # noqa: F401
+                _backend = 'lxml'
+            except ImportError:
+                _backend = 'html.parser'
+    return _backend
+
+
+def make_soup(content, parse_only=None):
+    """
+    Parse a page. parse_only is a SoupStrainer that limits the tree to the
+    elements (and their contents) an extractor actually looks at.
+    """
+    if not settings.RESTRICTED_PARSE:
+        parse_only = None
+    return BeautifulSoup(content, parser_backend(), parse_only=parse_only)
@@ -0,0 +1,104 @@
+"""
+Adaptive per-host token bucket. Every network request first takes a token
+from its host's bucket. A 429/503 halves the host's rate and honours
+Retry-After; a run of healthy responses raises the rate again (AIMD).
+"""
+import atexit
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import settings
+
+# Statuses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+# Healthy responses in a row before the rate is raised, and by how much
+INCREASE_AFTER = 10
+INCREASE_STEP = 0.5
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date; return seconds or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    def __init__(self, host, rate=None, burst=None):
+        self.host = host
+        self.rate = rate or settings.RATE_LIMIT
+        self.burst = burst or settings.RATE_BURST
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.healthy_streak = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request to this host is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def feedback(self, status, retry_after=None):
+        """Adapt the rate to the host's response"""
+        with self.lock:
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.healthy_streak = 0
+                self.rate = max(settings.RATE_MIN, self.rate / 2)
+                self.tokens = 0.0
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = 1 / self.rate
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            elif status < 500:
+                self.healthy_streak += 1
+                if self.healthy_streak >= INCREASE_AFTER:
+                    self.healthy_streak = 0
+                    self.rate = min(settings.RATE_MAX, self.rate + INCREASE_STEP)
+
+
+def limiter_for(url):
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _limiters:
+            if not _limiters:
+                atexit.register(print_rate_stats)
+            _limiters[host] = HostLimiter(host)
+        return _limiters[host]
+
+
+def print_rate_stats():
+    print("Rate limits:")
+    for host, limiter in sorted(_limiters.items()):
+        print(f"  {host}: {limiter.rate:.1f} req/s at the end, "
+              f"throttled {limiter.throttled} times, {limiter.waited:.1f}s spent waiting (all threads)")
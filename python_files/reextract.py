@@ -0,0 +1,82 @@
+"""
+Re-run the vendor extract functions over the snapshot archive, with no
+network at all, on a process pool using every CPU core. Used by
+main.py --extract after fixing a selector. Pages a run extracted that have no
+snapshot (archived before every page was) keep the record of their last run,
+and are listed.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import run_stats
+import snapshots
+from fetch_engine import collect_records, extract_page
+from runner import load_plugin
+from scheduler import ChangeHistory
+
+PYTHON_FILES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _init_worker():
+    if PYTHON_FILES_DIR not in sys.path:
+        sys.path.insert(0, PYTHON_FILES_DIR)
+
+
+def _extract_snapshot(task):
+    """Worker: parse one archived page and run its vendor's extract function"""
+    vendor, entry = task
+    plugin = load_plugin(vendor)
+    try:
+        content = snapshots.read(vendor, entry)
+        record = extract_page(entry['url'], entry['site'], content, plugin.extract,
+                              getattr(plugin, 'PARSE_ONLY', None))
+    except Exception as e:
+        print(f"Unexpected error for the site: {entry['url']} - Error: {str(e)}")
+        record = None
+    return vendor, entry['url'], record
+
+
+def reextract(vendors, workers=None):
+    """Re-extract and save every vendor that has snapshots; return run summaries"""
+    tasks = []
+    # Vendor -> {url: last record} of the extracted pages without a snapshot
+    unarchived = {}
+    for vendor in vendors:
+        entries = snapshots.latest(vendor)
+        if not entries:
+            print(f"No snapshots for {vendor}, skipping")
+            continue
+        tasks += [(vendor, entry) for entry in entries]
+        archived = {entry['url'] for entry in entries}
+        unarchived[vendor] = {url: entry['record'] for url, entry in ChangeHistory(vendor).pages.items()
+                              if entry['record'] and url not in archived}
+
+    start = time.perf_counter()
+    records = {vendor: {} for vendor, _ in tasks}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        for vendor, url, record in pool.map(_extract_snapshot, tasks, chunksize=8):
+            records[vendor][url] = record
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for vendor, by_url in records.items():
+        plugin = load_plugin(vendor)
+        kept = unarchived[vendor]
+        if kept:
+            print(f"{vendor}: {len(kept)} pages have no snapshot; keeping the records of their last run:")
+            for url in list(kept)[:10]:
+                print(f"  {url}")
+            if len(kept) > 10:
+                print(f"  ... and {len(kept) - 10} more")
+            by_url.update(kept)
+        run_stats.clear(vendor)
+        metrics.clear(vendor)
+        vendor_records = collect_records(by_url, by_url)
+        plugin.save(vendor_records)
+        results.append({'vendor': vendor, 'seconds': elapsed, 'returncode': 0,
+                        'records': len(vendor_records), 'stats': {}})
+    print(f"Re-extracted {len(tasks)} archived pages in {elapsed:.1f}s")
+    return results
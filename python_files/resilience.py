@@ -0,0 +1,143 @@
+"""
+Retries and per-host circuit breakers for the fetch path.
+
+GETs that fail with a connection error, a timeout or a 5xx/429 are retried
+with jittered exponential backoff. After BREAKER_THRESHOLD consecutive
+failures a host's breaker opens and requests to it fail immediately for
+BREAKER_COOLDOWN seconds; then a single trial request decides whether it
+closes again.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+
+import settings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+# Per-host counters: retries, failures, breaker_trips, rejected
+stats = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose breaker is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < settings.BREAKER_COOLDOWN or self.trial_running:
+                stats[self.host]['rejected'] += 1
+                raise CircuitOpenError(f"Circuit open for {self.host}, not sending request")
+            # Half-open: let one trial request through
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_abort(self):
+        """The request ended without showing whether the host is up; the next one may be the trial"""
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            stats[self.host]['failures'] += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= settings.BREAKER_THRESHOLD):
+                if not self.trial_running:
+                    stats[self.host]['breaker_trips'] += 1
+                    print(f"Circuit breaker opened for {self.host} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+
+
+def breaker_for(host):
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+            stats[host] = Counter()
+        return _breakers[host]
+
+
+def backoff_delay(attempt):
+    """Full jitter: a random delay up to base * 2^attempt, capped"""
+    return random.uniform(0, min(settings.BACKOFF_MAX, settings.BACKOFF_BASE * 2 ** attempt))
+
+
+def resilient_get(get, url, headers):
+    """
+    Call get(url, headers), retrying transient failures. Returns the last
+    response (which may still be an error status) or raises the last exception.
+    """
+    host = urlsplit(url).netloc
+    breaker = breaker_for(host)
+    attempt = 0
+    while True:
+        breaker.before_request()
+        error = None
+        response = None
+        try:
+            response = get(url, headers)
+        except RETRY_EXCEPTIONS as e:
+            error = e
+            breaker.record_failure()
+        except BaseException:
+            # Anything else (too many redirects, a bad URL, Ctrl-C) must not leave a trial running for good
+            breaker.record_abort()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                # A 429 means the host is up but wants us to slow down; the rate limiter handles that
+                breaker.record_success()
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+        if attempt >= settings.MAX_RETRIES:
+            if response is not None:
+                return response
+            raise error
+        attempt += 1
+        stats[host]['retries'] += 1
+        time.sleep(backoff_delay(attempt))
+
+
+def reset_stats():
+    """Zero every host's counters, e.g. before another run in the same process"""
+    with _lock:
+        for counters in stats.values():
+            counters.clear()
+
+
+def host_stats(hosts):
+    """Sum the counters for the given hosts"""
+    total = Counter()
+    for host in hosts:
+        total.update(stats.get(host, Counter()))
+    return total
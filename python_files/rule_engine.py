@@ -0,0 +1,308 @@
+"""
+Declarative extraction rules for the vendors whose case study pages only need
+a few elements read and their text split up. A vendor's rule file,
+python_files/rules/<vendor>.json (SCRAPER_RULES_DIR), names the elements to
+find and how each record field is made from their text:
+
+    "elements": {
+        "caption": {"tag": "figcaption"},
+        "name": {"tag": "cite", "within": "caption"},
+        "role": {"tag": "p", "class_contains": "Testimonial-module--roleAndCompany"}
+    },
+    "fields": {
+        "name": [{"from": "name"}, {"value": "Unknown Name"}],
+        "company": [{"from": "role", "ops": [{"split": ",", "maxsplit": 1, "index": 1}]},
+                    {"from": "site", "ops": [{"replace": ["-", " "]}, "title"]}]
+    },
+    "required": [{"values": ["caption"], "message": "figcaption not found for site: {url}"}],
+    "stream_until": "caption"
+
+An element is the first tag in the page with the given "tag" (any tag if left
+out), "class" (one of its classes, or the whole class attribute),
+"class_contains" (a substring of the class attribute) and "attrs" (exact
+values); with "within", the first such tag inside the element of that name.
+Its value is its stripped text, or None if the page has no such element.
+
+A field takes the first of its alternatives that is not None: a constant
+"value", or the value "from" an element, an earlier field, the page "url" or
+its "site" slug, passed through "ops" in order. An alternative with "unless"
+is skipped when that value is not None. Ops are "nonempty" (None for an empty
+string), "strip", "lower", "upper", "title", "capitalize",
+{"contains": text} (None unless the value contains text),
+{"replace": [old, new]} and {"split": separator, "index": i} (the i-th part,
+None if there are fewer; "maxsplit" as for str.split, parts are stripped
+unless "strip" is false).
+
+The name, title and company fields make the record. If any of the values a
+"required" entry lists is None, its message is printed and the page gives no
+record. "stream_until" names the element after which nothing is read (see
+streaming.py); "volatile_patterns" are added to the fingerprint patterns.
+
+Rules are compiled once per process (load). All the elements are found in a
+single pass over the document, and the restricted parse only builds the
+elements the rules can match.
+"""
+import hashlib
+import json
+import os
+
+from bs4 import SoupStrainer
+
+import settings
+from streaming import Target
+
+# Fields making up a record, in the shape every vendor's JSON file uses
+RECORD_FIELDS = ('name', 'title', 'company')
+
+_loaded = {}
+
+
+def rules_path(vendor):
+    return os.path.join(settings.RULES_DIR, f'{vendor}.json')
+
+
+def load(path):
+    """The compiled rules in path, compiled on first use in this process"""
+    rules = _loaded.get(path)
+    if rules is None:
+        rules = _loaded[path] = Rules(path)
+    return rules
+
+
+class ValueTest:
+    """
+    Attribute test for the restricted parse's strainer and for stream_until:
+    true if the value could satisfy any of the (how, wanted) tests, how being
+    'class', 'class_contains' or 'equals'. A class instead of a closure, so
+    the strainer can be sent to parse processes.
+    """
+
+    def __init__(self, tests):
+        self.tests = tests
+
+    def __call__(self, value):
+        if value is None:
+            return False
+        if isinstance(value, list):
+            value = ' '.join(value)
+        for how, wanted in self.tests:
+            if how == 'class' and (wanted in value.split() or value == wanted):
+                return True
+            if how == 'class_contains' and wanted in value:
+                return True
+            if how == 'equals' and value == wanted:
+                return True
+        return False
+
+
+class Selector:
+    def __init__(self, name, tag=None, within=None, attrs=None, **classes):
+        self.name = name
+        self.tag = tag
+        self.within = within
+        self.attrs = attrs or {}
+        self.class_ = classes.pop('class', None)
+        self.class_contains = classes.pop('class_contains', None)
+        if classes:
+            raise ValueError(f"Unknown keys in element {name}: {', '.join(classes)}")
+
+    def tests(self):
+        """{attribute: [(how, wanted)]} this selector puts on a tag's attributes"""
+        tests = {attr: [('equals', value)] for attr, value in self.attrs.items()}
+        if self.class_ is not None:
+            tests.setdefault('class', []).append(('class', self.class_))
+        if self.class_contains is not None:
+            tests.setdefault('class', []).append(('class_contains', self.class_contains))
+        return tests
+
+    def matches(self, tag):
+        for attr, wanted in self.attrs.items():
+            if tag.get(attr) != wanted:
+                return False
+        if self.class_ is not None or self.class_contains is not None:
+            classes = tag.get('class')
+            if not classes:
+                return False
+            if isinstance(classes, str):
+                classes = classes.split()
+            joined = ' '.join(classes)
+            if self.class_ is not None and self.class_ not in classes and joined != self.class_:
+                return False
+            if self.class_contains is not None and self.class_contains not in joined:
+                return False
+        return True
+
+
+def _split(separator, index, maxsplit=-1, strip=True):
+    def split(value):
+        parts = value.split(separator, maxsplit)
+        if not -len(parts) <= index < len(parts):
+            return None
+        return parts[index].strip() if strip else parts[index]
+    return split
+
+
+TEXT_OPS = {
+    'nonempty': lambda value: value or None,
+    'strip': str.strip,
+    'lower': str.lower,
+    'upper': str.upper,
+    'title': str.title,
+    'capitalize': str.capitalize,
+}
+
+
+def compile_op(op):
+    if isinstance(op, str) and op in TEXT_OPS:
+        return TEXT_OPS[op]
+    if isinstance(op, dict) and 'split' in op:
+        return _split(op['split'], op['index'], op.get('maxsplit', -1), op.get('strip', True))
+    if isinstance(op, dict) and 'contains' in op:
+        return lambda value: value if op['contains'] in value else None
+    if isinstance(op, dict) and 'replace' in op:
+        old, new = op['replace']
+        return lambda value: value.replace(old, new)
+    raise ValueError(f"Unknown op: {op}")
+
+
+class Alternative:
+    def __init__(self, spec):
+        self.source = spec.get('from')
+        self.value = spec.get('value')
+        self.unless = spec.get('unless')
+        self.ops = [compile_op(op) for op in spec.get('ops', [])]
+
+    def evaluate(self, values):
+        if self.unless is not None and values.get(self.unless) is not None:
+            return None
+        value = self.value if self.source is None else values.get(self.source)
+        for op in self.ops:
+            if value is None:
+                break
+            value = op(value)
+        return value
+
+
+class Rules:
+    """A vendor's compiled rule file; call it with a fetched Page to get the page's record (or None)"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            source = f.read()
+        with open(__file__, 'rb') as f:
+            engine_source = f.read()
+        self.path = path
+        self.spec = json.loads(source)
+        self.vendor = self.spec['vendor']
+        # Fingerprints (see fingerprints.py) are dropped when the rules or the engine change
+        self.version = hashlib.blake2b(source + engine_source, digest_size=8).hexdigest()
+        self.volatile_patterns = self.spec.get('volatile_patterns', [])
+
+        self.selectors = [Selector(name, **spec) for name, spec in self.spec['elements'].items()]
+        for selector in self.selectors:
+            if selector.within is not None and selector.within not in self.spec['elements']:
+                raise ValueError(f"{path}: element {selector.name} is within unknown element {selector.within}")
+        # Tag name -> the selectors a tag of that name may match; any_tag for other names
+        self.any_tag = tuple(selector for selector in self.selectors if selector.tag is None)
+        self.by_tag = {}
+        for selector in self.selectors:
+            if selector.tag is not None:
+                self.by_tag.setdefault(selector.tag, list(self.any_tag)).append(selector)
+        self.by_tag = {tag: tuple(selectors) for tag, selectors in self.by_tag.items()}
+
+        self.fields = [(name, [Alternative(spec) for spec in alternatives])
+                       for name, alternatives in self.spec['fields'].items()]
+        missing = [name for name in RECORD_FIELDS if name not in self.spec['fields']]
+        if missing:
+            raise ValueError(f"{path}: no rules for the {', '.join(missing)} field(s)")
+        self.required = [(entry['values'], entry['message']) for entry in self.spec.get('required', [])]
+        self.parse_only = self._strainer()
+        self.stream_until = self._target(self.spec['stream_until']) if self.spec.get('stream_until') else None
+
+    def __reduce__(self):
+        # Parse processes compile the rules themselves once, instead of unpickling them with every page
+        return load, (self.path,)
+
+    def _strainer(self):
+        """
+        SoupStrainer keeping the tags the top-level elements may match (the
+        others are inside them): their tag names, and the attribute tests that
+        all of them share. It may keep more than the rules match, never less.
+        """
+        top = [selector for selector in self.selectors if selector.within is None]
+        tags = None if any(selector.tag is None for selector in top) else sorted({selector.tag for selector in top})
+        tests = [selector.tests() for selector in top]
+        shared = set.intersection(*(set(selector_tests) for selector_tests in tests)) if tests else set()
+        attrs = {attr: ValueTest([test for selector_tests in tests for test in selector_tests[attr]])
+                 for attr in sorted(shared)}
+        return SoupStrainer(tags, attrs=attrs)
+
+    def _target(self, name):
+        """The streaming.Target for an element"""
+        selector = next(selector for selector in self.selectors if selector.name == name)
+        if selector.tag is None or selector.within is not None:
+            raise ValueError(f"{self.path}: stream_until needs a top-level element with a tag")
+        attrs = dict(selector.attrs)
+        if selector.class_contains is not None:
+            attrs['class_'] = ValueTest(selector.tests()['class'])
+        elif selector.class_ is not None:
+            attrs['class_'] = selector.class_
+        return Target(selector.tag, **attrs)
+
+    def find(self, soup):
+        """{element name: first matching tag or None}, in one pass over the document"""
+        found = {selector.name: None for selector in self.selectors}
+        left = len(found)
+        by_tag, any_tag = self.by_tag, self.any_tag
+        for node in soup.descendants:
+            name = node.name
+            # Strings have no name
+            if name is None:
+                continue
+            for selector in by_tag.get(name, any_tag):
+                if found[selector.name] is not None or not selector.matches(node):
+                    continue
+                if selector.within is not None and not _inside(node, found[selector.within]):
+                    continue
+                found[selector.name] = node
+                left -= 1
+                if not left:
+                    return found
+        return found
+
+    def __call__(self, page):
+        values = {'url': page.url, 'site': page.site}
+        for name, element in self.find(page.soup).items():
+            values[name] = element.get_text(strip=True) if element is not None else None
+        for name, alternatives in self.fields:
+            value = None
+            for alternative in alternatives:
+                value = alternative.evaluate(values)
+                if value is not None:
+                    break
+            values[name] = value
+
+        for names, message in self.required:
+            if any(values.get(name) is None for name in names):
+                print(message.format(url=page.url))
+                return None
+
+        name, title, company = (values[field] for field in RECORD_FIELDS)
+        return {
+            "company": company,
+            "testimonial": {
+                "name": name,
+                "title": title,
+                "company": company,
+                "URL": page.url
+            }
+        }
+
+
+def _inside(node, ancestor):
+    if ancestor is None:
+        return False
+    for parent in node.parents:
+        if parent is ancestor:
+            return True
+    return False
@@ -0,0 +1,95 @@
+"""
+Scraper for the vendors described by a rule file instead of a module of their
+own (see rule_engine.py for the extraction rules). Besides the rules, the
+file gives the vendor's pages:
+
+    "vendor": "chef",
+    "output_file": "chef_case_studies.json",
+    "site_url": "https://www.chef.io",
+    "page_url": "https://www.chef.io/customers/{slug}",
+    "sanitize_slugs": true,
+    "case_study_url": "<regex for case study URLs in the sitemap, with a slug group>",
+    "pages": ["slug", ...]
+
+runner.py loads a RuleVendor as the plugin of every vendor with a rule file.
+Adding a vendor is adding its rule file. To scrape one on its own:
+
+    python python_files/rule_vendor.py chef
+
+The vendors' former scrapers (scrape3.py mongodb, scrape4.py confluent,
+scrape5.py splunk, scrape7.py chef, scrape8.py circleci, scrape9.py fastly)
+remain as thin wrappers, so running or importing them works as before.
+"""
+import argparse
+import re
+
+import rule_engine
+from discovery import discover
+from fetch_engine import scrape_pages
+from output import save_records
+
+_plugins = {}
+
+
+def load(vendor):
+    """The plugin for a vendor's rule file, read on first use"""
+    plugin = _plugins.get(vendor)
+    if plugin is None:
+        plugin = _plugins[vendor] = RuleVendor(vendor)
+    return plugin
+
+
+def run(vendor):
+    """Scrape a vendor and save its records, as running its scraper does"""
+    plugin = load(vendor)
+    plugin.save(plugin.scrape())
+
+
+def sanitize_url(company_name):
+    """Sanitize company name to match the URL format."""
+    company_name = company_name.lower()  # Lowercase for consistency
+    company_name = re.sub(r'[^a-z0-9-]', '', company_name)  # Remove non-alphanumeric characters except dash
+    return company_name
+
+
+class RuleVendor:
+    def __init__(self, vendor):
+        self.rules = rule_engine.load(rule_engine.rules_path(vendor))
+        spec = self.rules.spec
+        self.VENDOR = vendor
+        self.OUTPUT_FILE = spec['output_file']
+        self.SITE_URL = spec['site_url']
+        self.CASE_STUDY_URL = re.compile(spec['case_study_url'], re.IGNORECASE)
+        self.PARSE_ONLY = self.rules.parse_only
+        self.STREAM_UNTIL = self.rules.stream_until
+        self.extract = self.rules
+
+    def page_url(self, site):
+        """URL of the case study page for a slug"""
+        spec = self.rules.spec
+        return spec['page_url'].format(slug=sanitize_url(site) if spec.get('sanitize_slugs') else site)
+
+    def pages(self):
+        """Map each case study URL to its slug"""
+        # Ignore empty or malformed entries
+        return {self.page_url(site): site for site in self.rules.spec['pages'] if site.strip()}
+
+    def discovered_pages(self):
+        """The known case study pages plus any new ones in the sitemap"""
+        return discover(self.VENDOR, self.pages(), self.SITE_URL, self.CASE_STUDY_URL, self.page_url)
+
+    def scrape(self):
+        frontier = self.discovered_pages()
+        return scrape_pages(self.VENDOR, frontier.pages, self.extract, parse_only=self.PARSE_ONLY,
+                            lastmod=frontier.lastmod, stream_until=self.STREAM_UNTIL)
+
+    def save(self, data, filename=None):
+        """Saves the scraped data to a JSON file."""
+        save_records(self.VENDOR, data, filename or self.OUTPUT_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape a vendor described by a rule file.")
+    parser.add_argument('vendor', help="Name of the rule file in python_files/rules, without .json")
+    args = parser.parse_args()
+    run(args.vendor)
@@ -0,0 +1,36 @@
+"""
+Per-vendor counters from the last run, written by the scrapers to
+.cache/stats/<vendor>.json so main.py can show them in its summary.
+"""
+import json
+import os
+
+import settings
+
+STATS_DIR = os.path.join(settings.CACHE_DIR, 'stats')
+
+
+def _path(vendor):
+    return os.path.join(STATS_DIR, f'{vendor}.json')
+
+
+def write(vendor, stats):
+    os.makedirs(STATS_DIR, exist_ok=True)
+    with open(_path(vendor), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+
+
+def read(vendor):
+    """Return the vendor's counters, or {} if it didn't write any"""
+    try:
+        with open(_path(vendor), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def clear(vendor):
+    try:
+        os.remove(_path(vendor))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,93 @@
+"""
+Single-process runner: imports only the selected vendor scrapers, as plugins,
+and runs them on threads sharing one fetch engine, HTTP session and parser
+setup. Each plugin module provides:
+
+    VENDOR, OUTPUT_FILE
+    pages()        -> {url: site} to fetch
+    discovered_pages() (optional) -> discovery.Frontier of pages() plus the sitemap's
+    extract(page)  -> record, list of records, or None for a fetched Page
+    scrape()       -> the vendor's records
+    save(records)  -> write the vendor's JSON file
+
+Vendors with a rule file in python_files/rules are scraped by rule_vendor.py,
+which gives each of them a plugin object with the same interface.
+"""
+import importlib
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+import run_stats
+import settings
+
+RULE_PLUGIN = 'rule_vendor'
+
+
+def rule_files():
+    """vendor -> rule file, for the vendors described by a rule file"""
+    return {name[:-len('.json')]: os.path.join(settings.RULES_DIR, name)
+            for name in sorted(os.listdir(settings.RULES_DIR)) if name.endswith('.json')}
+
+
+# vendor -> scraper module in python_files
+PLUGINS = {
+    'datadog': 'scrape1',
+    'digitalocean': 'scrape2',
+    'atlassian': 'scrape6',
+}
+PLUGINS.update(dict.fromkeys(rule_files(), RULE_PLUGIN))
+
+
+def load_plugin(vendor):
+    """Import a vendor's scraper module (or read its rule file) on first use"""
+    module = importlib.import_module(PLUGINS[vendor])
+    if PLUGINS[vendor] == RULE_PLUGIN:
+        return module.load(vendor)
+    return module
+
+
+def frontier(vendor):
+    """The pages (and sitemap lastmods) a vendor's scrape fetches"""
+    plugin = load_plugin(vendor)
+    if hasattr(plugin, 'discovered_pages'):
+        return plugin.discovered_pages()
+    from discovery import Frontier
+    return Frontier(plugin.pages(), {})
+
+
+def run_vendor(vendor):
+    """Scrape and save one vendor, returning the same summary as a subprocess job"""
+    print(f"Running {vendor} in process")
+    run_stats.clear(vendor)
+    metrics.clear(vendor)
+    start = time.perf_counter()
+    records = None
+    try:
+        plugin = load_plugin(vendor)
+        records = plugin.scrape()
+        plugin.save(records)
+        returncode = 0
+    except Exception:
+        print(f"Error running {vendor}:")
+        traceback.print_exc()
+        returncode = 1
+    return {
+        'vendor': vendor,
+        'seconds': time.perf_counter() - start,
+        'returncode': returncode,
+        'records': None if records is None else len(records),
+        'stats': run_stats.read(vendor),
+    }
+
+
+def run_vendors(vendors, jobs):
+    """Run the vendors on up to jobs threads"""
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(run_vendor, vendor) for vendor in vendors]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
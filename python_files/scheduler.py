@@ -0,0 +1,227 @@
+"""
+Change-frequency-aware refresh scheduling.
+
+Every run records, per vendor in .cache/schedule/<vendor>.json, when each
+page was checked and whether its extracted record had changed since the check
+before. A page's change rate is estimated from that history, blended with
+the vendor's churn (changed records and new pages per day across all its
+pages) while the page has little history of its own:
+
+    rate = (changes + PRIOR_DAYS * vendor rate) / (days observed + PRIOR_DAYS)
+
+and the chance that it has changed since it was last checked is
+1 - exp(-rate * days since). With a request budget (main.py --budget, or
+SCRAPER_REQUEST_BUDGET) each run fetches, across all the selected vendors:
+
+    1. new pages, pages without a record and pages whose sitemap <lastmod> moved,
+    2. pages not checked for SCRAPER_MAX_CHECK_AGE_DAYS,
+    3. the rest in order of their chance of having changed,
+
+until the budget is used up. Pages whose sitemap <lastmod> is the one their
+record was extracted at cost nothing (see lastmod.py), and neither do pages
+recorded as dead (see dead_links.py), which are skipped. The others are
+deferred: they keep their last record, or are left out of the output until a
+later run if they have none. main.py --dry-run prints the plan without
+fetching any case study page.
+"""
+import json
+import math
+import os
+import time
+from collections import Counter
+
+import json_state
+import settings
+from dead_links import DeadLinks
+from fingerprints import version_of
+from lastmod import LastModified
+from runner import load_plugin
+
+SCHEDULE_DIR = os.path.join(settings.CACHE_DIR, 'schedule')
+PLAN_PATH = os.path.join(SCHEDULE_DIR, 'plan.json')
+
+DAY = 86400
+# Weight, in days of observation, of the vendor's churn in a page's rate
+PRIOR_DAYS = 30
+# Floor for the vendor rate: about one change a year
+MIN_RATE = 1 / 365
+# Runs kept per vendor for its new-page rate
+RUNS_KEPT = 60
+
+# Reasons a page is fetched, in order of priority
+NEW, MOVED, OVERDUE, DUE = 'new', 'moved', 'overdue', 'due'
+# Reasons it is not
+VERIFIED, DEAD, DEFERRED = 'verified', 'dead', 'deferred'
+
+
+def record_hash(record):
+    return json.dumps(record, sort_keys=True, ensure_ascii=False)
+
+
+class ChangeHistory:
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self.path = os.path.join(SCHEDULE_DIR, f'{vendor}.json')
+        data = json_state.read(self.path, {})
+        self.pages = data.get('pages', {})
+        self.runs = data.get('runs', [])
+        self.seen = Counter()
+        # URLs observed or forgotten since the history was read
+        self.changed = set()
+
+    def record(self, url):
+        """The last record extracted from url, or None"""
+        entry = self.pages.get(url)
+        return entry['record'] if entry else None
+
+    def observe(self, url, record, now=None):
+        """Note that url was checked and gave record"""
+        now = now or time.time()
+        self.changed.add(url)
+        entry = self.pages.get(url)
+        if entry is None:
+            self.seen['new'] += 1
+            self.pages[url] = {'first_checked': now, 'last_checked': now, 'last_changed': now, 'checks': 1,
+                               'changes': 0, 'hash': record_hash(record), 'record': record}
+            return
+        new_hash = record_hash(record)
+        if new_hash != entry['hash']:
+            self.seen['changed'] += 1
+            entry['changes'] += 1
+            entry['last_changed'] = now
+            entry['hash'] = new_hash
+            entry['record'] = record
+        entry['checks'] += 1
+        entry['last_checked'] = now
+
+    def forget(self, url):
+        self.pages.pop(url, None)
+        self.changed.add(url)
+
+    def vendor_rate(self):
+        """Changed records and new pages per page per day, over the vendor's history"""
+        days = sum((entry['last_checked'] - entry['first_checked']) / DAY for entry in self.pages.values())
+        changes = sum(entry['changes'] for entry in self.pages.values())
+        if len(self.runs) > 1:
+            changes += sum(run['new'] for run in self.runs[1:])
+        return max(MIN_RATE, changes / days) if days else MIN_RATE
+
+    def rate(self, url, vendor_rate):
+        """Estimated changes per day of url's record"""
+        entry = self.pages[url]
+        days = (entry['last_checked'] - entry['first_checked']) / DAY
+        return (entry['changes'] + PRIOR_DAYS * vendor_rate) / (days + PRIOR_DAYS)
+
+    def save(self, urls=None):
+        """
+        Write the changed pages (see json_state.py), dropping pages that are no
+        longer in urls (if given), and log the run. Without urls (part of a
+        run, e.g. a queue worker's share) the new and changed counts are kept
+        for the next run logged instead.
+        """
+        with json_state.locked(self.path):
+            data = json_state.read(self.path, {})
+            self.pages = json_state.merge(data.get('pages', {}), self.pages, self.changed, urls)
+            self.runs = data.get('runs', [])
+            seen = self.seen + Counter(data.get('unlogged', {}))
+            if urls is not None:
+                self.runs = (self.runs + [{'at': time.time(), 'checked': sum(1 for url in urls if url in self.pages),
+                                           'new': seen['new'], 'changed': seen['changed']}])[-RUNS_KEPT:]
+                seen = Counter()
+            json_state.write(self.path, {'pages': self.pages, 'runs': self.runs, 'unlogged': dict(seen)})
+        self.changed.clear()
+        self.seen.clear()
+
+
+def candidates(vendor, frontier, now=None):
+    """[(url, reason, chance of having changed)] for every page of a vendor's frontier"""
+    now = now or time.time()
+    history = ChangeHistory(vendor)
+    modified = LastModified(vendor)
+    dead = DeadLinks(vendor)
+    # A lastmod record made by another version of the extractor doesn't verify its page
+    version = version_of(load_plugin(vendor).extract)
+    vendor_rate = history.vendor_rate()
+    pages = []
+    for url in frontier.pages:
+        entry = history.pages.get(url)
+        lastmod = frontier.lastmod.get(url)
+        if dead.is_dead(url):
+            pages.append((url, DEAD, 0.0))
+        elif entry is None or entry['record'] is None:
+            pages.append((url, NEW, 1.0))
+        elif lastmod and modified.unchanged(url, lastmod, version) is not None:
+            pages.append((url, VERIFIED, 0.0))
+        elif lastmod and url in modified.entries:
+            pages.append((url, MOVED, 1.0))
+        else:
+            days = (now - entry['last_checked']) / DAY
+            chance = 1 - math.exp(-history.rate(url, vendor_rate) * days)
+            pages.append((url, OVERDUE if days >= settings.MAX_CHECK_AGE_DAYS else DUE, chance))
+    return pages
+
+
+def make_plan(frontiers, budget):
+    """
+    Plan a run over {vendor: Frontier} within budget page requests (0 for no
+    limit); returns {vendor: [(url, reason, chance)]} where reason is one of
+    the fetch reasons or VERIFIED/DEAD/DEFERRED
+    """
+    planned = {vendor: candidates(vendor, frontier) for vendor, frontier in frontiers.items()}
+    tiers = {NEW: 0, MOVED: 0, OVERDUE: 1, DUE: 2}
+    ranked = sorted(((tiers[reason], -chance, vendor, index)
+                     for vendor, pages in planned.items()
+                     for index, (_, reason, chance) in enumerate(pages) if reason in tiers))
+    for _, _, vendor, index in ranked[budget:] if budget else []:
+        url, _, chance = planned[vendor][index]
+        planned[vendor][index] = (url, DEFERRED, chance)
+    return planned
+
+
+def save_plan(plan, budget):
+    os.makedirs(SCHEDULE_DIR, exist_ok=True)
+    data = {'created': time.time(), 'budget': budget,
+            'vendors': {vendor: [{'url': url, 'reason': reason, 'chance': round(chance, 4)}
+                                 for url, reason, chance in pages]
+                        for vendor, pages in plan.items()}}
+    tmp_path = f'{PLAN_PATH}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, PLAN_PATH)
+
+
+def deferred_pages(vendor):
+    """URLs the saved plan defers for vendor (empty if there is no plan for it)"""
+    try:
+        with open(PLAN_PATH, encoding='utf-8') as f:
+            pages = json.load(f)['vendors'].get(vendor, [])
+    except (OSError, ValueError, KeyError):
+        return set()
+    return {page['url'] for page in pages if page['reason'] == DEFERRED}
+
+
+def print_plan(plan, budget, top=10):
+    reasons = [NEW, MOVED, OVERDUE, DUE, VERIFIED, DEAD, DEFERRED]
+    print(f"Run plan, budget {budget or 'unlimited'} page requests:")
+    print(f"{'vendor':<14}{'pages':>7}" + ''.join(f'{reason:>10}' for reason in reasons) + f"{'fetch':>8}{'stale':>8}")
+    totals = Counter()
+    for vendor, pages in plan.items():
+        counts = Counter(reason for _, reason, _ in pages)
+        fetch = sum(counts[reason] for reason in (NEW, MOVED, OVERDUE, DUE))
+        # Expected number of deferred records that are out of date
+        stale = sum(chance for _, reason, chance in pages if reason == DEFERRED)
+        totals.update(counts)
+        totals['pages'] += len(pages)
+        totals['fetch'] += fetch
+        totals['stale'] += stale
+        print(f"{vendor:<14}{len(pages):>7}" + ''.join(f'{counts[reason]:>10}' for reason in reasons)
+              + f"{fetch:>8}{stale:>8.1f}")
+    print(f"{'total':<14}{totals['pages']:>7}" + ''.join(f'{totals[reason]:>10}' for reason in reasons)
+          + f"{totals['fetch']:>8}{totals['stale']:>8.1f}")
+
+    due = sorted(((chance, vendor, url) for vendor, pages in plan.items()
+                  for url, reason, chance in pages if reason == DUE), reverse=True)
+    if due:
+        print(f"\nMost likely to have changed of the {len(due)} scheduled known pages:")
+        for chance, vendor, url in due[:top]:
+            print(f"  {chance:6.1%}  {vendor:<14}{url}")
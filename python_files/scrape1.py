@@ -1,10 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
-import json
-import time
 from urllib.parse import quote
 import re
 
+from bs4 import Tag
+
+import settings
+from fetch_engine import fetch, scrape_pages
+from output import save_records
+from parsing import make_soup
+
+VENDOR = 'datadog'
+OUTPUT_FILE = 'datadog_testimonials.json'
+BASE_URL = "https://www.datadoghq.com/case-studies/"
+
+# Elements that count as text containers for the generic testimonial search
+_BLOCK_TAGS = {'div', 'span', 'p'}
+
 def clean_company_name(name):
     """Clean and format company name for URL"""
     return re.sub(r'[^a-zA-Z0-9-]', '', name.lower().replace(' ', '-'))
@@ -34,6 +44,25 @@ def extract_testimonial(soup):
             }
     
     # Option 3: Generic search for grouped name/title/company
+    if settings.DATADOG_EXTRACT_MODE == 'legacy':
+        text_elements = find_grouped_text_legacy(soup)
+    else:
+        text_elements = find_grouped_text_indexed(soup)
+    if text_elements:
+        return {
+            'name': text_elements[0],
+            'title': text_elements[1],
+            'company': text_elements[2],
+        }
+    
+    return None
+
+def _looks_like_name(text):
+    """A name usually has two or three words"""
+    return ' ' in text and len(text.split()) <= 3
+
+def find_grouped_text_legacy(soup):
+    """Original Option 3: re-scan every div's descendants (quadratic in page size)"""
     # Look for any div containing three consecutive text elements
     divs = soup.find_all('div')
     for div in divs:
@@ -41,28 +70,73 @@ def extract_testimonial(soup):
                         if el.text.strip() and not el.find(['div', 'span', 'p'])]
         if len(text_elements) >= 3:
             # Check if the elements look like a testimonial (name usually has two words)
-            if ' ' in text_elements[0] and len(text_elements[0].split()) <= 3:
-                return {
-                    'name': text_elements[0],
-                    'title': text_elements[1],
-                    'company': text_elements[2],
-                    
-                }
-    
+            if _looks_like_name(text_elements[0]):
+                return text_elements[:3]
     return None
 
-def scrape_datadog_cases():
-    base_url = "https://www.datadoghq.com/case-studies/"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+def index_leaf_texts(soup):
+    """
+    Walk the tree once. Returns (leaf_texts, div_ranges): the stripped texts of
+    div/span/p elements that contain no div/span/p, in document order, and for
+    every div (in document order) the [start, end) slice of leaf_texts inside it.
+    """
+    leaf_texts = []
+    div_ranges = []
+    # Each frame: [tag, iterator over its children, index in div_ranges, contains a div/span/p]
+    stack = [[soup, iter(soup.contents), None, False]]
+    while stack:
+        frame = stack[-1]
+        child = next(frame[1], None)
+        if child is not None:
+            if isinstance(child, Tag):
+                div_index = None
+                if child.name == 'div':
+                    div_index = len(div_ranges)
+                    div_ranges.append([len(leaf_texts), None])
+                stack.append([child, iter(child.contents), div_index, False])
+            continue
+
+        # All children done: close the element
+        stack.pop()
+        tag, _, div_index, has_block = frame
+        if div_index is not None:
+            # A div's own text is not part of its descendants
+            div_ranges[div_index][1] = len(leaf_texts)
+        is_block = tag.name in _BLOCK_TAGS
+        if is_block and not has_block:
+            text = tag.text.strip()
+            if text:
+                leaf_texts.append(text)
+        if stack and (is_block or has_block):
+            stack[-1][3] = True
+    return leaf_texts, div_ranges
+
+def find_grouped_text_indexed(soup):
+    """Option 3 answered from a single-pass index; same result as find_grouped_text_legacy"""
+    leaf_texts, div_ranges = index_leaf_texts(soup)
+    for start, end in div_ranges:
+        if end - start >= 3 and _looks_like_name(leaf_texts[start]):
+            return leaf_texts[start:start + 3]
+    return None
+
+def extract_case_study(page):
+    """Build the record for one Datadog company page"""
+    testimonial = extract_testimonial(page.soup)
+    if not testimonial:
+        return None
+    return {
+        'company': page.site,
+        'testimonial': testimonial
     }
-    
+
+def company_pages():
+    """Discover the company pages from the cards on the case studies listing"""
     # Get main page
-    response = requests.get(base_url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    response = fetch(BASE_URL)
+    soup = make_soup(response.text)
     
     # Find all company cards
-    companies = []
+    pages = {}
     cards = soup.find_all('div', class_='card-body')
     
     for card in cards:
@@ -77,37 +151,32 @@ def scrape_datadog_cases():
         if not company_url_name:
             continue
             
-        company_url = f"{base_url}{company_url_name}"
-        
-        # Add delay to avoid overwhelming the server
-        time.sleep(1)
-        
-        try:
-            # Get company-specific page
-            company_response = requests.get(company_url, headers=headers)
-            company_soup = BeautifulSoup(company_response.text, 'html.parser')
-            
-            testimonial = extract_testimonial(company_soup)
-            if testimonial:
-                companies.append({
-                    'company': company_url_name,
-                    'testimonial': testimonial
-                })
-        except Exception as e:
-            print(f"Error processing {company_name}: {str(e)}")
-    
-    return companies
+        pages[f"{BASE_URL}{company_url_name}"] = company_url_name
+    return pages
+
+def scrape_datadog_cases():
+    # Company pages are paced by the shared per-host rate limiter
+    return scrape_pages(VENDOR, company_pages(), extract_case_study)
+
+def save_to_json(case_studies, filename=OUTPUT_FILE):
+    """Saves the scraped data to a JSON file."""
+    save_records(VENDOR, case_studies, filename, indent=2)
 
 def main():
     # Scrape data
     case_studies = scrape_datadog_cases()
     
     # Save to JSON file
-    with open('datadog_testimonials.json', 'w', encoding='utf-8') as f:
-        json.dump(case_studies, f, indent=2, ensure_ascii=False)
+    save_to_json(case_studies)
     
     print(f"Successfully scraped {len(case_studies)} case studies")
     return case_studies
 
+# Plugin interface used by the single-process runner
+pages = company_pages
+extract = extract_case_study
+scrape = scrape_datadog_cases
+save = save_to_json
+
 if __name__ == "__main__":
     main()
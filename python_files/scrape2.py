@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import subprocess
+import threading
+from urllib.parse import urljoin
+
+import requests
+from bs4 import SoupStrainer
+
+import settings
+from dead_links import DeadLinks
+from discovery import discover
+from fetch_engine import extract_page, fetch, mirrored, scrape_pages
+from output import save_records
+from parsing import make_soup
+
+VENDOR = 'digitalocean'
+OUTPUT_FILE = "digital_ocean_case_studies.json"
+
+SITE_URL = 'https://www.digitalocean.com'
+LISTING_URL = 'https://www.digitalocean.com/customers'
+BASE_URL = 'https://www.digitalocean.com/customers/'
+# Case study pages as they are linked from the listing and the sitemap
+CASE_STUDY_URL = re.compile(r'^https?://(?:www\.)?digitalocean\.com/customers/(?P<slug>[^/?#]+)/?(?:[?#].*)?$', re.IGNORECASE)
+# Customer links in the listing's embedded Next.js data
+NEXT_DATA_LINK = re.compile(r'"((?:https://www\.digitalocean\.com)?/customers/[^"?#\s]+)"')
+
+# The hero quote section is server-rendered; its styled-components hash suffix changes between deploys
+HERO_QUOTE = '[class*="HeroQuoteStyles__StyledQuoteSectionContent"] figcaption'
+
+def is_hero_quote(class_name):
+    return class_name and "HeroQuoteStyles__StyledQuoteSectionContent" in class_name
+
+# Module-level matcher rather than a lambda, so the strainer can be sent to parse processes
+PARSE_ONLY = SoupStrainer(class_=is_hero_quote)
+
+# Renders the pages whose quote only appears with JavaScript (see render_pool.js)
+RENDER_POOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scrapper', 'render_pool.js')
+
+def extract_case_study(page):
+    """Build the record for one DigitalOcean customer page from its hero quote caption"""
+    figcaption = page.soup.select_one(HERO_QUOTE)
+    if not figcaption:
+        print(f"figcaption not found for site: {page.url}")
+        return None
+
+    # "Name, Title, Company"
+    text = figcaption.get_text(' ', strip=True)
+    parts = [part.strip() for part in text.split(',')]
+    if len(parts) < 3:
+        print(f"Invalid testimonial format at {page.url}: {text}")
+        return None
+
+    return {
+        "company": parts[2],
+        "testimonial": {
+            "name": parts[0],
+            "title": parts[1],
+            "company": parts[2],
+            "URL": page.url
+        }
+    }
+
+def page_url(site):
+    """URL of the customer story page for a slug"""
+    return f'{BASE_URL}{site}'
+
+def listing_slugs(html):
+    """Customer story slugs linked from the listing page, from its HTML and its Next.js data"""
+    soup = make_soup(html)
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    next_data = soup.find('script', id='__NEXT_DATA__')
+    if next_data and next_data.string:
+        links += NEXT_DATA_LINK.findall(next_data.string)
+
+    slugs = []
+    for link in links:
+        match = CASE_STUDY_URL.match(urljoin(SITE_URL, link))
+        # Exclude the "Load More" button
+        if match and 'load-more' not in link and match.group('slug') not in slugs:
+            slugs.append(match.group('slug'))
+    return slugs
+
+def case_study_pages():
+    """Map each customer story URL to its slug: the known stories plus those on the listing page"""
+    case_studies = [
+        'picap', 'scraperapi-2', 'tango', 'payload', 'tech-in-schools', 'younet', 'lugmety',
+        'ersilia', 'deep-focus', 'hack-the-box', 'atom-learning', 'zuar', 'vuukle', 'stablepoint',
+        'cloudways', 'efelle', 'crowd-content', 'routetrust', 'podiant', 'content-ignite', 'ghost',
+        'urlbox', 'parabol', 'publitio', 'reclaim-hosting', 'io', 'rockerbox'
+    ]
+    try:
+        response = fetch(LISTING_URL)
+        response.raise_for_status()
+        case_studies += [slug for slug in listing_slugs(response.text) if slug not in case_studies]
+    except requests.exceptions.RequestException as e:
+        print(f"Could not read the customer listing: {str(e)}")
+
+    return {page_url(site): site for site in case_studies}
+
+def discovered_pages():
+    """The customer story pages plus any new ones in the sitemap"""
+    return discover(VENDOR, case_study_pages(), SITE_URL, CASE_STUDY_URL, page_url)
+
+def _start_browser_pool(serve=False):
+    try:
+        return subprocess.Popen(['node', RENDER_POOL] + (['--serve'] if serve else []), stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    except OSError as e:
+        print(f"Could not start the browser pool: {str(e)}")
+        return None
+
+def _rendered(process, urls):
+    """
+    Yield (url, html) for each page whose quote showed up, until the pool says
+    the request is done (returns True) or its output ends (False)
+    """
+    # One JSON line per page, as each one finishes
+    for line in process.stdout:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if result.get('done'):
+            return True
+        if result.get('html'):
+            yield urls[result['index']], result['html']
+    return False
+
+def render_pages(urls):
+    """
+    Render urls in the headless browser pool and yield (url, html) for each
+    one whose hero quote showed up
+    """
+    request = {'urls': [mirrored(url) for url in urls], 'selector': HERO_QUOTE,
+               'concurrency': settings.BROWSER_POOL_SIZE}
+    print(f"Rendering {len(urls)} pages in a pool of {settings.BROWSER_POOL_SIZE} browser tabs")
+    if settings.BROWSER_KEEP_WARM:
+        yield from _render_warm(request, urls)
+        return
+    process = _start_browser_pool()
+    if process is None:
+        return
+    try:
+        process.stdin.write(json.dumps(request))
+        process.stdin.close()
+    except BrokenPipeError:
+        # It exited straight away; the reason is on its stderr
+        pass
+    yield from _rendered(process, urls)
+    if process.wait() != 0:
+        print(f"Browser pool exited with code {process.returncode}")
+
+# Browser pool kept running between scrapes with SCRAPER_BROWSER_KEEP_WARM=1
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+def _render_warm(request, urls):
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None or _browser_pool.poll() is not None:
+            _browser_pool = _start_browser_pool(serve=True)
+            if _browser_pool is None:
+                return
+        try:
+            _browser_pool.stdin.write(json.dumps(request) + '\n')
+            _browser_pool.stdin.flush()
+        except BrokenPipeError:
+            pass
+        finished = yield from _rendered(_browser_pool, urls)
+        # Its output ended without finishing the request: it died, start a new one next time
+        if not finished:
+            print(f"Browser pool exited with code {_browser_pool.wait()}")
+            _browser_pool = None
+
+def close_browser_pool():
+    """Stop the warm browser pool, if one is running"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is not None:
+            _browser_pool.stdin.close()
+            _browser_pool.wait()
+            _browser_pool = None
+
+def scrape_digitalocean_case_studies():
+    frontier = discovered_pages()
+    pages = frontier.pages
+    records = scrape_pages(VENDOR, pages, extract_case_study, parse_only=PARSE_ONLY, lastmod=frontier.lastmod)
+
+    # Pages whose quote isn't in the server-rendered HTML go to the browser, unless they are gone
+    by_url = {record['testimonial']['URL']: record for record in records}
+    dead_links = DeadLinks(VENDOR)
+    missing = [url for url in pages if url not in by_url and dead_links.reason(url) != 'gone']
+    if missing and settings.BROWSER_FALLBACK and settings.CACHE_MODE != 'offline':
+        for url, html in render_pages(missing):
+            record = extract_page(url, pages[url], html, extract_case_study)
+            if record:
+                by_url[url] = record
+                dead_links.forget(url)
+        dead_links.save()
+    return [by_url[url] for url in pages if url in by_url]
+
+def save_to_json(data, filename=OUTPUT_FILE):
+    """Saves the scraped data to a JSON file."""
+    save_records(VENDOR, data, filename, indent=2)
+
+# Plugin interface used by the single-process runner
+pages = case_study_pages
+extract = extract_case_study
+scrape = scrape_digitalocean_case_studies
+save = save_to_json
+
+if __name__ == "__main__":
+    extracted_data = scrape_digitalocean_case_studies()
+    save_to_json(extracted_data)
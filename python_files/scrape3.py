@@ -1,6 +1,18 @@
-import requests
-import json
-from bs4 import BeautifulSoup
+"""
+MongoDB case studies, scraped from the rules in rules/mongodb.json (see
+rule_vendor.py). Kept so that running this scraper, and importing its names
+apart from BASE_URL (see page_url), work as before.
+"""
+import rule_vendor
+
+_plugin = rule_vendor.load('mongodb')
+
+VENDOR = _plugin.VENDOR
+OUTPUT_FILE = _plugin.OUTPUT_FILE
+SITE_URL = _plugin.SITE_URL
+CASE_STUDY_URL = _plugin.CASE_STUDY_URL
+PARSE_ONLY = _plugin.PARSE_ONLY
+STREAM_UNTIL = _plugin.STREAM_UNTIL
 
 def extract_name_details(text):
     """
@@ -27,58 +39,13 @@ def extract_name_details(text):
 
     return name, title, company
 
-def scrape_mongodb_case_studies():
-    base_url = 'https://www.mongodb.com/solutions/customer-case-studies/'
-    case_studies = [
-        'xtransfer', 'csx', 'clarifruit', 'autodesk', 'swisscom',
-        'lokalee', 'paychex', 'relevanceai', 'vainu', 'indeed', 'cargurus',
-        'igt-solutions', 'naologic', 'toyota-connected', 'poste-italiane',
-        'cisco', 'ceto', 'questflow', 'bumpp', 'scalestack', 'syncly',
-        'okta', 'gong', 'wolt', 'zebra', 'kovai', 'ada', 'playvox', 'arc-xp',
-        'one-ai-success-story', 'payload', 'telefonica', 'nod-games', 'verizon', 'tim'
-    ]
+# Plugin interface used by the single-process runner
+pages = case_study_pages = _plugin.pages
+page_url = _plugin.page_url
+discovered_pages = _plugin.discovered_pages
+extract = extract_case_study = _plugin.extract
+scrape = scrape_mongodb_case_studies = _plugin.scrape
+save = save_to_json = _plugin.save
 
-    results = []
-
-    for site in case_studies:
-        if not site.strip():  # Ignore empty or malformed entries
-            continue
-
-        try:
-            url = f'{base_url}{site}'
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Extract testimonial text
-            name_element = soup.find('p', style="font-size: 16px; color: #798186;")
-            testimonial_text = name_element.get_text(strip=True) if name_element else ""
-
-            if testimonial_text:
-                name, title, company = extract_name_details(testimonial_text)
-            else:
-                name, title, company = "Unknown", "Unknown", "Unknown"
-
-            results.append({
-                "company": company,
-                "testimonial": {
-                    "name": name,
-                    "title": title,
-                    "company": company,
-                    "URL": url
-                }
-            })
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error getting results for this website: {url}")
-    return results
-
-# Scrape data
-data = scrape_mongodb_case_studies()
-
-# Save results to a JSON file
-with open("mongodb_case_studies.json", "w", encoding="utf-8") as json_file:
-    json.dump(data, json_file, indent=4, ensure_ascii=False)
-
-print("Scraping completed. Data saved to case_studies.json")
+if __name__ == "__main__":
+    rule_vendor.run('mongodb')
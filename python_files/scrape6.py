@@ -1,63 +1,79 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+from bs4 import SoupStrainer
 
-def scrape_atlassian_case_studies():
-    base_url = 'https://www.atlassian.com/customers'
+from fetch_engine import scrape_pages
+from output import save_records
+
+VENDOR = 'atlassian'
+OUTPUT_FILE = "atlassian_case_studies.json"
+BASE_URL = 'https://www.atlassian.com/customers'
+
+# Only the customer story cards are needed
+PARSE_ONLY = SoupStrainer('a', class_='_311tkb7n')
+
+def extract_case_studies(page):
+    """Build a record for every customer story card on the listing page"""
     results = []
+
+    # Find all customer story elements
+    customer_stories = page.soup.find_all('a', class_='_311tkb7n')
     
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()  # Raise exception for HTTP errors
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find all customer story elements
-        customer_stories = soup.find_all('a', class_='_311tkb7n')
-        
-        for story in customer_stories:
-            try:
-                # Extract the company name from the first img tag's alt attribute
-                img_tag = story.find('img', loading='lazy')
-                company_name = img_tag.get('alt', 'Unknown Company') if img_tag else 'Unknown Company'
-                
-                # Extract the name of the person from the h4 tag
-                name_tag = story.find('h4')
-                name = name_tag.get_text(strip=True) if name_tag else 'Unknown Name'
-                
-                # Extract the designation from the p tag with class 'eyebrow-md'
-                designation_tag = story.find('p', class_='eyebrow-md')
-                designation = designation_tag.get_text(strip=True) if designation_tag else 'Unknown Designation'
-                
-                # Skip entries where any value is unknown
-                if company_name == 'Unknown Company' or name == 'Unknown Name' or designation == 'Unknown Designation':
-                    continue
-                
-                # Create a dictionary with extracted data
-                results.append({
+    for story in customer_stories:
+        try:
+            # Extract the company name from the first img tag's alt attribute
+            img_tag = story.find('img', loading='lazy')
+            company_name = img_tag.get('alt', 'Unknown Company') if img_tag else 'Unknown Company'
+            
+            # Extract the name of the person from the h4 tag
+            name_tag = story.find('h4')
+            name = name_tag.get_text(strip=True) if name_tag else 'Unknown Name'
+            
+            # Extract the designation from the p tag with class 'eyebrow-md'
+            designation_tag = story.find('p', class_='eyebrow-md')
+            designation = designation_tag.get_text(strip=True) if designation_tag else 'Unknown Designation'
+            
+            # Skip entries where any value is unknown
+            if company_name == 'Unknown Company' or name == 'Unknown Name' or designation == 'Unknown Designation':
+                continue
+            
+            # Create a dictionary with extracted data
+            results.append({
+                "company": company_name,
+                "testimonial": {
+                    "name": name,
+                    "title": designation,
                     "company": company_name,
-                    "testimonial": {
-                        "name": name,
-                        "title": designation,
-                        "company": company_name,
-                        "URL": base_url
-                    }
-                })
-            except Exception as e:
-                print(f"Error processing one customer story: {str(e)}")
-                
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching the page: {str(e)}")
-    
+                    "URL": page.url
+                }
+            })
+        except Exception as e:
+            print(f"Error processing one customer story: {str(e)}")
+
+    # Every story is on this page: an empty one is a layout change, not a dead page
+    if not results:
+        raise ValueError(f"No customer stories found on {page.url}")
     return results
 
-def save_to_json(data, filename="atlassian_case_studies.json"):
+def listing_pages():
+    """All stories are on the one customers page"""
+    return {BASE_URL: 'customers'}
+
+def scrape_atlassian_case_studies():
+    records = scrape_pages(VENDOR, listing_pages(), extract_case_studies, parse_only=PARSE_ONLY)
+    if not records:
+        # Keep the last output rather than overwrite it with nothing
+        raise RuntimeError(f"No Atlassian case studies scraped from {BASE_URL} "
+                           "(if it is listed by --report-dead, --refresh retries it)")
+    return records
+
+def save_to_json(data, filename=OUTPUT_FILE):
     """Saves the scraped data to a JSON file."""
-    try:
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        print(f"Data successfully saved to {filename}")
-    except Exception as e:
-        print(f"Error saving data to JSON: {str(e)}")
+    save_records(VENDOR, data, filename)
+
+# Plugin interface used by the single-process runner
+pages = listing_pages
+extract = extract_case_studies
+scrape = scrape_atlassian_case_studies
+save = save_to_json
 
 if __name__ == "__main__":
     extracted_data = scrape_atlassian_case_studies()
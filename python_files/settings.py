@@ -0,0 +1,142 @@
+"""
+Shared scraper settings. Each value can be overridden with an environment
+variable, which is how main.py passes its options down to the scrapers.
+"""
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# Requests allowed in flight overall, and against any single host
+GLOBAL_CONCURRENCY = _int('SCRAPER_CONCURRENCY', 16)
+PER_HOST_CONCURRENCY = _int('SCRAPER_PER_HOST', 4)
+
+# Keep-alive connections kept open per host; at least one per concurrent request
+POOL_SIZE = _int('SCRAPER_POOL_SIZE', max(PER_HOST_CONCURRENCY, 4))
+# Number of hosts to keep a connection pool for
+POOL_HOSTS = _int('SCRAPER_POOL_HOSTS', 32)
+
+# Seconds to wait for a connection, and between bytes of a response
+CONNECT_TIMEOUT = float(os.environ.get('SCRAPER_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('SCRAPER_READ_TIMEOUT', 20))
+
+USER_AGENT = os.environ.get(
+    'SCRAPER_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+
+# Where caches and other run state are kept
+CACHE_DIR = os.environ.get(
+    'SCRAPER_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+)
+
+# HTTP cache: 'normal' revalidates with ETag/Last-Modified, 'refresh' ignores
+# cached copies, 'offline' never touches the network, 'off' disables it
+CACHE_MODE = os.environ.get('SCRAPER_CACHE_MODE', 'normal')
+CACHE_TTL_DAYS = _int('SCRAPER_CACHE_TTL_DAYS', 30)
+CACHE_MAX_MB = _int('SCRAPER_CACHE_MAX_MB', 500)
+
+# How long a 404/410 or empty page is skipped before it is tried again
+DEAD_LINK_TTL_DAYS = _int('SCRAPER_DEAD_LINK_TTL_DAYS', 14)
+
+# HTML parser backend: 'auto' uses lxml when it is installed, else html.parser
+PARSER = os.environ.get('SCRAPER_PARSER', 'auto')
+# Only build the parts of each page a vendor's extractor reads (see PARSE_ONLY in the scrapers)
+RESTRICTED_PARSE = os.environ.get('SCRAPER_RESTRICTED_PARSE', '1') == '1'
+# Rule files of the vendors scraped without a module of their own (see rule_engine.py)
+RULES_DIR = os.environ.get('SCRAPER_RULES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules'))
+
+# Datadog fallback extractor: 'indexed' (single pass) or 'legacy' (original nested scan)
+DATADOG_EXTRACT_MODE = os.environ.get('SCRAPER_DATADOG_EXTRACT_MODE', 'indexed')
+
+# Per-host token bucket: starting rate (requests/second), burst size, and the
+# range the rate adapts within as the host answers 429/503 or stays healthy
+RATE_LIMIT = float(os.environ.get('SCRAPER_RATE_LIMIT', 4))
+RATE_BURST = _int('SCRAPER_RATE_BURST', 4)
+RATE_MIN = float(os.environ.get('SCRAPER_RATE_MIN', 0.2))
+RATE_MAX = float(os.environ.get('SCRAPER_RATE_MAX', 20))
+
+# Retries for failed GETs, with jittered exponential backoff between attempts
+MAX_RETRIES = _int('SCRAPER_MAX_RETRIES', 3)
+BACKOFF_BASE = float(os.environ.get('SCRAPER_BACKOFF_BASE', 0.5))
+BACKOFF_MAX = float(os.environ.get('SCRAPER_BACKOFF_MAX', 30))
+# Consecutive failures that open a host's circuit breaker, and how long it stays open
+BREAKER_THRESHOLD = _int('SCRAPER_BREAKER_THRESHOLD', 5)
+BREAKER_COOLDOWN = float(os.environ.get('SCRAPER_BREAKER_COOLDOWN', 30))
+
+# Continue an interrupted run from its checkpoint instead of starting over
+RESUME = os.environ.get('SCRAPER_RESUME', '0') == '1'
+# Streamed records are fsynced to disk every this many pages
+FSYNC_EVERY = _int('SCRAPER_FSYNC_EVERY', 20)
+
+# Archive every downloaded page (compressed) so extraction can be re-run offline
+SNAPSHOTS = os.environ.get('SCRAPER_SNAPSHOTS', '1') == '1'
+
+# Send every request to this server instead (as <mirror>/<host>/<path>), e.g.
+# the local vendor stand-in used by the benchmarks
+MIRROR_URL = os.environ.get('SCRAPER_MIRROR_URL', '')
+
+# Per-stage timings and counters, saved as reports under REPORT_DIR (see metrics.py)
+METRICS = os.environ.get('SCRAPER_METRICS', '1') == '1'
+REPORT_DIR = os.environ.get('SCRAPER_REPORT_DIR', os.path.join(CACHE_DIR, 'reports'))
+# Profile the parse stage with cProfile (main.py --profile)
+PROFILE = os.environ.get('SCRAPER_PROFILE', '0') == '1'
+
+# Find case study pages in the vendors' sitemaps, besides the hand-maintained slug lists
+DISCOVERY = os.environ.get('SCRAPER_DISCOVERY', '1') == '1'
+
+# Reuse the stored record of pages whose body (minus volatile regions) hasn't
+# changed; extra volatile regexes, one per line (see fingerprints.py)
+FINGERPRINTS = os.environ.get('SCRAPER_FINGERPRINTS', '1') == '1'
+VOLATILE_PATTERNS = os.environ.get('SCRAPER_VOLATILE_PATTERNS', '')
+
+# Where save_records writes: 'json' files, the 'sqlite' store (see store.py) or 'both'
+STORAGE = os.environ.get('SCRAPER_STORAGE', 'json')
+DB_PATH = os.environ.get('SCRAPER_DB', 'testimonials.db')
+
+# Stop downloading a page once the element its extractor reads has closed, for
+# scrapers that set STREAM_UNTIL (see streaming.py); read in chunks of this size,
+# and a rest of up to STREAM_DRAIN_KB after the element is still read so the
+# connection can be reused
+STREAMING = os.environ.get('SCRAPER_STREAMING', '0') == '1'
+STREAM_CHUNK_KB = _int('SCRAPER_STREAM_CHUNK_KB', 16)
+STREAM_DRAIN_KB = _int('SCRAPER_STREAM_DRAIN_KB', 64)
+
+# DigitalOcean pages whose quote only appears with JavaScript are rendered by a
+# headless browser pool (scrapper/render_pool.js) with this many tabs
+BROWSER_FALLBACK = os.environ.get('SCRAPER_BROWSER_FALLBACK', '1') == '1'
+BROWSER_POOL_SIZE = _int('SCRAPER_BROWSER_POOL', 4)
+# Keep the browser running between scrapes instead of starting one each time (the daemon does)
+BROWSER_KEEP_WARM = os.environ.get('SCRAPER_BROWSER_KEEP_WARM', '0') == '1'
+
+# Shared task queue for crawling with several worker processes (see work_queue.py):
+# how long a leased batch is held without progress, and tries per page
+QUEUE_PATH = os.environ.get('SCRAPER_QUEUE', os.path.join(CACHE_DIR, 'work_queue.db'))
+LEASE_SECONDS = float(os.environ.get('SCRAPER_LEASE_SECONDS', 300))
+MAX_ATTEMPTS = _int('SCRAPER_MAX_ATTEMPTS', 3)
+QUEUE_BATCH = _int('SCRAPER_QUEUE_BATCH', 32)
+
+# Refresh scheduling (see scheduler.py): case study page requests per run (0: fetch
+# every page), pages are checked at least this often, and whether the run follows
+# the plan main.py saved
+REQUEST_BUDGET = _int('SCRAPER_REQUEST_BUDGET', 0)
+MAX_CHECK_AGE_DAYS = float(os.environ.get('SCRAPER_MAX_CHECK_AGE_DAYS', 30))
+SCHEDULE = os.environ.get('SCRAPER_SCHEDULE', '0') == '1'
+
+# Pipeline between the fetch, parse and write stages (see process_pages):
+# processes parsing pages and running the extractors (0 parses in the
+# fetching thread), pages handed to them at a time, and pages a vendor has
+# downloading or waiting to be parsed
+PARSE_WORKERS = _int('SCRAPER_PARSE_WORKERS', os.cpu_count() if (os.cpu_count() or 1) > 1 else 0)
+PARSE_QUEUE = _int('SCRAPER_PARSE_QUEUE', 2 * max(1, PARSE_WORKERS))
+FETCH_WINDOW = _int('SCRAPER_FETCH_WINDOW', 4 * GLOBAL_CONCURRENCY)
+
+# Daemon (see daemon.py): seconds between refreshes of each vendor, and where its
+# API listens, on a Unix socket if DAEMON_SOCKET is set, else on host:port
+DAEMON_INTERVAL = float(os.environ.get('SCRAPER_DAEMON_INTERVAL', 6 * 3600))
+DAEMON_SOCKET = os.environ.get('SCRAPER_DAEMON_SOCKET', '')
+DAEMON_HOST = os.environ.get('SCRAPER_DAEMON_HOST', '127.0.0.1')
+DAEMON_PORT = _int('SCRAPER_DAEMON_PORT', 8766)
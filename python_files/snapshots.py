@@ -0,0 +1,71 @@
+"""
+Archive of fetched pages, so extraction can be re-run without the network.
+
+Every page downloaded by scrape_pages is stored gzip-compressed under
+.cache/snapshots/<vendor>/, and a line with its URL, site slug, fetch time
+and file is appended to that vendor's index.jsonl. Pages answered from the
+HTTP cache, or with the fingerprint of their last download, are archived the
+first time they are seen and not again. A download stopped at the element a
+scraper reads (see streaming.py) is archived as the part that was read, marked
+partial; it holds everything that scraper's extract function looks at.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import settings
+
+SNAPSHOTS_DIR = os.path.join(settings.CACHE_DIR, 'snapshots')
+
+_lock = threading.Lock()
+
+
+def _vendor_dir(vendor):
+    return os.path.join(SNAPSHOTS_DIR, vendor)
+
+
+def archive(vendor, url, site, content, partial=False):
+    """Store one fetched page and index it"""
+    fetched_at = time.time()
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(fetched_at))}-{key}.html.gz"
+    vendor_dir = _vendor_dir(vendor)
+    os.makedirs(vendor_dir, exist_ok=True)
+    with gzip.open(os.path.join(vendor_dir, name), 'wb') as f:
+        f.write(content)
+    entry = {'url': url, 'site': site, 'fetched_at': fetched_at, 'file': name, 'size': len(content)}
+    if partial:
+        entry['partial'] = True
+    with _lock:
+        with open(os.path.join(vendor_dir, 'index.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def latest(vendor):
+    """Return the newest index entry for every archived URL, in the order URLs were first archived"""
+    entries = {}
+    try:
+        with open(os.path.join(_vendor_dir(vendor), 'index.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry['url']] = entry
+    except FileNotFoundError:
+        pass
+    return list(entries.values())
+
+
+def archived(vendor):
+    """The URLs the vendor has a snapshot of"""
+    return {entry['url'] for entry in latest(vendor)}
+
+
+def read(vendor, entry):
+    """Return the archived page body for an index entry"""
+    with gzip.open(os.path.join(_vendor_dir(vendor), entry['file']), 'rb') as f:
+        return f.read()
@@ -0,0 +1,260 @@
+"""
+Optional SQLite store for the testimonials of every vendor.
+
+With SCRAPER_STORAGE=sqlite (or 'both', main.py --storage) save_records
+bulk-upserts each vendor's records into one database (SCRAPER_DB, default
+testimonials.db next to the JSON files) instead of, or as well as, rewriting
+its JSON file. Rows are keyed on vendor, normalised company, normalised person
+name, URL and occurrence (the n-th record of the save with those four, as
+pages can quote a person more than once), and keep when they were first and
+last seen. The JSON files can be regenerated from the database at any time,
+record for record.
+
+    python python_files/store.py lookup --company "Bank Hapoalim"
+    python python_files/store.py lookup --name "chris waters" --vendor datadog
+    python python_files/store.py export [vendor ...]
+    python python_files/store.py import <vendor> <filename> [indent]
+    python python_files/store.py stats
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS testimonials (
+    id INTEGER PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    company TEXT NOT NULL,
+    company_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    title TEXT,
+    url TEXT NOT NULL,
+    occurrence INTEGER NOT NULL DEFAULT 0,
+    record TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    UNIQUE (vendor, company_key, name_key, url, occurrence)
+);
+CREATE INDEX IF NOT EXISTS testimonials_company ON testimonials (company_key);
+CREATE INDEX IF NOT EXISTS testimonials_name ON testimonials (name_key);
+CREATE INDEX IF NOT EXISTS testimonials_url ON testimonials (url);
+CREATE INDEX IF NOT EXISTS testimonials_vendor ON testimonials (vendor, last_seen);
+
+-- The JSON file each vendor is exported to, and when it was last saved
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    indent INTEGER NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO testimonials (vendor, company, company_key, name, name_key, title, url, occurrence,
+                          record, position, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (vendor, company_key, name_key, url, occurrence) DO UPDATE SET
+    company = excluded.company,
+    name = excluded.name,
+    title = excluded.title,
+    record = excluded.record,
+    position = excluded.position,
+    last_seen = excluded.last_seen
+"""
+
+# Legal suffixes ignored when matching company names
+_COMPANY_SUFFIXES = re.compile(r'\b(inc|incorporated|ltd|limited|llc|plc|corp|corporation|co|gmbh|ag|sa|bv)$')
+
+_lock = threading.Lock()
+
+
+def normalise(text):
+    """Lowercase, accent-free, punctuation-free form of a name for matching"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+def company_key(company):
+    return _COMPANY_SUFFIXES.sub('', normalise(company)).strip()
+
+
+def connect(path=None):
+    connection = sqlite3.connect(path or settings.DB_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    _migrate(connection)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _migrate(connection):
+    """Rebuild a testimonials table made before rows were keyed by occurrence"""
+    columns = [row['name'] for row in connection.execute('PRAGMA table_info(testimonials)')]
+    if not columns or 'occurrence' in columns:
+        return
+    names = ', '.join(columns)
+    # One script, so the rebuild is a single transaction
+    connection.executescript(
+        'BEGIN; ALTER TABLE testimonials RENAME TO testimonials_old; '
+        'DROP INDEX testimonials_company; DROP INDEX testimonials_name; '
+        f'DROP INDEX testimonials_url; DROP INDEX testimonials_vendor; {SCHEMA} '
+        f'INSERT INTO testimonials ({names}) SELECT {names} FROM testimonials_old; '
+        'DROP TABLE testimonials_old; COMMIT;')
+
+
+def _rows(vendor, records, now):
+    occurrences = {}
+    for position, record in enumerate(records):
+        testimonial = record.get('testimonial') or {}
+        company = record.get('company') or testimonial.get('company') or ''
+        name = testimonial.get('name') or ''
+        key = (company_key(company), normalise(name), testimonial.get('URL') or '')
+        occurrence = occurrences[key] = occurrences.get(key, -1) + 1
+        yield (vendor, company, key[0], name, key[1], testimonial.get('title'), key[2], occurrence,
+               json.dumps(record, ensure_ascii=False), position, now, now)
+
+
+def upsert_records(vendor, records, filename, indent=4, path=None):
+    """Insert or refresh a vendor's records in one transaction; returns the number written"""
+    now = time.time()
+    rows = list(_rows(vendor, records, now))
+    with _lock:
+        connection = connect(path)
+        try:
+            with connection:
+                connection.executemany(UPSERT, rows)
+                connection.execute(
+                    'INSERT INTO vendors (vendor, filename, indent, saved_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (vendor) DO UPDATE SET filename = excluded.filename, '
+                    'indent = excluded.indent, saved_at = excluded.saved_at',
+                    (vendor, filename, indent, now))
+        finally:
+            connection.close()
+    return len(rows)
+
+
+def current_records(connection, vendor):
+    """The records of the vendor's last save, in their original order"""
+    rows = connection.execute(
+        'SELECT t.record FROM testimonials t JOIN vendors v ON v.vendor = t.vendor '
+        'WHERE t.vendor = ? AND t.last_seen = v.saved_at ORDER BY t.position', (vendor,))
+    return [json.loads(row['record']) for row in rows]
+
+
+def export(vendors=None, path=None):
+    """Rewrite the JSON file of each vendor (default: all) from the database"""
+    connection = connect(path)
+    try:
+        rows = connection.execute('SELECT vendor, filename, indent FROM vendors ORDER BY vendor').fetchall()
+        for row in rows:
+            if vendors and row['vendor'] not in vendors:
+                continue
+            records = current_records(connection, row['vendor'])
+            tmp_path = f"{row['filename']}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=row['indent'], ensure_ascii=False)
+            os.replace(tmp_path, row['filename'])
+            print(f"Exported {len(records)} {row['vendor']} records to {row['filename']}")
+    finally:
+        connection.close()
+
+
+def import_file(vendor, filename, indent=4, path=None):
+    """Load an existing JSON output file (e.g. from the Node scraper) into the database"""
+    with open(filename, encoding='utf-8') as f:
+        records = json.load(f)
+    count = upsert_records(vendor, records, filename, indent, path)
+    print(f"Imported {count} {vendor} records from {filename}")
+
+
+def lookup(company=None, name=None, vendor=None, url=None, current=True, path=None):
+    """Return matching testimonials as dicts, newest first"""
+    clauses = []
+    params = []
+    if company:
+        clauses.append('t.company_key = ?')
+        params.append(company_key(company))
+    if name:
+        clauses.append('t.name_key = ?')
+        params.append(normalise(name))
+    if vendor:
+        clauses.append('t.vendor = ?')
+        params.append(vendor)
+    if url:
+        clauses.append('t.url = ?')
+        params.append(url)
+    if current:
+        clauses.append('t.last_seen = v.saved_at')
+    where = ' AND '.join(clauses) or '1'
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            'SELECT t.vendor, t.company, t.name, t.title, t.url, t.first_seen, t.last_seen '
+            f'FROM testimonials t JOIN vendors v ON v.vendor = t.vendor WHERE {where} '
+            'ORDER BY t.last_seen DESC, t.vendor', params)
+        return [dict(row) for row in rows]
+    finally:
+        connection.close()
+
+
+def stats(path=None):
+    connection = connect(path)
+    try:
+        return [dict(row) for row in connection.execute(
+            'SELECT v.vendor, v.filename, v.saved_at, COUNT(t.id) AS rows, '
+            'SUM(t.last_seen = v.saved_at) AS current FROM vendors v '
+            'LEFT JOIN testimonials t ON t.vendor = v.vendor GROUP BY v.vendor ORDER BY v.vendor')]
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query and export the testimonial database.")
+    parser.add_argument('--db', help="Database file (default: SCRAPER_DB or testimonials.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    find = commands.add_parser('lookup', help="Find testimonials")
+    find.add_argument('--company')
+    find.add_argument('--name')
+    find.add_argument('--vendor')
+    find.add_argument('--url')
+    find.add_argument('--all', action='store_true', help="Include records no longer on the vendor's site")
+    dump = commands.add_parser('export', help="Regenerate the JSON files")
+    dump.add_argument('vendors', nargs='*')
+    load = commands.add_parser('import', help="Load a JSON output file")
+    load.add_argument('vendor')
+    load.add_argument('filename')
+    load.add_argument('indent', nargs='?', type=int, default=4)
+    commands.add_parser('stats', help="Rows per vendor")
+    args = parser.parse_args(argv)
+
+    if args.command == 'lookup':
+        start = time.perf_counter()
+        rows = lookup(args.company, args.name, args.vendor, args.url, current=not args.all, path=args.db)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(f"{len(rows)} matches in {elapsed:.1f} ms")
+    elif args.command == 'export':
+        export(args.vendors, path=args.db)
+    elif args.command == 'import':
+        import_file(args.vendor, args.filename, args.indent, path=args.db)
+    else:
+        for row in stats(path=args.db):
+            saved = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['saved_at']))
+            print(f"{row['vendor']:<14}{row['current'] or 0:>6} current{row['rows']:>6} total  "
+                  f"saved {saved}  -> {row['filename']}")
+
+
+if __name__ == "__main__":
+    main()
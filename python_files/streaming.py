@@ -0,0 +1,196 @@
+"""
+Early-terminating downloads for vendors whose extractor only reads the first
+element of one kind (STREAM_UNTIL in the scraper, a Target).
+
+The response is read in chunks and fed to an incremental tokenizer (lxml's
+pull parser when lxml is the parser backend, else html.parser). Once the first
+matching element has closed, only that element's markup is parsed and handed
+to the extractor. If a page never shows the element, the whole body has been
+read anyway and goes down the normal full-page path.
+
+After the element, a rest of at most SCRAPER_STREAM_DRAIN_KB is still read, so
+the connection goes back to the pool and the whole body can be cached. A
+longer rest is abandoned: the connection is closed, the response is marked
+truncated and the HTTP cache keeps only its validators (see http_cache.py).
+Off by default; turn it on with SCRAPER_STREAMING=1.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+
+import settings
+from parsing import parser_backend
+
+_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+# Elements that never have an end tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source',
+                 'track', 'wbr'}
+
+
+class Target:
+    """
+    The element to stop at: tag, with attributes equal to the given values
+    (class_ matches one of the classes; a callable is passed the value).
+    """
+
+    def __init__(self, tag, **attrs):
+        self.tag = tag
+        self.attrs = {name.rstrip('_'): value for name, value in attrs.items()}
+
+    def matches(self, tag, attrs):
+        if tag != self.tag:
+            return False
+        present = dict(attrs)
+        for name, wanted in self.attrs.items():
+            value = present.get(name)
+            if callable(wanted):
+                if not wanted(value):
+                    return False
+            elif name == 'class':
+                if wanted not in (value or '').split():
+                    return False
+            elif value != wanted:
+                return False
+        return True
+
+
+class LxmlFirstElement:
+    """Finds the first element matching target with lxml's pull parser; done once it has closed"""
+
+    def __init__(self, target, encoding):
+        from lxml import etree
+        self.etree = etree
+        self.target = target
+        self.parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+        self.element = None
+        self.done = False
+
+    def feed(self, chunk):
+        self.parser.feed(chunk)
+        for event, element in self.parser.read_events():
+            if self.element is None:
+                if event == 'start' and self.target.matches(element.tag, element.attrib.items()):
+                    self.element = element
+                elif event == 'end':
+                    # Nothing before the target is needed, so don't keep it around
+                    element.clear()
+            elif event == 'end' and element is self.element:
+                self.done = True
+                return
+
+    def markup(self):
+        return self.etree.tostring(self.element, encoding='unicode', with_tail=False)
+
+
+class FirstElement(HTMLParser):
+    """Collects the markup of the first element matching target with html.parser; done once it has closed"""
+
+    def __init__(self, target, encoding):
+        super().__init__(convert_charrefs=False)
+        self.target = target
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.parts = []
+        # Elements named like the target that are open inside it, itself included
+        self.open = 0
+        self.done = False
+
+    def feed(self, chunk):
+        super().feed(self.decoder.decode(chunk))
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.open:
+            self.parts.append(self.get_starttag_text())
+            if tag == self.target.tag:
+                self.open += 1
+        elif self.target.matches(tag, attrs):
+            self.parts.append(self.get_starttag_text())
+            self.open = 1
+            self.done = tag in VOID_ELEMENTS
+
+    def handle_startendtag(self, tag, attrs):
+        if self.done:
+            return
+        if self.open:
+            self.parts.append(self.get_starttag_text())
+        elif self.target.matches(tag, attrs):
+            self.parts.append(self.get_starttag_text())
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if self.done or not self.open:
+            return
+        self.parts.append(f'</{tag}>')
+        if tag == self.target.tag:
+            self.open -= 1
+            self.done = self.open == 0
+
+    def handle_data(self, data):
+        if self.open and not self.done:
+            self.parts.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(f'&{name};')
+
+    def handle_charref(self, name):
+        self.handle_data(f'&#{name};')
+
+    def markup(self):
+        return ''.join(self.parts)
+
+
+def _encoding(response):
+    """The charset the response declares, else UTF-8"""
+    match = _CHARSET.search(response.headers.get('Content-Type', ''))
+    try:
+        return codecs.lookup(match.group(1)).name if match else 'utf-8'
+    except LookupError:
+        return 'utf-8'
+
+
+def tokenizer(target, encoding):
+    """An incremental tokenizer looking for target, for the configured parser backend"""
+    if parser_backend() == 'lxml':
+        return LxmlFirstElement(target, encoding)
+    return FirstElement(target, encoding)
+
+
+def read_until(response, target):
+    """
+    Read a streamed response until the first target element has closed.
+    Returns that element's markup, or None if the body ended without it.
+    response.content is set to the bytes read either way, and
+    response.truncated is True if the rest of the body was abandoned.
+    """
+    parser = tokenizer(target, _encoding(response))
+    chunks = []
+    body = response.iter_content(settings.STREAM_CHUNK_KB * 1024)
+    for chunk in body:
+        chunks.append(chunk)
+        parser.feed(chunk)
+        if parser.done:
+            break
+    response.truncated = parser.done and not _drain(response, body, chunks)
+    if response.truncated:
+        # Abandon the rest of the body, and its connection with it
+        response.close()
+    response._content = b''.join(chunks)
+    response._content_consumed = True
+    return parser.markup() if parser.done else None
+
+
+def _drain(response, body, chunks):
+    """Read the rest of the body into chunks if it is short; True if the whole body was read"""
+    limit = settings.STREAM_DRAIN_KB * 1024
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and response.raw is not None and int(length) - response.raw.tell() > limit:
+        return False
+    drained = 0
+    for chunk in body:
+        chunks.append(chunk)
+        drained += len(chunk)
+        if drained > limit:
+            return False
+    return True
@@ -0,0 +1,342 @@
+"""
+Persistent queue of (vendor, URL) tasks with leases, for crawling with any
+number of worker processes on one host, sharing the database file
+(SCRAPER_QUEUE, default .cache/work_queue.db). It relies on SQLite's WAL mode
+and on file locks, so it can't be shared over a network filesystem.
+
+    python python_files/work_queue.py enqueue [vendor ...]   # queue the vendors' pages (default: all)
+    python python_files/work_queue.py worker                 # drain the queue; start as many as you like
+    python python_files/work_queue.py merge [vendor ...]     # write the per-vendor outputs
+    python python_files/work_queue.py status
+
+A worker leases a batch of SCRAPER_QUEUE_BATCH tasks for SCRAPER_LEASE_SECONDS
+and renews its leases with every page it finishes. A worker that crashes or
+hangs stops renewing, so its tasks go back to the other workers once the lease
+runs out. A page that fails is retried up to SCRAPER_MAX_ATTEMPTS times.
+Workers save the per-URL run state of the pages they process (dead links,
+lastmods, change history, fingerprints) merged with each other's (see
+json_state.py); merge logs the run in each vendor's change history (see
+scheduler.py).
+main.py --workers N runs all three steps with N workers.
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+import settings
+from fetch_engine import collect_records, process_pages
+from runner import PLUGINS, frontier, load_plugin
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    url TEXT NOT NULL,
+    site TEXT,
+    lastmod TEXT,
+    -- pending, leased, done or failed
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    record TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (vendor, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_vendor ON tasks (vendor, state);
+"""
+
+# Seconds an idle worker waits before asking again while other workers still hold leases
+POLL_SECONDS = 2
+
+
+def worker_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class WorkQueue:
+    def __init__(self, path=None):
+        self.path = path or settings.QUEUE_PATH
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Transactions are started explicitly; the worker's vendor threads share the connection
+        self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def _transaction(self, statements):
+        """Run [(sql, params)] in one write transaction; returns the cursor of the first statement"""
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                cursors = [self.connection.execute(sql, params) for sql, params in statements]
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            return cursors[0]
+
+    def enqueue(self, vendor, pages, lastmod=None):
+        """Replace the vendor's tasks with pages ({url: site}), in order"""
+        now = time.time()
+        lastmod = lastmod or {}
+        rows = [(vendor, url, site, lastmod.get(url), now) for url, site in pages.items()]
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.connection.execute('DELETE FROM tasks WHERE vendor = ?', (vendor,))
+                self.connection.executemany(
+                    "INSERT INTO tasks (vendor, url, site, lastmod, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'pending', ?)", rows)
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def lease(self, worker, limit):
+        """Take up to limit pending tasks, or tasks whose lease ran out; returns them as rows"""
+        now = time.time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                # Tasks that used up their attempts and were abandoned again
+                self.connection.execute(
+                    "UPDATE tasks SET state = 'failed', worker = NULL, lease_expires = NULL, "
+                    "error = COALESCE(error, 'lease expired'), updated_at = ? "
+                    "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, settings.MAX_ATTEMPTS))
+                tasks = self.connection.execute(
+                    "SELECT id, vendor, url, site, lastmod, attempts FROM tasks "
+                    "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                    "ORDER BY attempts, id LIMIT ?", (now, limit)).fetchall()
+                self.connection.executemany(
+                    "UPDATE tasks SET state = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    [(worker, now + settings.LEASE_SECONDS, now, task['id']) for task in tasks])
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        return tasks
+
+    def _renew(self, worker, now):
+        return ("UPDATE tasks SET lease_expires = ? WHERE worker = ? AND state = 'leased'",
+                (now + settings.LEASE_SECONDS, worker))
+
+    def complete(self, worker, task_id, record):
+        """Store a task's record (None for pages without one) and renew the worker's other leases"""
+        now = time.time()
+        cursor = self._transaction([
+            ("UPDATE tasks SET state = 'done', record = ?, error = NULL, worker = NULL, lease_expires = NULL, "
+             "updated_at = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+             (json.dumps(record, ensure_ascii=False), now, task_id, worker)),
+            self._renew(worker, now),
+        ])
+        # 0 if the lease ran out and another worker has the task now
+        return cursor.rowcount == 1
+
+    def fail(self, worker, task_id, error):
+        """Put a task back for another try, or mark it failed once it has used up its attempts"""
+        now = time.time()
+        cursor = self._transaction([
+            ("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+             "error = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+             "WHERE id = ? AND worker = ? AND state = 'leased'",
+             (settings.MAX_ATTEMPTS, error, now, task_id, worker)),
+            self._renew(worker, now),
+        ])
+        return cursor.rowcount == 1
+
+    def unfinished(self):
+        """Number of tasks still pending or leased"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def counts(self):
+        """{vendor: Counter of task states}"""
+        counts = defaultdict(Counter)
+        with self.lock:
+            for row in self.connection.execute('SELECT vendor, state, COUNT(*) AS n FROM tasks GROUP BY vendor, state'):
+                counts[row['vendor']][row['state']] = row['n']
+        return counts
+
+    def records(self, vendor):
+        """The records of the vendor's finished pages, in the order they were queued"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url, record FROM tasks WHERE vendor = ? AND state = 'done' ORDER BY id", (vendor,)).fetchall()
+        records = {row['url']: json.loads(row['record']) for row in rows}
+        return collect_records(list(records), records)
+
+    def urls(self, vendor):
+        """Every page queued for the vendor"""
+        with self.lock:
+            return {row['url'] for row in self.connection.execute("SELECT url FROM tasks WHERE vendor = ?", (vendor,))}
+
+    def close(self):
+        self.connection.close()
+
+
+def enqueue(queue, vendors):
+    for vendor in vendors:
+        pages = frontier(vendor)
+        count = queue.enqueue(vendor, pages.pages, pages.lastmod)
+        print(f"Queued {count} {vendor} pages")
+
+
+def _run_tasks(queue, worker, vendor, tasks):
+    """Process one vendor's share of a leased batch"""
+    ids = {task['url']: task['id'] for task in tasks}
+    try:
+        plugin = load_plugin(vendor)
+        pages = {task['url']: task['site'] for task in tasks}
+        lastmod = {task['url']: task['lastmod'] for task in tasks if task['lastmod']}
+        for url, record, error in process_pages(vendor, pages, plugin.extract, getattr(plugin, 'PARSE_ONLY', None),
+                                                lastmod, getattr(plugin, 'STREAM_UNTIL', None), complete=False):
+            task_id = ids.pop(url)
+            if error is None:
+                queue.complete(worker, task_id, record)
+            else:
+                queue.fail(worker, task_id, str(error))
+        # Known dead pages are not fetched
+        for task_id in ids.values():
+            queue.complete(worker, task_id, None)
+    except Exception as e:
+        print(f"Error processing {vendor} tasks:")
+        traceback.print_exc()
+        for task_id in ids.values():
+            queue.fail(worker, task_id, str(e))
+
+
+def work(queue, worker=None, batch=None):
+    """Lease and process batches until no task is left unfinished; returns the number of tasks processed"""
+    worker = worker or worker_name()
+    batch = batch or settings.QUEUE_BATCH
+    processed = 0
+    while True:
+        tasks = queue.lease(worker, batch)
+        if not tasks:
+            if not queue.unfinished():
+                return processed
+            # The rest is leased by other workers; pick it up if one of them dies
+            time.sleep(POLL_SECONDS)
+            continue
+        by_vendor = defaultdict(list)
+        for task in tasks:
+            by_vendor[task['vendor']].append(task)
+        # Vendors of a batch are fetched side by side, on the shared fetch engine
+        with ThreadPoolExecutor(max_workers=len(by_vendor)) as pool:
+            for vendor, vendor_tasks in by_vendor.items():
+                pool.submit(_run_tasks, queue, worker, vendor, vendor_tasks)
+        processed += len(tasks)
+
+
+def merge(queue, vendors=None):
+    """
+    Save the records of every vendor's finished pages with the vendor's save
+    and log the run in its change history; returns {vendor: records}
+    """
+    counts = queue.counts()
+    saved = {}
+    for vendor in vendors or counts:
+        states = counts.get(vendor)
+        if not states:
+            print(f"Nothing queued for {vendor}")
+            continue
+        unfinished = states['pending'] + states['leased']
+        if unfinished:
+            print(f"{vendor}: {unfinished} pages are not finished yet; saving the others")
+        if states['failed']:
+            print(f"{vendor}: {states['failed']} pages failed")
+        records = queue.records(vendor)
+        load_plugin(vendor).save(records)
+        # The workers only saved their share of the pages; this is the whole run
+        scheduler.ChangeHistory(vendor).save(queue.urls(vendor))
+        saved[vendor] = len(records)
+    return saved
+
+
+def run_workers(vendors, workers):
+    """
+    Queue the vendors' pages, drain the queue with that many worker processes
+    on this host and merge the results; returns the main.py run summaries.
+    The per-host request rates are divided between the workers.
+    """
+    queue = WorkQueue()
+    start = time.perf_counter()
+    enqueue(queue, vendors)
+    env = dict(os.environ)
+    env['SCRAPER_RATE_LIMIT'] = str(settings.RATE_LIMIT / workers)
+    env['SCRAPER_RATE_MAX'] = str(settings.RATE_MAX / workers)
+    env['SCRAPER_RATE_MIN'] = str(settings.RATE_MIN / workers)
+    # The cores are shared out between the workers' parse processes too
+    env.setdefault('SCRAPER_PARSE_WORKERS', str((os.cpu_count() or 1) // workers))
+    command = [sys.executable, os.path.abspath(__file__), 'worker']
+    print(f"Starting {workers} workers")
+    processes = [subprocess.Popen(command, env=env) for _ in range(workers)]
+    returncodes = [process.wait() for process in processes]
+    saved = merge(queue, vendors)
+    counts = queue.counts()
+    queue.close()
+    elapsed = time.perf_counter() - start
+    return [{
+        'vendor': vendor,
+        'seconds': elapsed,
+        'returncode': 0 if vendor in saved and not counts[vendor]['failed'] and not any(returncodes) else 1,
+        'records': saved.get(vendor),
+        'stats': {'failures': counts[vendor]['failed']},
+    } for vendor in vendors]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl with several workers sharing a task queue.")
+    parser.add_argument('--queue', help="Queue database (default: SCRAPER_QUEUE or .cache/work_queue.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('enqueue', help="Queue the pages of vendors (default: all)")
+    add.add_argument('vendors', nargs='*', choices=sorted(PLUGINS), metavar='vendor')
+    worker = commands.add_parser('worker', help="Process tasks until the queue is drained")
+    worker.add_argument('--batch', type=int, help="Tasks leased at a time (default: SCRAPER_QUEUE_BATCH)")
+    worker.add_argument('--name', help="Worker name (default: host-pid)")
+    save = commands.add_parser('merge', help="Write the vendors' outputs from the finished tasks")
+    save.add_argument('vendors', nargs='*', choices=sorted(PLUGINS), metavar='vendor')
+    commands.add_parser('status', help="Tasks per vendor and state")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.queue)
+    try:
+        if args.command == 'enqueue':
+            enqueue(queue, args.vendors or list(PLUGINS))
+        elif args.command == 'worker':
+            start = time.perf_counter()
+            processed = work(queue, args.name, args.batch)
+            elapsed = time.perf_counter() - start
+            print(f"Worker {args.name or worker_name()} processed {processed} tasks in {elapsed:.1f}s")
+        elif args.command == 'merge':
+            merge(queue, args.vendors or None)
+        else:
+            print(f"{'vendor':<14}{'pending':>9}{'leased':>8}{'done':>8}{'failed':>8}")
+            for vendor, states in sorted(queue.counts().items()):
+                print(f"{vendor:<14}{states['pending']:>9}{states['leased']:>8}{states['done']:>8}{states['failed']:>8}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+/*
+ * Fixed-size headless browser pool for pages that only show their content with
+ * JavaScript. Used by python_files/scrape2.py as its fallback.
+ *
+ * Reads {"urls": [...], "selector": "...", "concurrency": 4} on stdin. Renders
+ * the pages in `concurrency` tabs of one browser, with images, media and fonts
+ * blocked. Prints one JSON line {"index": i, "html": ...} per page as it
+ * finishes: the rendered document once `selector` has appeared, or null.
+ *
+ * With --serve the browser is kept open between requests: they are read one
+ * per line, and each one's results end with a {"done": true} line. The pool
+ * exits when stdin closes.
+ */
+const puppeteer = require("puppeteer");
+const readline = require("readline");
+
+const BLOCKED_RESOURCES = new Set(["image", "media", "font"]);
+const MAX_RETRIES = 3;
+
+function readStdin() {
+    return new Promise((resolve, reject) => {
+        let data = "";
+        process.stdin.setEncoding("utf8");
+        process.stdin.on("data", (chunk) => (data += chunk));
+        process.stdin.on("end", () => resolve(data));
+        process.stdin.on("error", reject);
+    });
+}
+
+async function openTab(browser) {
+    const page = await browser.newPage();
+    await page.setRequestInterception(true);
+    page.on("request", (request) => {
+        if (BLOCKED_RESOURCES.has(request.resourceType())) {
+            request.abort();
+        } else {
+            request.continue();
+        }
+    });
+    return page;
+}
+
+async function render(page, url, selector) {
+    for (let attempt = 1; attempt <= MAX_RETRIES; attempt++) {
+        let loaded = false;
+        try {
+            await page.goto(url, { waitUntil: "domcontentloaded", timeout: 60000 });
+            loaded = true;
+            await page.waitForSelector(selector, { timeout: 15000 });
+            return await page.content();
+        } catch (error) {
+            console.error(`Error rendering ${url} (attempt ${attempt}/${MAX_RETRIES}): ${error.message}`);
+            // The page loaded but the element never showed up: loading it again won't bring it
+            if (loaded && error.name === "TimeoutError") {
+                return null;
+            }
+        }
+    }
+    return null;
+}
+
+async function renderAll(browser, { urls, selector, concurrency = 4 }) {
+    let next = 0;
+
+    // Each worker keeps one tab open and takes the next URL until none are left
+    async function worker() {
+        const page = await openTab(browser);
+        try {
+            while (next < urls.length) {
+                const index = next++;
+                const html = await render(page, urls[index], selector);
+                process.stdout.write(JSON.stringify({ index, html }) + "\n");
+            }
+        } finally {
+            await page.close();
+        }
+    }
+
+    await Promise.all(Array.from({ length: Math.min(concurrency, urls.length) }, worker));
+}
+
+async function serve(browser) {
+    const lines = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+    for await (const line of lines) {
+        if (!line.trim()) {
+            continue;
+        }
+        try {
+            await renderAll(browser, JSON.parse(line));
+        } catch (error) {
+            console.error(`Request failed: ${error.message}`);
+        }
+        process.stdout.write(JSON.stringify({ done: true }) + "\n");
+    }
+}
+
+(async () => {
+    const serving = process.argv.includes("--serve");
+    const request = serving ? null : JSON.parse(await readStdin());
+    const browser = await puppeteer.launch({ headless: true });
+    try {
+        if (serving) {
+            await serve(browser);
+        } else {
+            await renderAll(browser, request);
+        }
+    } finally {
+        await browser.close();
+    }
+})().catch((error) => {
+    console.error(`Browser pool failed: ${error.message}`);
+    process.exit(1);
+});
@@ -91,7 +91,7 @@ const fs = require("fs");
         }
 
         console.log("📁 Writing results to customers.json...");
-        fs.writeFileSync("digital_ocean-case_studies.json", JSON.stringify(results, null, 2));
+        fs.writeFileSync("digital_ocean_case_studies.json", JSON.stringify(results, null, 2));
 
         console.log("🎉 Scraping completed! Data saved to customers.json.");
     } catch (error) {
@@ -0,0 +1,59 @@
+"""
+The SQLite store gives back exactly what was saved: every vendor output file
+survives JSON -> store -> export unchanged, duplicates and all.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python_files'))
+
+import store  # noqa: E402
+
+OUTPUT_FILES = sorted(name for name in os.listdir(ROOT)
+                      if name.endswith(('_case_studies.json', '_testimonials.json')))
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.directory.name, 'testimonials.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_output_files_round_trip(self):
+        for name in OUTPUT_FILES:
+            with self.subTest(name):
+                with open(os.path.join(ROOT, name), encoding='utf-8') as f:
+                    records = json.load(f)
+                vendor = name.split('_case_studies')[0].split('_testimonials')[0]
+                filename = os.path.join(self.directory.name, name)
+                store.upsert_records(vendor, records, filename, path=self.db)
+                store.export([vendor], path=self.db)
+                with open(filename, encoding='utf-8') as f:
+                    self.assertEqual(json.load(f), records)
+
+    def test_resave_keeps_only_current_records(self):
+        first = {'company': 'Acme', 'testimonial': {'name': 'Ann Lee', 'URL': 'https://example.com/a'}}
+        second = {'company': 'Acme', 'testimonial': {'name': 'Ann Lee', 'title': 'CTO',
+                                                     'URL': 'https://example.com/a'}}
+        gone = {'company': 'Initech', 'testimonial': {'name': 'Bob Roe', 'URL': 'https://example.com/b'}}
+        filename = os.path.join(self.directory.name, 'acme.json')
+        store.upsert_records('acme', [first, first, gone], filename, path=self.db)
+        store.upsert_records('acme', [second, first], filename, path=self.db)
+        connection = store.connect(self.db)
+        try:
+            self.assertEqual(store.current_records(connection, 'acme'), [second, first])
+        finally:
+            connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()